@@ -0,0 +1,79 @@
+"""
+Compara o custo de serialização dos objetos cacheados.
+
+Uso: python -m benchmarks.bench_cache_codecs [iterações]
+
+Para cada codec mede encode/decode (µs por objeto) e o tamanho gravado no Redis
+(bytes por objeto), usando documentos de chat e atendente no formato real.
+A linha "json (atual)" reproduz o caminho anterior: json.dumps/json.loads.
+"""
+import json
+import sys
+import timeit
+
+from utils.codecs import ATTENDANT_CODEC, CHAT_CODEC, JsonCodec, OrjsonCodec, SchemaCodec, orjson
+
+CHAT = {
+    "_id": "66b1f0c2a4d3e5f6a7b8c9d0",
+    "phone_number": "5511999999999",
+    "status": "active",
+    "attendant_id": "66b1f0c2a4d3e5f6a7b8c9d1",
+    "category": "comercial",
+    "created_at": 1735689600,
+    "last_interaction_at": 1735693200,
+    "last_client_interaction_at": 1735693100,
+    "last_message": {"type": "text", "text": "Olá, gostaria de um orçamento", "timestamp": 1735693100, "direction": "incoming"},
+}
+
+ATTENDANT = {
+    "_id": "66b1f0c2a4d3e5f6a7b8c9d1",
+    "name": "João Silva",
+    "login": "joao.silva",
+    "password": "$2b$12$KIXQJ1r5Yk0u2h7m3l9sUeP1cO9o3W8i2mV7q4Zx6nB5yT0aR1dSe",
+    "permission": "user",
+    "sector": ["Comercial"],
+    "clients": ["5511999999999", "5511988888888"],
+    "welcome_message": "mensagem de boas vindas",
+    "working_hours": {str(d): [{"start": "09:00", "end": "11:00"}, {"start": "13:00", "end": "18:00"}] for d in range(5)},
+}
+
+
+class StdlibJson:
+    """Caminho anterior do ChatService (json.dumps com separadores padrão)."""
+    name = "json (atual)"
+
+    def encode(self, obj):
+        return json.dumps(obj)
+
+    def decode(self, raw):
+        return json.loads(raw)
+
+
+def bench(codec, obj, number):
+    raw = codec.encode(obj)
+    assert codec.decode(raw) == {k: v for k, v in obj.items() if v is not None}
+    encode = timeit.timeit(lambda: codec.encode(obj), number=number) / number * 1e6
+    decode = timeit.timeit(lambda: codec.decode(raw), number=number) / number * 1e6
+    return encode, decode, len(raw.encode())
+
+
+def main(number: int = 50_000):
+    codecs = [StdlibJson(), JsonCodec()]
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+
+    for label, obj, schema in (("chat", CHAT, CHAT_CODEC), ("attendant", ATTENDANT, ATTENDANT_CODEC)):
+        rows = [(c.name, *bench(c, obj, number)) for c in codecs]
+        rows.append((f"{schema.name} (schema)", *bench(schema, obj, number)))
+        if orjson is not None:
+            stdlib_schema = SchemaCodec(f"{schema.name} (schema+json)", schema._fields, base=JsonCodec())
+            rows.append((stdlib_schema.name, *bench(stdlib_schema, obj, number)))
+
+        print(f"\n{label}: {number} iterações")
+        print(f"{'codec':<28}{'encode µs':>12}{'decode µs':>12}{'bytes':>8}")
+        for name, enc, dec, size in rows:
+            print(f"{name:<28}{enc:>12.2f}{dec:>12.2f}{size:>8}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,73 @@
+"""
+Mede o custo por requisição de obter as dependências de uma rota.
+
+Uso: python -m benchmarks.bench_dependencies [requisições]
+
+"por requisição (antes)": monta um grafo novo a cada requisição (pool Redis,
+httpx.AsyncClient, repositórios e serviços), como faziam as factories de
+core.dependencies. É um limite inferior: as factories antigas ainda criavam
+vários Caches (e pools) por chamada.
+"container (agora)": as rotas recebem as instâncias criadas uma vez no lifespan.
+
+Nenhuma conexão é aberta (Redis, Mongo e httpx conectam sob demanda).
+"""
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from core.container import AppContainer
+from core.environment import get_environment
+from utils.cache import Cache
+
+
+def measure(label: str, request, n: int):
+    gc.collect()
+    tracemalloc.start()
+    start_snapshot = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    for _ in range(n):
+        request()
+    elapsed = time.perf_counter() - start
+    end_snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = end_snapshot.compare_to(start_snapshot, "filename")
+    allocated = sum(max(stat.size_diff, 0) for stat in stats)
+    blocks = sum(max(stat.count_diff, 0) for stat in stats)
+    print(f"{label:<28} {elapsed / n * 1e6:>10.1f} µs {allocated / n:>12.0f} B {blocks / n:>10.1f} blocos")
+
+
+async def main(n: int):
+    env = get_environment()
+    db = AsyncIOMotorClient(env.DATABASE_URI, connect=False)[env.DATABASE_NAME]
+    clients = []
+
+    def per_request():
+        graph = AppContainer()
+        redis, http = Cache.create_client(env.REDIS_URL), httpx.AsyncClient(timeout=30)
+        graph.build(db=db, redis=redis, http=http)
+        clients.append(http)
+        return graph.security, graph.chat_service
+
+    shared = AppContainer()
+    shared.build(db=db, redis=Cache.create_client(env.REDIS_URL), http=httpx.AsyncClient(timeout=30))
+
+    def from_container():
+        return shared.security, shared.chat_service
+
+    print(f"{'':<28} {'tempo/req':>13} {'alocado/req':>14} {'':>16}")
+    measure("por requisição (antes)", per_request, n)
+    measure("container (agora)", from_container, n)
+
+    for http in clients:
+        await http.aclose()
+    await shared.http.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -19,7 +19,8 @@ class WhatsAppClient:
                  wa_token: str , 
                  base_url: str ,
                  internal_token: str ,
-                 repository:MessageRepository,):
+                 repository:MessageRepository,
+                 http_client: Optional[httpx.AsyncClient] = None,):
         self.phone_id = phone_id
         self.business_account_id = business_account_id
         self._repo = repository
@@ -30,20 +31,22 @@ class WhatsAppClient:
             "Authorization": f"Bearer {self.wa_token}",
             "Content-Type": "application/json"
         }
+        # Um único AsyncClient (pool de conexões keep-alive) por processo
+        self._http = http_client or httpx.AsyncClient(timeout=30)
+
+    async def aclose(self):
+        await self._http.aclose()
     
 
     async def _send_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Envia request para a API"""
         try:
-            # Note: requests is synchronous and will block the event loop.
-            # Ideally use httpx.AsyncClient or run_in_executor.
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/{self.phone_id}/messages",
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30
-                )
+            response = await self._http.post(
+                f"{self.base_url}/{self.phone_id}/messages",
+                headers=self.headers,
+                json=payload,
+                timeout=30
+            )
             response.raise_for_status()
             res_data = response.json()
         
@@ -90,8 +93,7 @@ class WhatsAppClient:
                 "limit": 100 # Paginação pode ser necessária se houver muitos
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers, params=params, timeout=30)
+            response = await self._http.get(url, headers=self.headers, params=params, timeout=30)
             response.raise_for_status()
             data = response.json()
             return data.get("data", [])
@@ -435,8 +437,7 @@ class WhatsAppClient:
         """Recupera URL de download"""
         try:
             url = f"https://graph.facebook.com/v24.0/{media_id}"
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers, timeout=30)
+            response = await self._http.get(url, headers=self.headers, timeout=30)
             return response.json().get("url")
         except Exception:
             return None
@@ -456,8 +457,7 @@ class WhatsAppClient:
         Requer header Authorization: Bearer {token}
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(media_url, headers=self.headers, timeout=60)
+            response = await self._http.get(media_url, headers=self.headers, timeout=60)
             response.raise_for_status()
             return response.content
         except Exception as e:
@@ -481,7 +481,7 @@ class WhatsAppClient:
                 # Mas precisamos do Authorization. Self.headers tem 'Content-Type': 'application/json', então criamos um novo header
                 headers_upload = {"Authorization": f"Bearer {self.wa_token}"}
                 
-                response = httpx.post(
+                response = await self._http.post(
                     url, 
                     headers=headers_upload, 
                     files=files, 
@@ -0,0 +1,184 @@
+import httpx
+from redis.asyncio import Redis
+
+from core.db import mongo_manager
+from core.environment import get_environment
+
+from repositories.message import MessageRepository
+from repositories.chat_repo import ChatRepository
+from repositories.attendant import AttendantRepository
+from repositories.config import ConfigRepository
+from repositories.template import TemplateRepository
+from repositories.contact import ContactRepository
+
+from services.attendant_service import AttendantService
+from services.chat_service import ChatService
+from services.contact_service import ContactService
+from services.message_service import MessageService
+from services.config_service import ConfigService
+from services.inactivity_service import InactivityScheduler
+from services.window_service import ConversationWindowTracker
+from services.chat_state_buffer import ChatStateBuffer
+from services.load_service import AttendantLoad
+from services.inbox_service import AttendantInbox
+from services.chat_state_store import ChatStateStore
+from services.queue_service import SectorQueue
+from services.change_feed import ChangeFeed
+
+from client.whatsapp.V24 import WhatsAppClient
+from utils.cache import Cache
+from utils.client_cache import ClientSideCache
+from utils.memory_backend import MemoryRedis
+from utils.password_hasher import PasswordHasher
+from utils.security import Security
+
+
+class AppContainer:
+    """
+    Objetos de vida longa da aplicação, criados uma única vez no lifespan.
+
+    Um client Motor, um pool Redis, um httpx.AsyncClient e uma instância de
+    cada repositório/serviço por processo; `core.dependencies` apenas os entrega.
+    """
+
+    def __init__(self):
+        self._env = get_environment()
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self):
+        if self._started:
+            return
+        env = self._env
+
+        # Conexões (pools compartilhados)
+        await mongo_manager.connect()
+        self.build(
+            db=mongo_manager.get_db(db_name=env.DATABASE_NAME),
+            redis=Cache.create_client(env.REDIS_URL),
+            http=httpx.AsyncClient(timeout=30)
+        )
+        if self.local_cache is not None:
+            await self.local_cache.start()
+        self._started = True
+
+    def build(self, db, redis: Redis | MemoryRedis, http: httpx.AsyncClient):
+        """Monta repositórios e serviços sobre as conexões dadas (sem I/O)."""
+        env = self._env
+        self.db = db
+        self.redis = redis
+        self.http = http
+
+        # 1. Infra
+        self.local_cache = None
+        # No backend em memória os dados já são locais: client-side cache não se aplica
+        if env.REDIS_CLIENT_CACHE and not MemoryRedis.handles(env.REDIS_URL):
+            self.local_cache = ClientSideCache(
+                client=self.redis,
+                prefixes=Cache.CLIENT_CACHE_PREFIXES,
+                max_entries=env.REDIS_CLIENT_CACHE_MAX_ENTRIES
+            )
+        self.cache = Cache(client=self.redis, local_cache=self.local_cache)
+        self.security = Security(cache=self.cache)
+        self.password_hasher = PasswordHasher(max_workers=env.PASSWORD_HASH_WORKERS)
+        self.repositories = {
+            "message_repository": MessageRepository(self.db["messages"]),
+            "chat_repository": ChatRepository(self.db["chats"]),
+            "attendant_repository": AttendantRepository(self.db["attendants"]),
+            "config_repository": ConfigRepository(self.db["configs"]),
+            "template_repository": TemplateRepository(self.db["templates"]),
+            "contact_repository": ContactRepository(self.db["contacts"]),
+        }
+        repos = self.repositories
+        self.clients = {
+            "whatsapp": WhatsAppClient(
+                phone_id=env.WHATSAPP_PHONE_ID,
+                business_account_id=env.WHATSAPP_BUSINESS_ACCOUNT_ID,
+                wa_token=env.WHATSAPP_TOKEN,
+                repository=repos["message_repository"],
+                base_url="https://graph.facebook.com/v24.0",
+                internal_token=env.WHATSAPP_INTERNAL_TOKEN,
+                http_client=self.http
+            )
+        }
+
+        # Um change stream por coleção no cluster (nó líder), repassado aos
+        # websockets de todos os nós pelos canais ws:attendant:{id} / ws:phone:{phone}
+        self.chat_feed = ChangeFeed(
+            "chats",
+            cache=self.cache,
+            watch=repos["chat_repository"].watch_chats,
+            # Chat sem atendente (menu, fila) só chega ao admin; delete só traz
+            # o _id e vai para todos os inscritos
+            key_of=lambda event: event.get("attendant_id"),
+            channel_prefix="ws:attendant:",
+            broadcast_if=lambda event: event.get("action") == "delete"
+        )
+        self.message_feed = ChangeFeed(
+            "messages",
+            cache=self.cache,
+            watch=repos["message_repository"].watch_new_messages,
+            key_of=lambda event: event.get("phone_number"),
+            channel_prefix="ws:phone:"
+        )
+
+        # 2. Serviços
+        self.config_service = ConfigService(repo=repos["config_repository"])
+        self.message_service = MessageService(message_repository=repos["message_repository"], feed=self.message_feed)
+        self.contact_service = ContactService(contact_repository=repos["contact_repository"])
+        self.attendant_service = AttendantService(
+            repository=repos["attendant_repository"],
+            cache=self.cache,
+            security=self.security,
+            hasher=self.password_hasher
+        )
+        self.chat_state = ChatStateStore(cache=self.cache, chat_repo=repos["chat_repository"])
+        self.chat_state_buffer = ChatStateBuffer(chat_repo=repos["chat_repository"])
+        self.inbox = AttendantInbox(cache=self.cache, chat_repo=repos["chat_repository"], state=self.chat_state)
+        self.sector_queue = SectorQueue(cache=self.cache)
+        self.attendant_load = AttendantLoad(cache=self.cache)
+        self.window_tracker = ConversationWindowTracker(cache=self.cache)
+        self.inactivity_scheduler = InactivityScheduler(
+            cache=self.cache,
+            chat_repo=repos["chat_repository"],
+            config_repo=repos["config_repository"],
+            wa_client=self.clients["whatsapp"],
+            inbox=self.inbox,
+            queue=self.sector_queue,
+            load=self.attendant_load
+        )
+        self.chat_service = ChatService(
+            wa_client=self.clients["whatsapp"],
+            chat_repo=repos["chat_repository"],
+            template_repo=repos["template_repository"],
+            config_repo=repos["config_repository"],
+            attendant_service=self.attendant_service,
+            contact_service=self.contact_service,
+            cache=self.cache,
+            inactivity_scheduler=self.inactivity_scheduler,
+            window_tracker=self.window_tracker,
+            state_buffer=self.chat_state_buffer,
+            inbox=self.inbox,
+            chat_state=self.chat_state,
+            queue=self.sector_queue,
+            chat_feed=self.chat_feed,
+            load=self.attendant_load
+        )
+
+    async def stop(self):
+        if not self._started:
+            return
+        self._started = False
+        if self.local_cache is not None:
+            await self.local_cache.stop()
+        self.password_hasher.close()
+        await self.http.aclose()
+        await self.redis.aclose()
+        await mongo_manager.disconnect()
+
+
+# Instância global (uma por processo)
+container = AppContainer()
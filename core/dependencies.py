@@ -1,112 +1,85 @@
-from motor.motor_asyncio import AsyncIOMotorCollection
-
 from core.settings import settings
-from core.db import mongo_manager
-from core.environment import get_environment
-
-from repositories.message import MessageRepository
-from repositories.chat_repo import ChatRepository
-from repositories.attendant import AttendantRepository
-from repositories.config import ConfigRepository
-from repositories.template import TemplateRepository
-from repositories.contact import ContactRepository
+from core.container import container
 
 from services.attendant_service import AttendantService
 from services.chat_service import ChatService
 from services.contact_service import ContactService
 from services.message_service import MessageService
 from services.config_service import ConfigService
+from services.inactivity_service import InactivityScheduler
+from services.window_service import ConversationWindowTracker
+from services.inbox_service import AttendantInbox
+from services.chat_state_store import ChatStateStore
+from services.queue_service import SectorQueue
 
-from client.whatsapp.V24 import WhatsAppClient
 from utils.cache import Cache
+from utils.password_hasher import PasswordHasher
 from utils.security import Security
 
+# Providers para `Depends(...)`: apenas entregam as instâncias criadas uma única
+# vez pelo container no lifespan (nada é construído por requisição).
+
+
 def get_settings():
 	return settings
 
 
-env = get_environment()
+def get_cache() -> Cache:
+	"""Retorna o cache compartilhado."""
+	return container.cache
 
+def get_repositories() -> dict:
+    """Retorna todas as instâncias dos repositórios."""
+    return container.repositories
 
-def get_db_collection(collection_name: str) -> AsyncIOMotorCollection:
-	"""Retorna uma coleção do MongoDB."""
-	db = mongo_manager.get_db(db_name=env.DATABASE_NAME)
-	return db[collection_name]
+def get_security() -> Security:
+    """Retorna a instância do Security."""
+    return container.security
 
-def get_cache():
-	"""Retorna uma instância do cache."""
-	return Cache(env.REDIS_URL)
+def get_password_hasher() -> PasswordHasher:
+    """Retorna o pool de hash/verificação de senhas."""
+    return container.password_hasher
 
-def get_repositories():
-    """Retorna todas as instâncias dos repositórios."""
-    return {
-        "message_repository": MessageRepository(
-            get_db_collection("messages")
-        ),
-        "chat_repository": ChatRepository(
-            get_db_collection("chats")
-        ),
-        "attendant_repository": AttendantRepository(
-            get_db_collection("attendants")
-        ),
-        "config_repository": ConfigRepository(
-            get_db_collection("configs")
-        ),
-        "template_repository": TemplateRepository(
-            get_db_collection("templates")
-        ),
-        "contact_repository": ContactRepository(
-            get_db_collection("contacts")
-        )
-    }
-
-def get_security():
-    """Retorna uma instância do Security."""
-    return Security()
-
-def get_config_service():
-    """Retorna uma instância do ConfigService."""
-    return ConfigService(
-        repo=(get_repositories())["config_repository"]
-    )
-def get_clients():
+def get_config_service() -> ConfigService:
+    """Retorna a instância do ConfigService."""
+    return container.config_service
+
+def get_clients() -> dict:
 	"""Retorna todos os clients instanciados."""
-	return {
-		"whatsapp": WhatsAppClient(
-			phone_id=env.WHATSAPP_PHONE_ID,
-			business_account_id=env.WHATSAPP_BUSINESS_ACCOUNT_ID,
-			wa_token=env.WHATSAPP_TOKEN,
-            repository=get_repositories()["message_repository"],
-			base_url="https://graph.facebook.com/v24.0",
-			internal_token=env.WHATSAPP_INTERNAL_TOKEN
-		)
-	}
-def get_attendant_service():
-    """Retorna uma instância do AttendantService."""
-    return AttendantService(
-        repository=(get_repositories())["attendant_repository"],
-        cache=get_cache(),
-        security=get_security()
-    )
-def get_contact_service():
-    """Retorna uma instância do ContactService."""
-    return ContactService(
-        contact_repository=(get_repositories())["contact_repository"]
-    )
-def get_chat_service():
+	return container.clients
+
+def get_attendant_service() -> AttendantService:
+    """Retorna a instância do AttendantService."""
+    return container.attendant_service
+
+def get_contact_service() -> ContactService:
+    """Retorna a instância do ContactService."""
+    return container.contact_service
+
+def get_chat_state_store() -> ChatStateStore:
+    """Retorna o store do estado dos chats (hash por telefone)."""
+    return container.chat_state
+
+def get_inbox() -> AttendantInbox:
+    """Retorna a inbox materializada dos atendentes."""
+    return container.inbox
+
+def get_sector_queue() -> SectorQueue:
+    """Retorna as filas de espera por setor."""
+    return container.sector_queue
+
+def get_inactivity_scheduler() -> InactivityScheduler:
+    """Retorna o agendador de encerramento por inatividade."""
+    return container.inactivity_scheduler
+
+def get_window_tracker() -> ConversationWindowTracker:
+    """Retorna o rastreador da janela de 24h."""
+    return container.window_tracker
+
+def get_chat_service() -> ChatService:
     """Retorna chat service"""
-    return ChatService(
-            wa_client=(get_clients())["whatsapp"],
-			chat_repo= (get_repositories())["chat_repository"],
-			template_repo= (get_repositories())["template_repository"],
-			config_repo= (get_repositories())["config_repository"],
-			attendant_service=get_attendant_service(),
-            contact_service=get_contact_service(),
-            cache=get_cache()
-    )
-
-def get_message_service():
+    return container.chat_service
+
+def get_message_service() -> MessageService:
     """Retorna message service"""
-    return MessageService(
-        message_repository=(get_repositories())["message_repository"],
-    )
\ No newline at end of file
+    return container.message_service
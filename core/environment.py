@@ -16,6 +16,14 @@ class EnvironmentSettings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_SECONDS:int
     
     REDIS_URL: str
+    # Client-side caching (CLIENT TRACKING) de config/atendentes/setores
+    REDIS_CLIENT_CACHE: bool = False
+    REDIS_CLIENT_CACHE_MAX_ENTRIES: int = 10000
+    # Threads para bcrypt (hash/verificação de senha fora do event loop)
+    PASSWORD_HASH_WORKERS: int = 4
+    # Websockets: fila de saída por socket e política para cliente lento ("drop_oldest" | "disconnect")
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
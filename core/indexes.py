@@ -7,9 +7,17 @@ env = get_environment()
 async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
     messages = db.get_collection("messages")
     chats = db.get_collection("chats")
+    attendants = db.get_collection("attendants")
 
     await chats.create_index("phone_number", unique=True)
     await chats.create_index("attendant_id")
+    # Inbox do atendente paginado por keyset (attendant_id + last_interaction_at desc,
+    # desempate pelo telefone); substitui o índice sem o telefone
+    try:
+        await chats.drop_index("attendant_id_1_last_interaction_at_-1")
+    except:
+        pass
+    await chats.create_index([("attendant_id", 1), ("last_interaction_at", -1), ("phone_number", -1)])
     # Garante índice único pelo ID da mensagem (WAMID)
     await messages.create_index("message_id", unique=True)
     
@@ -19,4 +27,8 @@ async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
     except:
         pass
         
-    await messages.create_index("from")
\ No newline at end of file
+    await messages.create_index("from")
+
+    # Fallback do índice reverso cliente -> atendente fixo (multikey; `sector` também
+    # é array e o Mongo não indexa dois arrays no mesmo índice composto)
+    await attendants.create_index("clients")
@@ -1,22 +1,142 @@
+import asyncio
 from fastapi import WebSocket
-from typing import Dict
+from typing import Any, Dict, List, Set
+
+from core.environment import get_environment
+
+env = get_environment()
+
+
+class Connection:
+    """
+    Um websocket aberto. As mensagens entram em uma fila limitada e são
+    enviadas por uma task própria: um cliente lento não trava quem produz o
+    evento (watchers, webhooks) nem os demais sockets.
+
+    Fila cheia (consumidor lento):
+    - "drop_oldest": descarta a mensagem mais antiga da fila e enfileira a nova;
+    - "disconnect": fecha o socket (1013) e o cliente reconecta e recarrega.
+    """
+    def __init__(self, manager: "ConnectionManager", user_id: str, websocket: WebSocket,
+                 max_queue: int, policy: str) -> None:
+        self.user_id = user_id
+        self.websocket = websocket
+        self.policy = policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.sent = 0
+        self.dropped = 0
+        self.high_water = 0
+        self.closed = False
+        self._manager = manager
+        self._writer = asyncio.create_task(self._write())
+        # Fechamento por consumidor lento (referência mantida até o stop)
+        self._closer: asyncio.Task | None = None
+
+    def send(self, message: dict) -> bool:
+        """Enfileira sem bloquear; False se a mensagem (ou o socket) foi descartada."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.policy == "disconnect":
+                self._manager.slow_disconnects += 1
+                self.closed = True
+                self._closer = asyncio.create_task(self.close(code=1013))
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.dropped += 1
+            self._manager.dropped += 1
+        self.high_water = max(self.high_water, self.queue.qsize())
+        return True
+
+    async def _write(self):
+        try:
+            while not (self.closed and self.queue.empty()):
+                message = await self.queue.get()
+                await self.websocket.send_json(message)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket fechado pelo cliente: o loop de leitura do handler faz a limpeza
+            self.closed = True
+
+    async def close(self, code: int = 1000):
+        if self.closed and self._writer.done():
+            return
+        self.closed = True
+        self._writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def stop(self):
+        """
+        Não aceita novas mensagens; o writer termina de enviar o que já está na
+        fila (ex: o erro enviado antes do handler encerrar) e sai. Um fechamento
+        por consumidor lento ainda pendente é cancelado: o handler já está saindo.
+        """
+        self.closed = True
+        if self.queue.empty():
+            self._writer.cancel()
+        if self._closer is not None and not self._closer.done():
+            self._closer.cancel()
+
 
 class ConnectionManager:
-    def __init__(self):
-        # Dicionário para mapear {user_id: websocket_object}
-        self.active_connections: Dict[str, WebSocket] = {}
+    def __init__(self, max_queue: int = 256, policy: str = "drop_oldest"):
+        # {user_id: {conexões}}: o mesmo atendente pode ter várias abas/sockets abertos
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        self.max_queue = max_queue
+        self.policy = policy
+        # Totais do processo (sobrevivem ao fechamento das conexões)
+        self.dropped = 0
+        self.slow_disconnects = 0
 
-    async def connect(self, user_id: str, websocket: WebSocket):
-        self.active_connections[user_id] = websocket
+    async def connect(self, user_id: str, websocket: WebSocket) -> Connection:
+        connection = Connection(self, user_id, websocket, self.max_queue, self.policy)
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        return connection
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
+    def disconnect(self, user_id: str, websocket: WebSocket | None = None):
+        """Remove o socket do usuário (ou todos, sem `websocket`)."""
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return
+        for connection in list(connections):
+            if websocket is None or connection.websocket is websocket:
+                connection.stop()
+                connections.discard(connection)
+        if not connections:
             del self.active_connections[user_id]
 
+    def connections(self, user_id: str) -> List[Connection]:
+        return list(self.active_connections.get(user_id, ()))
+
     async def send_personal_message(self, message: dict, user_id: str):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_json(message)
+        """Entrega a todos os sockets do usuário (sem aguardar o envio)."""
+        for connection in self.connections(user_id):
+            connection.send(message)
+
+    def snapshot(self) -> Dict[str, Any]:
+        connections = [c for group in self.active_connections.values() for c in group]
+        depths = [c.queue.qsize() for c in connections]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(connections),
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "queued": sum(depths),
+            "max_depth": max(depths, default=0),
+            "high_water": max((c.high_water for c in connections), default=0),
+            "sent": sum(c.sent for c in connections),
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+        }
 
 
 # Instância global para ser usada nas rotas e nos webhooks
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(max_queue=env.WS_SEND_QUEUE_SIZE, policy=env.WS_SLOW_CONSUMER_POLICY)
@@ -25,6 +25,8 @@ class Attendant:
     welcome_message: Optional[str] = None
     # Key: Day of week (0=Monday, 6=Sunday), Value: List of intervals
     working_hours: Optional[Dict[str, List[WorkInterval]]] = None
+    # Maximum simultaneous open chats (None = unlimited)
+    capacity: Optional[int] = None
     _id: Optional[str] = None
 
     def __post_init__(self):
@@ -37,11 +39,12 @@ class Attendant:
         """Verify if the provided password matches the stored hashed password."""
         return bcrypt.checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
 
-    def is_bcrypt_hash(self, s: str) -> bool:
+    @staticmethod
+    def is_bcrypt_hash(s: str) -> bool:
         return bool(re.match(r'^\$2[aby]\$\d{2}\$.{53}$', s))
     
     def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt."""
+        """Hash a password using bcrypt (blocking: async code should use utils.password_hasher)."""
         salt = bcrypt.gensalt()
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
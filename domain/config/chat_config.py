@@ -5,7 +5,7 @@ from dataclasses import dataclass
 class ButtonOption(BaseModel):
     id: str
     title: str
-    queue_id: Optional[str] = None # To map "btn_financeiro" -> "QUEUE_FIN"
+    queue_id: Optional[str] = None # Fila de espera do botão (ex: "QUEUE_FIN"); sem ele, a fila é a do setor
     sector: Optional[str] = None # To map "btn_comercial" -> "Comercial"
 
 @dataclass
@@ -25,13 +25,16 @@ class ChatConfig(BaseModel):
     
     # Message templates
     attendant_assigned_message: str = "✅ Você está sendo atendido por *{attendant_name}*."
-    queue_redirect_message: str = "📝 Encaminhado para {sector}. Aguarde um momento."
+    # Placeholders: {sector}, {position} (posição na fila) e {eta_minutes} (espera estimada)
+    queue_redirect_message: str = "📝 Encaminhado para {sector}. Você é o {position}º da fila (espera estimada: ~{eta_minutes} min)."
     
     working_hours_message: str = "Estamos fora do nosso horário de atendimento. Envie sua mensagem, assim que retornarmos, entraremos em contato!"
 
     absence_message: str = "💤 O atendente responsável não está em horário de serviço no momento."
     not_found_message: str = "🚫 Nenhum atendente vinculado ao seu número."
     working_hours: Optional[Dict[str, List[WorkInterval]]] = None
-    inactivity_closed_message: str = "🕒 Chat encerrado por inatividade (30min)."
+    # Placeholder: {minutes} (inactivity_timeout_minutes)
+    inactivity_closed_message: str = "🕒 Chat encerrado por inatividade ({minutes}min)."
+    inactivity_timeout_minutes: int = 30
     
     _id: Optional[str] = None
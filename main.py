@@ -1,5 +1,6 @@
 """Main application for the Documents service with async RabbitMQ integration."""
 
+import asyncio
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -8,18 +9,8 @@ from routes.chat_routes import admin_chat_ws, attendant_chat_ws
 from contextlib import asynccontextmanager
 from core.websocket import manager
 from core.indexes import ensure_indexes
-from core.db import mongo_manager
+from core.container import container
 from core.environment import get_environment
-from core.dependencies import (get_clients,
-                                get_cache,
-                                get_repositories,
-                                get_security,
-                                get_chat_service, 
-                                get_config_service,
-                                get_attendant_service,
-                                get_contact_service,
-                                get_message_service,
-                                get_settings)
 
 env = get_environment()
 
@@ -27,36 +18,53 @@ env = get_environment()
 async def lifespan(app: FastAPI):
     """Manage application lifecycle: startup and shutdown."""
     
-    # Startup s
-    await mongo_manager.connect()
+    # Startup: conexões, repositórios e serviços são criados uma única vez
+    await container.start()
 
     try:
-        db = mongo_manager.get_db(db_name=env.DATABASE_NAME)
-        await ensure_indexes(db)
+        await ensure_indexes(container.db)
     except Exception:
         pass
-    
-    # Initialize async dependency factories after DB is connected so they
-    # don't try to access the DB before `mongo_manager.connect()` runs.
+
+    # Read model dos atendentes (hash, login, sets de setor/permissão) a partir do Mongo
     try:
-        await get_config_service()
-        await get_message_service()
-        await get_contact_service()
-        await get_attendant_service()
-        await get_chat_service()
-        await get_cache()
-        await get_repositories()
-        await get_security()
-        await get_clients()
-        # `get_settings()` is synchronous; call it to ensure settings are loaded
-        get_settings()
-    except Exception:
-        # Ignore initialization errors here; individual endpoints will surface problems.
-        pass
+        await container.attendant_service.rebuild_cache()
+    except Exception as e:
+        print(f"⚠️ Falha ao reconstruir o cache de atendentes: {e}")
+
+    # Chats abertos por atendente (capacidade no roteamento) a partir do Mongo
+    try:
+        await container.attendant_load.rebuild(await container.repositories["chat_repository"].count_open_by_attendant())
+    except Exception as e:
+        print(f"⚠️ Falha ao reconstruir a carga dos atendentes: {e}")
+
+    # Buffer write-behind do estado dos chats (mescla rajadas de mensagens)
+    await container.chat_state_buffer.start()
+
+    # Worker de encerramento por inatividade (apenas o líder eleito processa)
+    stop_event = asyncio.Event()
+    inactivity_task = asyncio.create_task(container.inactivity_scheduler.run_forever(stop_event))
+    # Promoção das filas de espera por setor (atendente entrou no turno / liberou)
+    queue_task = asyncio.create_task(container.sector_queue.run_forever(stop_event, container.chat_service.drain_queues))
+    # Amostra de chaves/memória por namespace exportada em /metrics
+    sampler_task = asyncio.create_task(container.cache.run_keyspace_sampler(stop_event))
+    # Revogação de tokens (logout) propagada para o cache de tokens verificados
+    revocation_task = asyncio.create_task(container.security.run_forever(stop_event))
+    # Change streams (chats e mensagens): o líder publica no Redis, todo nó entrega aos seus websockets
+    chat_feed_task = asyncio.create_task(container.chat_feed.run_forever(stop_event))
+    message_feed_task = asyncio.create_task(container.message_feed.run_forever(stop_event))
 
     yield
 
-    await mongo_manager.disconnect()
+    stop_event.set()
+    await inactivity_task
+    await queue_task
+    await sampler_task
+    await revocation_task
+    await chat_feed_task
+    await message_feed_task
+    await container.chat_state_buffer.stop()
+    await container.stop()
 
 from routes.webhook import router as webhook_router
 from routes.attendants import router as attendants_router
@@ -64,6 +72,7 @@ from routes.config import router as config_router
 from routes.chat_routes import router as chats_router
 from routes.messages import router as messages_router
 from routes.contacts import router as contacts_router
+from routes.metrics import router as metrics_router
 
 
 app = FastAPI(title="Whatsapp Cloud API", lifespan=lifespan)
@@ -82,6 +91,7 @@ app.include_router(config_router)
 app.include_router(chats_router)
 app.include_router(messages_router)
 app.include_router(contacts_router)
+app.include_router(metrics_router)
 
 
 @app.websocket("/messages/ws")
@@ -1,5 +1,6 @@
 from typing import List
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 def _serialize_doc(doc: dict) -> dict:
     if doc is None:
@@ -24,6 +25,15 @@ class AttendantRepository():
         result = await self._collection.update_one({"_id": ObjectId(_id)}, {"$set": data})
         return result.modified_count
     
+    async def find_and_update(self, _id:str, data:dict):
+        """Aplica o $set e retorna o documento anterior (None se não existir)."""
+        result = await self._collection.find_one_and_update(
+            {"_id": ObjectId(_id)},
+            {"$set": data},
+            return_document=ReturnDocument.BEFORE
+        )
+        return _serialize_doc(result)
+
     async def list(self, filter:dict = None):
         cursor = self._collection.find(filter or {})
         results = await cursor.to_list(length=None)
@@ -33,6 +43,11 @@ class AttendantRepository():
         result = await self._collection.delete_one({"_id": ObjectId(_id)})
         return result.deleted_count
 
+    async def find_and_delete(self, _id:str):
+        """Remove e retorna o documento removido (None se não existir)."""
+        result = await self._collection.find_one_and_delete({"_id": ObjectId(_id)})
+        return _serialize_doc(result)
+
     async def find_by_client_and_sector(self, client_phone: str, sector: str):
         # Case insensitive sector search might be good, but strict for now
         result = await self._collection.find_one({
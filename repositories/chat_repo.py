@@ -2,7 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorCollection
 from domain.chat.chats import  ChatStatus
 from typing import Optional, List, Dict
 from bson import ObjectId
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, UpdateOne
 
 def _serialize_doc(doc: dict) -> dict:
     """Convert MongoDB ObjectId to string for JSON serialization."""
@@ -38,9 +38,10 @@ class ChatRepository:
         results = await cursor.to_list(length=limit)
         return [_serialize_doc(doc) for doc in results]
     
-    async def watch_chats(self, attendant_id: Optional[str] = None):
+    async def watch_chats(self, attendant_id: Optional[str] = None, start_after: Optional[dict] = None):
         """
         Monitora insert, update e delete de forma segura.
+        Produz (resume token, evento); `start_after` retoma depois de um token salvo.
         """
         pipeline = []
         
@@ -60,13 +61,13 @@ class ChatRepository:
 
         pipeline.append({"$match": match_conditions})
 
-        async with self._collection.watch(pipeline, full_document="updateLookup") as stream:
+        async with self._collection.watch(pipeline, full_document="updateLookup", start_after=start_after) as stream:
             async for change in stream:
                 op_type = change.get("operationType")
                 
                 if op_type == "delete":
                     # No delete, enviamos apenas o ID para o front remover da lista
-                    yield {
+                    yield change["_id"], {
                         "action": "delete",
                         "_id": str(change.get("documentKey", {}).get("_id"))
                     }
@@ -74,7 +75,7 @@ class ChatRepository:
                     doc = _serialize_doc(change.get("fullDocument"))
                     if doc:
                         doc["action"] = op_type
-                        yield doc
+                        yield change["_id"], doc
 
     async def get_active_chats(self):
         try:
@@ -111,14 +112,34 @@ class ChatRepository:
     async def get_chats_by_attendant(self, 
                                         attendant_id: str, 
                                         limit:int = 50, 
-                                        skip:int = 0):
+                                        before: Optional[int] = None,
+                                        before_phone: Optional[str] = None) -> List[Dict]:
         
-        """Busca todas as sessões de um atendente, opcionalmente filtradas por status."""
-        
-        cursor = self._collection.find({"attendant_id": attendant_id}).sort("last_interaction_at", -1).limit(limit).skip(skip)
+        """
+        Busca as sessões de um atendente, mais recentes primeiro (empate: telefone desc).
+        Paginação por keyset: `before`/`before_phone` são o last_interaction_at e o
+        telefone do último item da página anterior; sem o telefone, corta pelo score.
+        """
+        query = {"attendant_id": attendant_id}
+        if before is not None and before_phone is not None:
+            query["$or"] = [
+                {"last_interaction_at": {"$lt": before}},
+                {"last_interaction_at": before, "phone_number": {"$lt": before_phone}},
+            ]
+        elif before is not None:
+            query["last_interaction_at"] = {"$lt": before}
 
-        async for doc in cursor:
-            yield _serialize_doc(doc)
+        cursor = self._collection.find(query).sort([("last_interaction_at", -1), ("phone_number", -1)]).limit(limit)
+        results = await cursor.to_list(length=limit)
+        return [_serialize_doc(doc) for doc in results]
+
+    async def get_chats_by_phones(self, phones: List[str]) -> List[Dict]:
+        """Busca as sessões de uma lista de telefones em uma única consulta."""
+        if not phones:
+            return []
+        cursor = self._collection.find({"phone_number": {"$in": phones}})
+        results = await cursor.to_list(length=len(phones))
+        return [_serialize_doc(doc) for doc in results]
 
     async def get_all_chats(self,limit: int = 300, skip : int = 0):
         """Busca todas as sessões, opcionalmente filtradas por status."""
@@ -153,6 +174,66 @@ class ChatRepository:
         )
         return response.modified_count > 0
     
+    async def count_open_by_attendant(self) -> Dict[str, int]:
+        """Chats ainda não encerrados com atendente, por atendente ({id: quantidade})."""
+        cursor = self._collection.aggregate([
+            {"$match": {"status": {"$ne": ChatStatus.CLOSED.value}, "attendant_id": {"$ne": None}}},
+            {"$group": {"_id": "$attendant_id", "open": {"$sum": 1}}},
+        ])
+        return {str(doc["_id"]): doc["open"] async for doc in cursor}
+
+    async def close_inactive_chats(self, phones: List[str], cutoff: int, closed_at: int) -> tuple:
+        """
+        Fecha em lote os chats abertos cuja última interação do cliente é <= cutoff.
+        Retorna (chats fechados por esta chamada, {telefone: last_client_interaction_at}
+        dos que continuam abertos por terem interagido depois do cutoff).
+        """
+        if not phones:
+            return [], {}
+
+        open_statuses = {"$in": [ChatStatus.ACTIVE.value, ChatStatus.WAITING_MENU.value]}
+        guard = {
+            "status": open_statuses,
+            "last_client_interaction_at": {"$lte": cutoff},
+        }
+        cursor = self._collection.find(
+            {"phone_number": {"$in": phones}, "status": open_statuses},
+            {"phone_number": 1, "attendant_id": 1, "last_client_interaction_at": 1}
+        )
+        open_chats = [_serialize_doc(doc) for doc in await cursor.to_list(length=len(phones))]
+        candidates = [c for c in open_chats if (c.get("last_client_interaction_at") or 0) <= cutoff]
+        pending = {
+            c["phone_number"]: c["last_client_interaction_at"]
+            for c in open_chats if (c.get("last_client_interaction_at") or 0) > cutoff
+        }
+        if not candidates:
+            return [], pending
+
+        # O filtro é repetido no update: se o cliente falou entre o find e o write, o chat fica aberto
+        operations = [
+            UpdateOne(
+                {"phone_number": c["phone_number"], **guard},
+                {"$set": {"status": ChatStatus.CLOSED.value, "closed_at": closed_at}}
+            ) for c in candidates
+        ]
+        result = await self._collection.bulk_write(operations, ordered=False)
+        if result.modified_count == len(candidates):
+            return candidates, pending
+
+        # Parte não foi fechada: só contam os que ficaram com este `closed_at`; os que
+        # continuam abertos (cliente falou no meio) voltam para o reagendamento
+        cursor = self._collection.find(
+            {"phone_number": {"$in": [c["phone_number"] for c in candidates]}},
+            {"phone_number": 1, "status": 1, "closed_at": 1, "last_client_interaction_at": 1}
+        )
+        closed_phones = set()
+        async for doc in cursor:
+            if doc.get("status") == ChatStatus.CLOSED.value and doc.get("closed_at") == closed_at:
+                closed_phones.add(doc["phone_number"])
+            elif doc.get("status") != ChatStatus.CLOSED.value:
+                pending[doc["phone_number"]] = doc.get("last_client_interaction_at") or 0
+        return [c for c in candidates if c["phone_number"] in closed_phones], pending
+
     async def update(self, data:dict, phone_number:str):
         # Update and return the updated document so callers receive the new state
         try:
@@ -165,6 +246,18 @@ class ChatRepository:
         except Exception:
             return None
     
+    async def update_many(self, updates: Dict[str, dict]) -> int:
+        """Aplica várias atualizações ({telefone: campos}) em um único bulk_write."""
+        if not updates:
+            return 0
+
+        operations = [
+            UpdateOne({"phone_number": phone}, {"$set": data})
+            for phone, data in updates.items()
+        ]
+        result = await self._collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
     async def assign_attendant(self, phone: str, attendant_id: str, category: str):
         response = await self._collection.update_one(
             {"phone_number": phone},
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pymongo import UpdateOne
 from bson import ObjectId
 
@@ -58,10 +58,16 @@ class MessageRepository():
         async for msg in cursor:
             yield _serialize_doc(msg)
 
-    async def watch_new_messages(self, phone: str):
-        """Abre um stream de mudanças no MongoDB."""
-        pipeline = [{"$match": {"operationType": "insert", "fullDocument.phone_number": phone}}]
+    async def watch_new_messages(self, phone: Optional[str] = None, start_after: Optional[dict] = None):
+        """
+        Abre um stream de mudanças no MongoDB (de um telefone ou de todos).
+        Produz (resume token, mensagem); `start_after` retoma depois de um token salvo.
+        """
+        match = {"operationType": "insert"}
+        if phone:
+            match["fullDocument.phone_number"] = phone
+        pipeline = [{"$match": match}]
         # full_document="updateLookup" garante que recebemos o objeto inteiro
-        async with self._collection.watch(pipeline, full_document="updateLookup") as stream:
+        async with self._collection.watch(pipeline, full_document="updateLookup", start_after=start_after) as stream:
             async for change in stream:
-                yield _serialize_doc(change["fullDocument"])
\ No newline at end of file
+                yield change["_id"], _serialize_doc(change["fullDocument"])
\ No newline at end of file
@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status, Body, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
 from core.dependencies import get_attendant_service, get_security
 from typing import List, Optional, Dict
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from services.attendant_service import AttendantService
+from utils.security import Security
 
 fastapi_security = HTTPBearer()
 
@@ -22,6 +23,19 @@ class AttendantCreate(BaseModel):
     clients: List[str] = []
     welcome_message: Optional[str] = None
     working_hours: Optional[Dict[str, List[WorkIntervalSchema]]] = None
+    # Chats abertos ao mesmo tempo (None = sem limite)
+    capacity: Optional[int] = Field(default=None, ge=1)
+
+
+class AttendantUpdate(BaseModel):
+    name: Optional[str] = None
+    password: Optional[str] = None
+    permission: Optional[str] = None
+    sector: Optional[List[str]] = None
+    clients: Optional[List[str]] = None
+    welcome_message: Optional[str] = None
+    working_hours: Optional[Dict[str, List[WorkIntervalSchema]]] = None
+    capacity: Optional[int] = Field(default=None, ge=1)
 
 
 class AttendantRoutes():
@@ -38,28 +52,44 @@ class AttendantRoutes():
         self.router.add_api_route("/login", self.login, methods=["POST"], status_code=status.HTTP_200_OK)
         self.router.add_api_route("/logout", self.logout, methods=["POST"], status_code=status.HTTP_200_OK)
         self.router.add_api_route("/", self.list_attendants, methods=["GET"], response_model=List[dict], status_code=status.HTTP_200_OK)
+        self.router.add_api_route("/{attendant_id}", self.update_attendant, methods=["PATCH"], status_code=status.HTTP_200_OK)
 
     async def create_attendant(
         self,
         attendant: AttendantCreate = Body(...),
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        attendant_service: AttendantService = Depends(get_attendant_service),
     ):
         """
         Cria um novo atendente.
         """
-        security = get_security()
-        attendant_service = get_attendant_service()
         await security.verify_permission(token.credentials, ["admin"])
         result = await attendant_service.create_attendant(attendant.model_dump())
         return {"id": str(result), "message": "Attendant created successfully"}
 
+    async def update_attendant(
+        self,
+        attendant_id: str,
+        attendant: AttendantUpdate = Body(...),
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        attendant_service: AttendantService = Depends(get_attendant_service),
+    ):
+        """
+        Atualiza os campos enviados do atendente (ex: `capacity`; null remove o limite).
+        """
+        await security.verify_permission(token.credentials, ["admin"])
+        await attendant_service.update_attendant(attendant_id, attendant.model_dump(exclude_unset=True))
+        return {"id": attendant_id, "message": "Attendant updated successfully"}
+
     async def login(self,
-        self_form_data: OAuth2PasswordRequestForm = Depends()
+        self_form_data: OAuth2PasswordRequestForm = Depends(),
+        attendant_service: AttendantService = Depends(get_attendant_service)
     ):
         """
         Realiza login e retorna token JWT.
         """
-        attendant_service = get_attendant_service()
         attendant = await attendant_service.authenticate_attendant(self_form_data.username, self_form_data.password)
         if not attendant:
             raise HTTPException(
@@ -78,12 +108,12 @@ class AttendantRoutes():
 
     async def list_attendants(self,
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        attendant_service: AttendantService = Depends(get_attendant_service),
     ):
         """
         Lista todos os atendentes.
         """
-        security = get_security()
-        attendant_service = get_attendant_service()
         await security.verify_permission(token.credentials, ["admin"])
         attendants = await attendant_service.list_attendants()
         for att in attendants:
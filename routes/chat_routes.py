@@ -8,6 +8,8 @@ import json
 
 from core.websocket import manager
 from core.dependencies import get_chat_service, get_security
+from services.chat_service import ChatService
+from utils.security import Security
 import logging
 
 async def attendant_chat_ws(websocket: WebSocket):
@@ -26,7 +28,7 @@ async def attendant_chat_ws(websocket: WebSocket):
         
         decoded = await security.verify_permission(token, allowed_permissions=["admin", "user"])
         attendant_id = str(decoded.get("_id"))
-        await manager.connect(attendant_id, websocket)
+        connection = await manager.connect(attendant_id, websocket)
 
         # --- 2. Handshake Inicial ---
         # Usamos receive_json para facilitar a vida
@@ -37,16 +39,29 @@ async def attendant_chat_ws(websocket: WebSocket):
         if "admin" not in decoded.get("permissions", []) and target_attendant != attendant_id:
             target_attendant = attendant_id 
 
-        # Carga Inicial
-        initial_msgs = await chat_service.get_chats_by_attendant(target_attendant)
-        await websocket.send_json({"type": "initial", "data": initial_msgs})
+        # Carga Inicial (primeira página da inbox + cursor para as próximas).
+        # `cursor`: posição no stream de eventos; o cliente guarda o último recebido
+        async def send_initial():
+            cursor = await chat_service.current_stream_cursor()
+            initial_page = await chat_service.get_inbox_page(target_attendant)
+            connection.send({"type": "initial", "data": initial_page["data"], "next_cursor": initial_page["next_cursor"], "cursor": cursor})
+
+        # Reconexão: { "attendant": ..., "cursor": <último cursor> } recebe só os eventos perdidos
+        resume_cursor = data_init.get("cursor")
+        resume_cursor = int(resume_cursor) if str(resume_cursor).isdigit() else None
+        if resume_cursor is None:
+            await send_initial()
 
         # --- 3. Task de Watcher (Push em Tempo Real) ---
         async def watch_task():
             try:
-                async for new_msg in chat_service.stream_chats(attendant=target_attendant):
+                async for event in chat_service.stream_chats(attendant=target_attendant, after=resume_cursor):
                     if stop_event.is_set(): break
-                    await manager.send_personal_message({"type": "new_message", "data": new_msg}, attendant_id)
+                    if event.get("resync"):
+                        # Eventos perdidos já saíram do buffer: recarrega a inbox
+                        await send_initial()
+                        continue
+                    connection.send({"type": "new_message", "data": event["data"], "cursor": event["cursor"]})
             except Exception as e:
                 print(f"Watcher error: {e}")
 
@@ -58,11 +73,14 @@ async def attendant_chat_ws(websocket: WebSocket):
             action = data.get("action")
 
             if action == "load_more":
+                # { "action": "load_more", "cursor": "<next_cursor>", "limit": 50 }
                 # Criamos uma task separada para o histórico NÃO travar este loop
-                async def fetch_history():
-                    # Supondo que você use paginação/timestamp aqui
-                    history = await chat_service.get_chats_by_attendant(target_attendant)
-                    await manager.send_personal_message({"type": "history", "data": history}, attendant_id)
+                limit = data.get("limit")
+                limit = int(limit) if str(limit).isdigit() and int(limit) > 0 else 50
+
+                async def fetch_history(cursor=data.get("cursor"), limit=min(limit, 200)):
+                    page = await chat_service.get_inbox_page(target_attendant, cursor=cursor, limit=limit)
+                    connection.send({"type": "history", "data": page["data"], "next_cursor": page["next_cursor"]})
                 
                 asyncio.create_task(fetch_history())
 
@@ -73,7 +91,7 @@ async def attendant_chat_ws(websocket: WebSocket):
     finally:
         stop_event.set()
         if bg_task: bg_task.cancel() # Limpeza de memória
-        if attendant_id: manager.disconnect(attendant_id)
+        if attendant_id: manager.disconnect(attendant_id, websocket)
 
 async def admin_chat_ws(websocket: WebSocket):
     await websocket.accept()
@@ -91,28 +109,41 @@ async def admin_chat_ws(websocket: WebSocket):
         
         decoded = await security.verify_permission(token, allowed_permissions=["admin"])
         admin_id = str(decoded.get("_id"))
-        await manager.connect(admin_id, websocket)
+        connection = await manager.connect(admin_id, websocket)
 
         # --- 2. Carga Inicial (Os chats DO ADMIN logado) ---
         # Começamos de forma leve, carregando apenas o que pertence ao admin
-        initial_chats = await chat_service.get_chats_by_attendant(admin_id)
-        await websocket.send_json({
-            "type": "initial", 
-            "context": "personal_chats",
-            "data": initial_chats
-        })
+        async def send_initial():
+            cursor = await chat_service.current_stream_cursor()
+            initial_chats = await chat_service.get_chats_by_attendant(admin_id)
+            connection.send({
+                "type": "initial", 
+                "context": "personal_chats",
+                "data": initial_chats,
+                "cursor": cursor
+            })
+
+        # Reconexão: /admin/ws?cursor=<último cursor> recebe só os eventos perdidos
+        resume_cursor = websocket.query_params.get("cursor")
+        resume_cursor = int(resume_cursor) if resume_cursor and resume_cursor.isdigit() else None
+        if resume_cursor is None:
+            await send_initial()
 
         # --- 3. Watcher (Escuta Global de Novos Chats) ---
         async def watch_task():
             try:
                 # O admin geralmente precisa ver TUDO que entra em tempo real
                 # Se o stream_chats() for chamado sem filtros, ele monitora a collection toda
-                async for new_msg in chat_service.stream_chats():
+                async for event in chat_service.stream_chats(after=resume_cursor):
                     if stop_event.is_set(): break
-                    await manager.send_personal_message({
+                    if event.get("resync"):
+                        await send_initial()
+                        continue
+                    connection.send({
                         "type": "new_message", 
-                        "data": new_msg
-                    }, admin_id)
+                        "data": event["data"],
+                        "cursor": event["cursor"]
+                    })
             except Exception as e:
                 print(f"Admin Watcher error: {e}")
 
@@ -126,7 +157,7 @@ async def admin_chat_ws(websocket: WebSocket):
             if action == "load_all_chats":
                 # Carrega TODOS os chats do sistema (Cuidado com o volume: use limit!)
                 all_chats = await chat_service.list_chats() 
-                await websocket.send_json({
+                connection.send({
                     "type": "all_chats_load", 
                     "data": all_chats
                 })
@@ -134,7 +165,7 @@ async def admin_chat_ws(websocket: WebSocket):
             elif action == "load_all_chats":
                 # Carrega a página 0 de tudo
                 all_chats = await chat_service.load_chat_history(page=0, page_size=100)
-                await websocket.send_json({
+                connection.send({
                     "type": "all_chats_load", 
                     "data": all_chats
                 })
@@ -143,7 +174,7 @@ async def admin_chat_ws(websocket: WebSocket):
                 # Admin quer ver os chats de um atendente específico
                 target_id = data.get("attendant_id")
                 filtered_chats = await chat_service.get_chats_by_attendant(target_id)
-                await websocket.send_json({
+                connection.send({
                     "type": "filtered_chats",
                     "attendant_id": target_id,
                     "data": filtered_chats
@@ -156,7 +187,7 @@ async def admin_chat_ws(websocket: WebSocket):
     finally:
         stop_event.set()
         if bg_task: bg_task.cancel()
-        if admin_id: manager.disconnect(admin_id)
+        if admin_id: manager.disconnect(admin_id, websocket)
 
 
 # --- Schemas ---
@@ -196,23 +227,24 @@ class ChatRoutes():
         self.router.add_api_route("/transfer", self.transfer_chat, methods=["POST"], status_code=200)
         self.router.add_api_route("/finish", self.finish_chat, methods=["POST"], status_code=200)
         self.router.add_api_route("/", self.get_all_chats, methods=["GET"], status_code=200)
+        self.router.add_api_route("/window/closing", self.get_windows_closing, methods=["GET"], status_code=200)
         self.router.websocket("/ws/attendant", self.get_by_attendant_ws)
         self.router.websocket("/ws/admin", self.get_all_chats_ws)
 
         
     async def start_chat(self,
                             payload: StartChatRequest,
-                            token:HTTPAuthorizationCredentials = Depends(fastapi_security)) -> dict:
+                            token:HTTPAuthorizationCredentials = Depends(fastapi_security),
+                            security: Security = Depends(get_security),
+                            chat_service: ChatService = Depends(get_chat_service)) -> dict:
         """Start a new chat chat, must containt phone number of client. Permission: user or admin.
             It also can reopen a closed chat"""
         
         try:
-            security = get_security()
-            chat_service = get_chat_service()
             await security.verify_permission(token.credentials, ["user", "admin"])
             chat = await chat_service.start_chat(payload.phone_number, payload.attendant_id, payload.category)
             return {"message": "Sessão iniciada com sucesso", "chat": chat, 
-                "free_message":bool(chat_service.can_send_free_message(payload.phone_number))}
+                "free_message": await chat_service.can_send_free_message(payload.phone_number)}
         
         except ValueError as e:
             raise HTTPException(400, "Input invalid")
@@ -221,16 +253,16 @@ class ChatRoutes():
         
     async def transfer_chat(self,
                                 payload: TransferChatRequest,
-                                token:HTTPAuthorizationCredentials = Depends(fastapi_security))->dict:
+                                token:HTTPAuthorizationCredentials = Depends(fastapi_security),
+                                security: Security = Depends(get_security),
+                                chat_service: ChatService = Depends(get_chat_service))->dict:
         """Transfer an active chat to another attendant. Permission: user or admin."""
         
         try:
-            security = get_security()
-            chat_service = get_chat_service()
             await security.verify_permission(token.credentials, ["user", "admin"])
             await chat_service.transfer_chat(payload.phone_number, payload.new_attendant_id)
             return {"message": "Atendimento transferido com sucesso", 
-                "free_message":bool(chat_service.can_send_free_message(payload.phone_number))}
+                "free_message": await chat_service.can_send_free_message(payload.phone_number)}
         
         except ValueError as e:
             raise HTTPException(400, str(e))
@@ -239,12 +271,12 @@ class ChatRoutes():
 
     async def finish_chat(self,
                             phone_number: str = Query(..., description="Phone number of the client whose chat will be finished"),
-                            token:HTTPAuthorizationCredentials = Depends(fastapi_security))->dict:
+                            token:HTTPAuthorizationCredentials = Depends(fastapi_security),
+                            security: Security = Depends(get_security),
+                            chat_service: ChatService = Depends(get_chat_service))->dict:
             """Finish an active chat. Permission: user or admin."""
             
             try:
-                security = get_security()
-                chat_service = get_chat_service()
                 await security.verify_permission(token.credentials, ["user", "admin"])
                 await chat_service.finish_chat(phone_number)
                 return {"message": "Sessão finalizada com sucesso"}
@@ -255,17 +287,32 @@ class ChatRoutes():
                 raise HTTPException(500, str(e))
 
     async def get_all_chats(self,
-                            token:HTTPAuthorizationCredentials = Depends(fastapi_security))->List[dict]:
+                            token:HTTPAuthorizationCredentials = Depends(fastapi_security),
+                            security: Security = Depends(get_security),
+                            chat_service: ChatService = Depends(get_chat_service))->List[dict]:
         """Get the last chat of each client in the system. Permission: admin."""
         try:
-            security = get_security()
-            chat_service = get_chat_service()
             await security.verify_permission(token.credentials, ["admin"])
             return await chat_service.list_chats()
         
         except Exception as e:
             raise HTTPException(500, str(e))
 
+    async def get_windows_closing(self,
+                                  within: int = Query(3600, ge=60, le=24*3600, description="Seconds ahead to look for closing 24h windows"),
+                                  token:HTTPAuthorizationCredentials = Depends(fastapi_security),
+                                  security: Security = Depends(get_security),
+                                  chat_service: ChatService = Depends(get_chat_service))->List[dict]:
+        """List chats whose 24h free-message window closes within the given seconds. Permission: user or admin."""
+        try:
+            await security.verify_permission(token.credentials, ["user", "admin"])
+            return await chat_service.windows_closing_within(within)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(500, str(e))
+
     async def get_all_chats_ws(self,
                                   websocket: WebSocket):
         """Websocket endpoint to get the last chat of each client in the system. Permission: admin."""
@@ -306,7 +353,7 @@ class ChatRoutes():
         if not token:
             await websocket.close(code=1008)
             return None
-        await manager.connect(attendant_id, websocket)
+        connection = await manager.connect(attendant_id, websocket)
         try: 
             while True:
                 raw_data = await websocket.receive_text()
@@ -323,19 +370,19 @@ class ChatRoutes():
                         "data": result
                     }
 
-                    await manager.send_personal_message(response, attendant_id)
+                    connection.send(response)
 
                 except Exception as e:
-                    await manager.send_personal_message({
+                    connection.send({
                         "type": "error",
                         "action": action,
                         "message": str(e)
-                    }, attendant_id)
+                    })
 
-                    manager.disconnect(attendant_id)
+                    manager.disconnect(attendant_id, websocket)
                     break
         except Exception as e:
-            manager.disconnect(attendant_id)
+            manager.disconnect(attendant_id, websocket)
         
     async def get_by_attendant_ws(self,
                                   websocket: WebSocket):
@@ -376,7 +423,7 @@ class ChatRoutes():
         if not token:
             await websocket.close(code=1008)
             return None
-        await manager.connect(attendant_id, websocket)
+        connection = await manager.connect(attendant_id, websocket)
 
         try:
             while True:
@@ -394,19 +441,19 @@ class ChatRoutes():
                         "data": result
                     }
 
-                    await manager.send_personal_message(response, attendant_id)
+                    connection.send(response)
 
                 except Exception as e:
-                    await manager.send_personal_message({
+                    connection.send({
                         "type": "error",
                         "action": action,
                         "message": str(e)
-                    }, attendant_id)
+                    })
 
-                    manager.disconnect(attendant_id)
+                    manager.disconnect(attendant_id, websocket)
                     break
         except Exception as e:
-            manager.disconnect(attendant_id)
+            manager.disconnect(attendant_id, websocket)
 
 _routes = ChatRoutes()
 router = _routes.router
\ No newline at end of file
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, status, Body
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from domain.config.chat_config import ChatConfig
 from core.dependencies import get_config_service, get_security
+from services.config_service import ConfigService
+from utils.security import Security
 
 fastapi_security = HTTPBearer()
 
@@ -19,12 +21,12 @@ class ConfigRoutes():
 
     async def get_config(self,
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        config_service: ConfigService = Depends(get_config_service),
     ):
         """
         Retorna a configuração atual do chat (mensagens, botões).
         """
-        security = get_security()
-        config_service = get_config_service()
         await security.verify_permission(token.credentials, ["user", "admin"])
 
         return config_service.get_config()
@@ -32,12 +34,12 @@ class ConfigRoutes():
     async def update_config(self,
         config: ChatConfig = Body(...),
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        config_service: ConfigService = Depends(get_config_service),
     ):
         """
         Atualiza a configuração do chat.
         """
-        security = get_security()
-        config_service = get_config_service()
         await security.verify_permission(token.credentials, ["user", "admin"])
 
         return config_service.save_config(config)
@@ -3,6 +3,8 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from typing import List
 from domain.contact.contact import Contact
 from core.dependencies import get_contact_service, get_security
+from services.contact_service import ContactService
+from utils.security import Security
 
 fastapi_security = HTTPBearer()
 
@@ -25,13 +27,13 @@ class ContactsRoutes():
         limit: int = Query(default=300, description="Limite de contatos"),
         skip: int = Query(default=0, description="Número de contatos a pular"),
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        contact_service: ContactService = Depends(get_contact_service),
     ):
         """
         Lista contatos ordenados pela última mensagem recebida.
         """
         try:
-            security = get_security()
-            contact_service = get_contact_service()
             await security.verify_permission(token.credentials, ["user", "admin"])
             return await contact_service.list_contacts(limit, skip)
         except Exception as e:
@@ -41,13 +43,13 @@ class ContactsRoutes():
         self,
         phone: str = Query(..., description="Número de telefone do contato"),
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        contact_service: ContactService = Depends(get_contact_service),
     ):
         """
         Busca detalhes de um contato específico.
         """
         try:
-            security = get_security()
-            contact_service = get_contact_service()
             await security.verify_permission(token.credentials, ["user", "admin"])
             contact = await contact_service.get_by_phone(phone)
             if not contact:
@@ -62,13 +64,13 @@ class ContactsRoutes():
         self,
         phone: str = Query(..., description="Número de telefone do contato a ser deletado"),
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        contact_service: ContactService = Depends(get_contact_service),
     ):
         """
         Deleta um contato.
         """
         try:
-            security = get_security()
-            contact_service = get_contact_service()
             await security.verify_permission(token.credentials, ["admin"])
             await contact_service.delete_contact(phone)
             return {"message": "Contato deletado com sucesso"}
@@ -78,13 +80,13 @@ class ContactsRoutes():
             self,
             contact: Contact = Body(...),
             token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+            security: Security = Depends(get_security),
+            contact_service: ContactService = Depends(get_contact_service),
     ):
         """
         Registra um novo contato.
         """
         try:
-            security = get_security()
-            contact_service = get_contact_service()
             await security.verify_permission(token.credentials, ["admin"])
             result = await contact_service.upsert_contact(contact.model_dump())
             return {"id": str(result), "message": "Contato criado com sucesso"}
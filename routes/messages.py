@@ -19,7 +19,7 @@ async def get_message_ws(websocket: WebSocket):
         
         decoded = await security.verify_permission(token, allowed_permissions=["admin", "user"])
         attendant_id = str(decoded.get("_id"))
-        await manager.connect(attendant_id, websocket)
+        connection = await manager.connect(attendant_id, websocket)
 
         # --- Handshake Inicial ---
         # O cliente deve enviar primeiro: {"action": "start", "phone": "..."}
@@ -31,21 +31,34 @@ async def get_message_ws(websocket: WebSocket):
             await websocket.close(code=1008)
             return
 
-        # 1. Carga Inicial (Últimas 50)
-        initial_msgs = await message_service.get_messages_by_phone(target_phone, limit=50) #{ "action": "start", "phone":"55555555" }
-        await websocket.send_json({"type": "initial", "data": initial_msgs})
+        # 1. Carga Inicial (Últimas 50) + cursor do stream de eventos
+        async def send_initial():
+            cursor = await message_service.current_stream_cursor()
+            initial_msgs = await message_service.get_messages_by_phone(target_phone, limit=50) #{ "action": "start", "phone":"55555555" }
+            connection.send({"type": "initial", "data": initial_msgs, "cursor": cursor})
+
+        # Reconexão: { "action": "start", "phone": "...", "cursor": <último cursor> } recebe só o que foi perdido
+        resume_cursor = init_data.get("cursor")
+        resume_cursor = int(resume_cursor) if str(resume_cursor).isdigit() else None
+        if resume_cursor is None:
+            await send_initial()
 
         # --- Task de Watcher (Background) ---
         async def watch_task():
-            """Task que fica 'pendurada' no banco esperando novas mensagens."""
+            """Task que recebe as mensagens novas do telefone (change stream compartilhado)."""
             try:
-                async for new_msg in message_service.stream_new_messages(target_phone):
+                async for event in message_service.stream_new_messages(target_phone, after=resume_cursor):
                     if stop_event.is_set():
                         break
-                    await manager.send_personal_message({
+                    if event.get("resync"):
+                        # Mensagens perdidas já saíram do buffer: recarrega as últimas
+                        await send_initial()
+                        continue
+                    connection.send({
                         "type": "new_message", 
-                        "data": new_msg
-                    }, attendant_id)
+                        "data": event["data"],
+                        "cursor": event["cursor"]
+                    })
             except Exception as e:
                 print(f"Watcher error: {e}")
 
@@ -62,10 +75,10 @@ async def get_message_ws(websocket: WebSocket):
                 last_ts = data.get("last_timestamp")
                 history = await message_service.get_history(target_phone, last_ts)
                 
-                await manager.send_personal_message({
+                connection.send({
                     "type": "history",
                     "data": history
-                }, attendant_id)
+                })
 
     except WebSocketDisconnect:
         print(f"Conexão encerrada: {attendant_id}")
@@ -74,7 +87,7 @@ async def get_message_ws(websocket: WebSocket):
     finally:
         stop_event.set() # Para a task do banco
         if attendant_id:
-            manager.disconnect(attendant_id)
+            manager.disconnect(attendant_id, websocket)
         if bg_task:
             bg_task.cancel()
 
@@ -124,7 +137,7 @@ class MessagesRoutes():
             await websocket.close(code=1008)
             return None
 
-        await manager.connect(attendant_id, websocket)
+        connection = await manager.connect(attendant_id, websocket)
         try: 
             while True:
                 raw_data = await websocket.receive_text()
@@ -141,19 +154,19 @@ class MessagesRoutes():
                         "data": result
                     }
 
-                    await manager.send_personal_message(response, attendant_id)
+                    connection.send(response)
 
                 except Exception as e:
-                    await manager.send_personal_message({
+                    connection.send({
                         "type": "error",
                         "action": action,
                         "message": str(e)
-                    }, attendant_id)
+                    })
 
-                    manager.disconnect(attendant_id)
+                    manager.disconnect(attendant_id, websocket)
                     break
         except Exception as e:
-            manager.disconnect(attendant_id)
+            manager.disconnect(attendant_id, websocket)
             return None
 
 
@@ -0,0 +1,182 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from core.websocket import manager
+from core.dependencies import get_cache, get_password_hasher, get_security, get_sector_queue
+from services.queue_service import SectorQueue
+from utils.cache import Cache, command_stats
+from utils.metrics import cache_metrics, histogram_lines
+from utils.password_hasher import PasswordHasher
+from utils.security import Security
+
+fastapi_security = HTTPBearer()
+
+class MetricsRoutes():
+    def __init__(self):
+        self.router = APIRouter(prefix="/metrics", tags=["Metrics"])
+        # avoid calling dependency factories at import time
+        self._security = None
+        self._cache = None
+        self._register_routes()
+
+    def _register_routes(self):
+        self.router.add_api_route("/cache/memory", self.cache_memory, methods=["GET"], status_code=status.HTTP_200_OK)
+        self.router.add_api_route("/cache/commands", self.cache_commands, methods=["GET"], status_code=status.HTTP_200_OK)
+        self.router.add_api_route("/cache", self.cache_stats, methods=["GET"], status_code=status.HTTP_200_OK)
+        self.router.add_api_route("/prometheus", self.prometheus, methods=["GET"], response_class=PlainTextResponse)
+        self.router.add_api_route("/auth", self.auth, methods=["GET"], status_code=status.HTTP_200_OK)
+        self.router.add_api_route("/queues", self.queues, methods=["GET"], status_code=status.HTTP_200_OK)
+        self.router.add_api_route("/websocket", self.websocket, methods=["GET"], status_code=status.HTTP_200_OK)
+
+    async def cache_memory(self,
+        sample_size: int = Query(default=1000, ge=1, le=100000, description="Quantidade de chaves amostradas via SCAN"),
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        cache: Cache = Depends(get_cache),
+    ):
+        """
+        Uso de memória do Redis por namespace de chave (amostrado).
+        """
+        try:
+            await security.verify_permission(token.credentials, ["admin"])
+            return await cache.memory_usage_by_namespace(sample_size)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def cache_commands(self,
+        reset: bool = Query(default=False, description="Zera os contadores após a leitura"),
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+    ):
+        """
+        Comandos enviados ao Redis por este processo (por tipo) e total de round trips.
+        """
+        try:
+            await security.verify_permission(token.credentials, ["admin"])
+            snapshot = command_stats.snapshot()
+            if reset:
+                command_stats.reset()
+            return snapshot
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def cache_stats(self,
+        reset: bool = Query(default=False, description="Zera hits/misses e histogramas após a leitura"),
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+    ):
+        """
+        Hit ratio por namespace, latência dos comandos e dos loaders e a última
+        amostra do keyspace.
+        """
+        try:
+            await security.verify_permission(token.credentials, ["admin"])
+            snapshot = cache_metrics.snapshot()
+            if reset:
+                cache_metrics.reset()
+            return snapshot
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def prometheus(self,
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        hasher: PasswordHasher = Depends(get_password_hasher),
+    ):
+        """
+        Métricas do cache no formato texto do Prometheus (scrape com bearer token de admin).
+        """
+        try:
+            await security.verify_permission(token.credentials, ["admin"])
+            lines = histogram_lines(
+                "password_hash_duration_seconds",
+                "Espera na fila (wait) e tempo de hash/verificação do bcrypt.",
+                hasher.stats,
+                "operation"
+            )
+            lines += [
+                "# HELP password_hash_waiting Operações de bcrypt aguardando uma thread.",
+                "# TYPE password_hash_waiting gauge",
+                f"password_hash_waiting {hasher.waiting}",
+            ]
+            ws = manager.snapshot()
+            lines += [
+                "# HELP websocket_connections Websockets abertos neste processo.",
+                "# TYPE websocket_connections gauge",
+                f"websocket_connections {ws['connections']}",
+                "# HELP websocket_send_queue_depth Mensagens aguardando envio (soma e maior fila).",
+                "# TYPE websocket_send_queue_depth gauge",
+                f'websocket_send_queue_depth{{stat="total"}} {ws["queued"]}',
+                f'websocket_send_queue_depth{{stat="max"}} {ws["max_depth"]}',
+                "# HELP websocket_dropped_messages_total Mensagens descartadas por fila cheia.",
+                "# TYPE websocket_dropped_messages_total counter",
+                f"websocket_dropped_messages_total {ws['dropped']}",
+                "# HELP websocket_slow_disconnects_total Sockets fechados por consumidor lento.",
+                "# TYPE websocket_slow_disconnects_total counter",
+                f"websocket_slow_disconnects_total {ws['slow_disconnects']}",
+            ]
+            return PlainTextResponse(
+                cache_metrics.render_prometheus(command_stats.snapshot()) + "\n".join(lines) + "\n",
+                media_type="text/plain; version=0.0.4"
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def auth(self,
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        hasher: PasswordHasher = Depends(get_password_hasher),
+    ):
+        """
+        Latência de login: espera pelo pool do bcrypt e tempo de hash/verificação.
+        """
+        try:
+            await security.verify_permission(token.credentials, ["admin"])
+            return hasher.snapshot()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def queues(self,
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        queue: SectorQueue = Depends(get_sector_queue),
+    ):
+        """
+        Filas de espera por setor: tamanho, vazão da última hora e percentis de espera.
+        """
+        try:
+            await security.verify_permission(token.credentials, ["admin"])
+            return await queue.all_stats()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def websocket(self,
+        token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+    ):
+        """
+        Websockets deste processo: conexões, profundidade das filas de envio e descartes.
+        """
+        try:
+            await security.verify_permission(token.credentials, ["admin"])
+            return manager.snapshot()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+_routes = MetricsRoutes()
+router = _routes.router
@@ -4,6 +4,8 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from client.whatsapp.V24 import WhatsAppClient
 from core.dependencies import get_clients, get_chat_service, get_security
+from services.chat_service import ChatService
+from utils.security import Security
 
 fastapi_security = HTTPBearer()
 
@@ -24,11 +26,11 @@ class WebhookRoutes():
 
     async def list_templates(self,
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        chat_service: ChatService = Depends(get_chat_service),
     ):
         """Lista templates do repositório local."""
         try:
-            security = get_security()
-            chat_service = get_chat_service()
             await security.verify_permission(token.credentials, ["admin", "user"])
             return await chat_service.list_templates()
         except Exception as e:
@@ -36,35 +38,37 @@ class WebhookRoutes():
 
     async def sync_templates(self,
         token: HTTPAuthorizationCredentials = Depends(fastapi_security),
+        security: Security = Depends(get_security),
+        chat_service: ChatService = Depends(get_chat_service),
     ):
         """Força sincronização de templates do WhatsApp para o repositório local."""
         try:
-            security = get_security()
-            chat_service = get_chat_service()
             await security.verify_permission(token.credentials, ["admin", "user"])
             templates = await chat_service.sync_templates_from_whatsapp()
             return {"count": len(templates), "message": "Templates sincronizados com sucesso."}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def verify_webhook(self, request: Request,):
+    async def verify_webhook(self, request: Request,
+        clients: dict = Depends(get_clients),
+    ):
         """Verificação do webhook (GET)"""
-        clients = get_clients()
         client = clients["whatsapp"]
         return await client.verify_webhook(request)
 
     async def receive_webhook(
         self,
         request: Request,
+        clients: dict = Depends(get_clients),
+        chat_service: ChatService = Depends(get_chat_service),
     ):
         """Recebimento de notificações (POST)"""
         try:
             data = await request.json()
             
             # O processamento e salvamento é feito pelo client/repo
-            client = get_clients()["whatsapp"]
+            client = clients["whatsapp"]
             messages = await client.process_webhook(data)
-            chat_service = get_chat_service()
             # Processamento da lógica de chat (Automação, Menus, Atribuição)
             for msg in messages:
                 await chat_service.process_incoming_message(msg)
@@ -1,57 +1,252 @@
-from domain.attendants.attendant import Attendant
+from typing import List
+from domain.attendants.attendant import Attendant, PermissionLevel
 from fastapi import HTTPException
 from repositories.attendant import AttendantRepository
 from utils.security import Security
 from datetime import datetime
 from utils.cache import Cache
-import json
+from utils.password_hasher import PasswordHasher
 from core.environment import get_environment
 
 class AttendantService():
     def __init__(self, 
                  repository:AttendantRepository,
                  cache:Cache,
-                 security:Security) -> None:
+                 security:Security,
+                 hasher:PasswordHasher) -> None:
         self._repository = repository
         self._cache = cache
         self._security = security
+        self._hasher = hasher
         self._env = get_environment()
 
     # ----------------
     # Cache Helpers
     # ----------------
-    async def _cache_attendant(self, user: dict):
-        user_id = user["_id"]
+    # Read model do atendente no Redis, sempre gravado em um único MULTI:
+    # - attendant:{id}           HASH com os campos do atendente
+    # - attendant:login:{login}  id do atendente
+    # - sector:{sector}          SET de ids por setor (lido pelo roteamento, sem Mongo)
+    # - permission:{permission}  SET de ids por permissão
+    # - attendant:sectors        SET dos setores com set de membros (usado no rebuild)
+    # - client_attendant:{sector} HASH telefone -> id do atendente fixo (índice reverso de `clients`);
+    #   o campo `CLIENT_INDEX_READY_FIELD` marca o índice do setor como completo e some junto
+    #   com o hash se ele for removido/evictado
+    # - sector:roster:{sector}   lista enxuta do setor para o roteamento (get_or_load, versionada)
+    SECTORS_KEY = "attendant:sectors"
+    CLIENT_INDEX_READY_FIELD = "__ready__"
 
-        await self._cache.hset(
-            f"attendant:{user_id}",
+    # Campos aninhados: no hash são gravados com o codec do Cache
+    _NESTED_FIELDS = ("sector", "clients", "working_hours")
+    # Campos que entram no token (ou autenticam): mudar um deles revoga a sessão
+    _TOKEN_FIELDS = ("login", "permission", "name", "sector")
+
+    @staticmethod
+    def _sector_key(sector: str) -> str:
+        return f"sector:{sector}"
+
+    @staticmethod
+    def _roster_key(sector: str) -> str:
+        return f"sector:roster:{sector}"
+
+    @staticmethod
+    def _client_index_key(sector: str) -> str:
+        return f"client_attendant:{sector}"
+
+    @staticmethod
+    def _client_pairs(user: dict | None) -> set:
+        """(setor, telefone) de cada cliente fixo do atendente."""
+        if not user:
+            return set()
+        return {(s, c) for s in user.get("sector") or [] for c in user.get("clients") or []}
+
+    @classmethod
+    def _revokes_session(cls, previous: dict, data: dict) -> bool:
+        """True se a atualização troca a senha ou algum campo do token."""
+        if "password" in data:
+            return True
+        for field in cls._TOKEN_FIELDS:
+            if field not in data:
+                continue
+            old, new = previous.get(field), data[field]
+            if field == "sector":
+                old, new = set(old or []), set(new or [])
+            if getattr(old, "value", old) != getattr(new, "value", new):
+                return True
+        return False
+
+    @staticmethod
+    def _permission_key(permission) -> str:
+        return f"permission:{getattr(permission, 'value', permission)}"
+
+    def _from_cache(self, data: dict | None) -> dict | None:
+        """Hash do atendente -> documento com os campos aninhados decodificados."""
+        if not data:
+            return None
+        user = dict(data)
+        for field in self._NESTED_FIELDS:
+            if isinstance(user.get(field), str):
+                user[field] = self._cache.decode(user[field])
+        return user
+
+    def _project(self, pipe, user: dict, previous: dict | None = None):
+        """
+        Enfileira a projeção de `user`; com `previous` (documento anterior),
+        remove também as associações que deixaram de valer.
+        """
+        user_id = str(user["_id"])
+        key = f"attendant:{user_id}"
+        sectors = set(user.get("sector") or [])
+        # Chaves do atendente ficam na tag `attendant:{id}` para serem invalidadas juntas
+        tags = (f"attendant:{user_id}",)
+
+        if previous:
+            for sector in set(previous.get("sector") or []) - sectors:
+                pipe.srem(self._sector_key(sector), user_id)
+            if self._permission_key(previous.get("permission")) != self._permission_key(user.get("permission")):
+                pipe.srem(self._permission_key(previous.get("permission")), user_id)
+            if previous.get("login") and previous["login"] != user.get("login"):
+                pipe.delete(f"attendant:login:{previous['login']}")
+            for sector, phone in self._client_pairs(previous) - self._client_pairs(user):
+                pipe.hdel(self._client_index_key(sector), phone)
+
+        # Campos removidos não podem sobrar no hash
+        pipe.delete(key)
+        pipe.hset(
+            key,
             mapping={
-                "_id": str(user["_id"]),
-                "name": user["name"],
-                "login": user["login"],
-                "password": user["password"],
-                "permission": user["permission"],
-                "sector": json.dumps(user["sector"]),
-                "clients": json.dumps(user["clients"]),
-                "working_hours": json.dumps(user["working_hours"]),
-            }
+                "_id": user_id,
+                "name": user.get("name"),
+                "login": user.get("login"),
+                "password": user.get("password"),
+                "permission": getattr(user.get("permission"), "value", user.get("permission")),
+                "sector": user.get("sector") or [],
+                "clients": user.get("clients") or [],
+                "working_hours": user.get("working_hours"),
+                "welcome_message": user.get("welcome_message"),
+                "capacity": user.get("capacity"),
+            },
+            tags=tags
         )
+        pipe.set(f"attendant:login:{user['login']}", user_id, tags=tags)
+
+        for sector in sectors:
+            pipe.sadd(self._sector_key(sector), user_id)
+        pipe.sadd(self.SECTORS_KEY, *sectors)
+        for sector, phone in self._client_pairs(user):
+            pipe.hset(self._client_index_key(sector), {phone: user_id})
+        pipe.sadd(self._permission_key(user.get("permission")), user_id)
 
-        await self._cache.set(f"attendant:login:{user['login']}", user_id)
+        # Rosters dos setores antigos e novos deixam de valer (nome, horário, membros)
+        for sector in sectors | set((previous or {}).get("sector") or []):
+            pipe.invalidate(self._roster_key(sector))
 
-        for sector in user.get("sector", []):
-            await self._cache.sadd(f"sector:{sector}", user_id)
+    async def _cache_attendant(self, user: dict, previous: dict | None = None):
+        async with self._cache.pipeline(transaction=True) as pipe:
+            self._project(pipe, user, previous)
 
-        await self._cache.sadd(f"permission:{user['permission']}", user_id)
+    async def rebuild_cache(self) -> int:
+        """
+        Reconstrói o read model a partir do Mongo (startup): sets de setor e de
+        permissão e o índice reverso de clientes são recriados do zero no mesmo
+        MULTI, sem membros antigos.
+        """
+        attendants = await self._repository.list()
+        old_sectors = await self._cache.get_set(self.SECTORS_KEY)
+        async with self._cache.pipeline(transaction=True) as pipe:
+            pipe.delete(self.SECTORS_KEY, *[self._sector_key(s) for s in old_sectors])
+            pipe.delete(*[self._client_index_key(s) for s in old_sectors])
+            pipe.delete(*[self._permission_key(p) for p in PermissionLevel])
+            for sector in old_sectors:
+                pipe.invalidate(self._roster_key(sector))
+            for user in attendants:
+                self._project(pipe, user)
+            for sector in {s for user in attendants for s in user.get("sector") or []}:
+                pipe.hset(self._client_index_key(sector), {self.CLIENT_INDEX_READY_FIELD: "1"})
+        return len(attendants)
+
+    async def sector_attendant_ids(self, sector: str) -> List[str]:
+        """Ids dos atendentes do setor, direto do read model."""
+        return await self._cache.get_set(self._sector_key(sector))
+
+    # ----------------
+    # Roster (roteamento)
+    # ----------------
+    MINUTES_PER_DAY = 24 * 60
+
+    @classmethod
+    def _hours_bitmap(cls, working_hours) -> str | None:
+        """
+        Expediente como bitmap dos minutos da semana (bit dia * 1440 + minuto,
+        intervalos inclusivos), em hex. None: sem expediente, sempre disponível.
+        """
+        if not working_hours:
+            return None
+        bits = 0
+        for day, intervals in working_hours.items():
+            for i in intervals or []:
+                start = i["start"] if isinstance(i, dict) else i.start
+                end = i["end"] if isinstance(i, dict) else i.end
+                try:
+                    sh, sm = map(int, start.split(":"))
+                    eh, em = map(int, end.split(":"))
+                    first, last = sh * 60 + sm, eh * 60 + em
+                    offset = int(day) * cls.MINUTES_PER_DAY
+                except (ValueError, AttributeError):
+                    continue
+                if first <= last:
+                    bits |= ((1 << (last - first + 1)) - 1) << (offset + first)
+        return format(bits, "x")
+
+    @classmethod
+    def _roster_entry(cls, user: dict) -> dict:
+        # No hash do read model a capacidade vem como string
+        capacity = user.get("capacity")
+        return {
+            "_id": str(user["_id"]),
+            "name": user.get("name"),
+            "welcome_message": user.get("welcome_message"),
+            "capacity": int(capacity) if capacity not in (None, "") else None,
+            "hours": cls._hours_bitmap(user.get("working_hours")),
+        }
+
+    async def sector_roster(self, sector: str) -> List[dict]:
+        """
+        Atendentes do setor só com os campos do roteamento (sem senha), ordenados
+        por id. Montado a partir do read model e invalidado a cada escrita de
+        atendente; com o client-side cache habilitado é servido da memória.
+        """
+        async def load():
+            # Read model do setor ainda não reconstruído (ex: Redis reiniciado ou evictado): Mongo
+            if not await self._cache.hget(self._client_index_key(sector), self.CLIENT_INDEX_READY_FIELD):
+                users = await self._repository.list({"sector": sector})
+            else:
+                ids = sorted(await self.sector_attendant_ids(sector))
+                hashes = await self._cache.get_hash_many([f"attendant:{i}" for i in ids])
+                users = [self._from_cache(data) or await self.find_by_id(_id) for _id, data in zip(ids, hashes)]
+            roster = [self._roster_entry(user) for user in users if user]
+            roster.sort(key=lambda entry: entry["_id"])
+            return roster
+
+        return await self._cache.get_or_load(self._roster_key(sector), load)
 
     # ----------------
     # Helpers
     # ----------------
+    async def _hash_password_field(self, data: dict) -> dict:
+        """Gera o hash da senha em texto no pool do bcrypt (o Attendant não precisa refazê-lo)."""
+        password = data.get("password")
+        if password and not Attendant.is_bcrypt_hash(password):
+            data = {**data, "password": await self._hasher.hash(password)}
+        return data
+
     async def find_by_login(self, login: str):
         try:
-            user_id = await self._cache.get(f"attendant:login:{login}")
+            user_id = await self._cache.get_str(f"attendant:login:{login}")
             if user_id:
-                return await self._cache.get(f"attendant:{user_id}")
+                user = self._from_cache(await self._cache.get_hash(f"attendant:{user_id}"))
+                if user:
+                    return user
             
             user = await self._repository.find_by_login(login)
             if not user:
@@ -65,11 +260,11 @@ class AttendantService():
 
     async def find_by_id(self, _id: str):
         try:
-            user = await self._cache.get(f"attendant:{_id}")
+            user = self._from_cache(await self._cache.get_hash(f"attendant:{_id}"))
             if user:
                 return user
             
-            user = await self._repository.find_by_id(_id)
+            user = await self._repository.get_by_id(_id)
             if not user:
                 return None
 
@@ -88,7 +283,7 @@ class AttendantService():
             raise HTTPException(status_code=409, detail="Attendant with this login already exists.")
 
         try:
-            attendant = Attendant(**data)
+            attendant = Attendant(**await self._hash_password_field(data))
             att_dict = attendant.to_dict()
 
             if "permission" in att_dict and hasattr(att_dict["permission"], "value"):
@@ -96,7 +291,7 @@ class AttendantService():
                 
             result = await self._repository.save(att_dict)
             if result:
-                await self._cache_attendant(result)
+                await self._cache_attendant({**att_dict, "_id": result})
             return result
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error creating attendant: {str(e)}")
@@ -110,28 +305,34 @@ class AttendantService():
 
         attendant = Attendant(**attendant_data)
 
-        if not attendant.password_matches(password):
+        if not await self._hasher.verify(password, attendant.password):
             return None
         
         return attendant.to_dict()
     async def get_by_clients_and_sector(self, phone: str, sector_name: str):
+        """
+        Atendente fixo do cliente no setor (ou None). O rodízio do setor fica a
+        cargo do roteamento.
+        """
         try:
-            # 1. Tenta encontrar atendente vinculado diretamente
-            attendant = await self._repository.find_by_client_and_sector(phone, sector_name)
-            if attendant:
-                return attendant
-            
-            # 2. Se não encontrar, tenta por setor
-            attendants_in_sector = await self._repository.find_by_sector(sector_name)
-            if attendants_in_sector:
-                return attendants_in_sector[0]  # Retorna o primeiro encontrado (pode ser melhorado com round-robin ou outro critério)
+            # 1. Índice reverso no Redis: telefone e marcador em um único HMGET
+            attendant_id, ready = await self._cache.hmget(
+                self._client_index_key(sector_name), [phone, self.CLIENT_INDEX_READY_FIELD]
+            )
+            if attendant_id:
+                return await self.find_by_id(attendant_id)
 
-            return None
+            # Índice do setor completo: o cliente não tem atendente fixo neste setor
+            if ready:
+                return None
+
+            # 2. Índice ainda não reconstruído (ex: Redis reiniciado): Mongo, pelo índice de `clients`
+            return await self._repository.find_by_client_and_sector(phone, sector_name)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error finding attendant by clients and sector: {str(e)}")
     async def create_token_for_attendant(self, attendant: dict):
         # 1. Tentar recuperar token do cache
-        exists_token = await self._cache.get(f"auth_token:{attendant['_id']}")
+        exists_token = await self._cache.get_str(f"auth_token:{attendant['_id']}")
 
         if exists_token:
             token_str = exists_token.decode("utf-8") if isinstance(exists_token, (bytes, bytearray)) else str(exists_token)
@@ -163,7 +364,12 @@ class AttendantService():
                     "name": attendant["name"]
                 }
             )
-            await self._cache.set(f"auth_token:{str(attendant['_id'])}", access_token)
+            await self._cache.set(
+                f"auth_token:{str(attendant['_id'])}",
+                access_token,
+                ttl=int(self._env.ACCESS_TOKEN_EXPIRE_SECONDS),
+                tags=(f"attendant:{attendant['_id']}",)
+            )
             return access_token
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Token generation failed: {str(e)}")
@@ -171,18 +377,29 @@ class AttendantService():
     async def logout(self, attendant_id: str):
         try:
             await self._cache.delete(f"auth_token:{str(attendant_id)}")
+            await self._security.revoke(attendant_id)
             return {"message": "Logout successful"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Logout failed: {str(e)}")
         
     async def update_attendant(self, _id: str, data: dict):
         try:
-            result = await self._repository.update(_id, data)
-            if not result:
+            # Troca de senha: grava o hash, nunca o texto
+            data = await self._hash_password_field(data)
+            previous = await self._repository.find_and_update(_id, data)
+            if not previous:
                 raise HTTPException(status_code=404, detail="Attendant not found for update.")
             
-            # Opcional: Atualizar o cache após o update
-            # await self._cache_attendant(result) 
+            # Read model reescrito (setores/permissão/login antigos saem); o token
+            # só deixa de valer se a senha ou alguma das suas claims mudou
+            result = {**previous, **data}
+            revoke = self._revokes_session(previous, data)
+            async with self._cache.pipeline(transaction=True) as pipe:
+                self._project(pipe, result, previous)
+                if revoke:
+                    pipe.delete(f"auth_token:{_id}")
+            if revoke:
+                await self._security.revoke(_id)
             
             return result
         except HTTPException as e:
@@ -198,12 +415,23 @@ class AttendantService():
         
     async def delete_attendant(self, _id: str):
         try:
-            result = await self._repository.delete(_id)
+            result = await self._repository.find_and_delete(_id)
             if not result:
                 raise HTTPException(status_code=404, detail="Attendant not found for deletion.")
             
-            # Limpar cache após deletar
-            await self._cache.delete(f"attendant:{_id}")
+            # Remove o atendente dos sets de setor/permissão; hash, índice de login
+            # e token saem pela tag
+            async with self._cache.pipeline(transaction=True) as pipe:
+                for sector in result.get("sector") or []:
+                    pipe.srem(self._sector_key(sector), _id)
+                for sector, phone in self._client_pairs(result):
+                    pipe.hdel(self._client_index_key(sector), phone)
+                pipe.srem(self._permission_key(result.get("permission")), _id)
+                pipe.delete(f"attendant:login:{result.get('login')}", f"auth_token:{_id}")
+                for sector in result.get("sector") or []:
+                    pipe.invalidate(self._roster_key(sector))
+            await self._cache.invalidate_tag(f"attendant:{_id}")
+            await self._security.revoke(_id)
             
             return result
         except HTTPException as e:
@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Set
+
+from utils.cache import Cache
+from utils.memory_backend import memory_script
+
+
+class ChangeFeed:
+    """
+    Um único change stream por coleção no cluster, repassado aos websockets de
+    todos os nós via Redis pub/sub.
+
+    - Produtor: só o nó líder (lock `feed:{name}:leader`) mantém o change stream
+      e publica cada evento em `{channel_prefix}{chave}` (ex: `ws:attendant:{id}`,
+      `ws:phone:{phone}`). Eventos sem chave (ex: chat ainda sem atendente) vão
+      para `ws:all:{name}`, entregue só a quem recebe tudo (admin); os marcados
+      por `broadcast_if` (ex: delete, que só traz o _id) vão para
+      `ws:broadcast:{name}`, entregue a todos os inscritos.
+    - Consumidor: cada nó assina apenas os canais das chaves com inscritos locais
+      (e o padrão `{channel_prefix}*` se houver quem receba tudo, ex: admin) e
+      entrega aos seus sockets.
+
+    Retomada: cada evento recebe um cursor (sequência do feed) e fica em um
+    buffer circular no Redis (`feed:{name}:log`, últimos REPLAY_SIZE eventos).
+    Quem reconecta informa o último cursor e recebe só o que perdeu; se parte
+    já saiu do buffer, recebe um pedido de recarga. O mesmo vale para o próprio
+    nó: se a assinatura no Redis cai, o que foi publicado até ela voltar é lido
+    do buffer a partir do último cursor recebido. O resume token do change
+    stream é salvo a cada evento: um novo líder continua de onde o anterior parou.
+
+    Cada inscrito tem uma fila limitada: se ele não consome, os eventos mais
+    antigos são descartados sem atrasar os demais.
+    """
+    RETRY_INTERVAL = 5
+    LEADER_TTL = 15
+    REPLAY_SIZE = 5000
+    LOG_TTL = 24 * 3600
+
+    # Publica um evento: cursor (INCR), buffer de replay, resume token e PUBLISH
+    # em um único passo atômico (dois líderes na troca de liderança não
+    # intercalam cursor e buffer). ARGV[1] é o envelope sem o cursor (objeto
+    # JSON), completado aqui com o cursor gerado; ARGV[5] é o canal.
+    _PUBLISH = """
+    local cursor = redis.call('incr', KEYS[1])
+    local envelope = '{"cursor":' .. cursor .. ',' .. string.sub(ARGV[1], 2)
+    redis.call('zadd', KEYS[2], cursor, envelope)
+    redis.call('zremrangebyscore', KEYS[2], '-inf', cursor - tonumber(ARGV[2]))
+    redis.call('expire', KEYS[2], ARGV[3])
+    redis.call('set', KEYS[3], ARGV[4], 'EX', ARGV[3])
+    redis.call('publish', ARGV[5], envelope)
+    return cursor
+    """
+
+    def __init__(self,
+                 name: str,
+                 cache: Cache,
+                 watch: Callable[..., AsyncIterator[tuple]],
+                 key_of: Callable[[dict], Optional[str]],
+                 channel_prefix: str,
+                 broadcast_if: Optional[Callable[[dict], bool]] = None,
+                 max_queue: int = 1000) -> None:
+        self.name = name
+        self._cache = cache
+        self._watch = watch
+        self._key_of = key_of
+        self._broadcast_if = broadcast_if
+        self._prefix = channel_prefix
+        self._broadcast = f"ws:broadcast:{name}"
+        self._unkeyed = f"ws:all:{name}"
+        self._leader_key = f"feed:{name}:leader"
+        self._seq_key = f"feed:{name}:seq"
+        self._log_key = f"feed:{name}:log"
+        self._resume_key = f"feed:{name}:resume"
+        self._node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._max_queue = max_queue
+        # {chave: {filas}}; a chave None recebe todos os eventos
+        self._subscribers: Dict[Optional[str], Set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._subscriptions_lock = asyncio.Lock()
+        # Último cursor visto por este nó (ponto de retomada após reconectar)
+        self._last_cursor: Optional[int] = None
+        self.leader = False
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.recovered = 0
+        self.resyncs = 0
+
+    # ------------------------
+    # Inscritos locais
+    # ------------------------
+    def _channel(self, key: Optional[str]) -> str:
+        return self._unkeyed if key is None else f"{self._prefix}{key}"
+
+    async def subscribe(self, key: Optional[str] = None, after: Optional[int] = None) -> AsyncIterator[dict]:
+        """
+        Eventos da chave como {"cursor", "key", "data"}. Com `after` (último cursor
+        recebido pelo cliente), começa pelos eventos perdidos; se não for possível,
+        o primeiro item é {"cursor": None, "resync": True} e o cliente recarrega.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._max_queue)
+        self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            # Inscreve antes de ler o buffer: nada publicado no meio se perde
+            await self._listen(key)
+            last = None
+            if after is not None:
+                missed = await self._replay(key, int(after)) if str(after).isdigit() else None
+                if missed is None:
+                    yield {"cursor": None, "resync": True}
+                else:
+                    last = int(after)
+                    for envelope in missed:
+                        last = envelope["cursor"]
+                        yield envelope
+            while True:
+                envelope = await queue.get()
+                cursor = envelope["cursor"]
+                if cursor is not None:
+                    # Já entregue pelo replay (do inscrito ou do nó, após reconectar)
+                    if last is not None and cursor <= last:
+                        continue
+                    last = cursor
+                yield envelope
+        finally:
+            queues = self._subscribers.get(key)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[key]
+                    asyncio.create_task(self._unlisten(key))
+
+    async def current_cursor(self) -> int:
+        """Cursor do último evento publicado (enviado junto da carga inicial)."""
+        return int(await self._cache.get_str(self._seq_key) or 0)
+
+    async def _replay(self, key: Optional[str], after: int) -> Optional[list]:
+        """Eventos da chave depois de `after`; None se parte deles saiu do buffer."""
+        current = await self.current_cursor()
+        if after > current:
+            return None  # sequência reiniciada (Redis limpo)
+        if after == current:
+            return []
+        entries = await self._cache.zrangebyscore(self._log_key, f"({after}", "+inf")
+        if not entries or int(entries[0][1]) != after + 1:
+            return None
+        envelopes = [self._cache.decode(member) for member, _ in entries]
+        return [e for e in envelopes if key is None or e.get("broadcast") or e["key"] == key]
+
+    def _all_queues(self) -> list:
+        return [q for group in self._subscribers.values() for q in group]
+
+    def _local_queues(self, envelope: dict) -> list:
+        """Filas deste nó que recebem o evento."""
+        if envelope.get("broadcast"):
+            return self._all_queues()
+        key = envelope["key"]
+        if key is None:
+            return list(self._subscribers.get(None, ()))
+        return [*self._subscribers.get(key, ()), *self._subscribers.get(None, ())]
+
+    def _deliver(self, queues: Iterable[asyncio.Queue], event: dict):
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    # ------------------------
+    # Assinaturas no Redis (só chaves com inscritos neste nó)
+    # ------------------------
+    async def _listen(self, key: Optional[str]):
+        async with self._subscriptions_lock:
+            if self._pubsub is None or key not in self._subscribers:
+                return
+            if key is None:
+                await self._pubsub.psubscribe(f"{self._prefix}*")
+            await self._pubsub.subscribe(self._channel(key))
+
+    async def _unlisten(self, key: Optional[str]):
+        async with self._subscriptions_lock:
+            # Outro socket pode ter se inscrito na mesma chave enquanto isso
+            if self._pubsub is None or key in self._subscribers:
+                return
+            try:
+                if key is None:
+                    await self._pubsub.punsubscribe(f"{self._prefix}*")
+                await self._pubsub.unsubscribe(self._channel(key))
+            except Exception as e:
+                logging.error(f"Erro ao cancelar assinatura de {self.name}: {e}")
+
+    def _on_message(self, message: dict):
+        channel = message.get("channel")
+        envelope = self._cache.decode(message["data"])
+        self.received += 1
+        if envelope.get("cursor") is not None:
+            self._last_cursor = max(self._last_cursor or 0, envelope["cursor"])
+        if channel == self._broadcast:
+            queues = self._all_queues()
+        elif message["type"] == "pmessage" or channel == self._unkeyed:
+            # Quem recebe tudo (o canal também pode estar assinado por chave neste nó)
+            queues = self._subscribers.get(None, ())
+        else:
+            queues = self._subscribers.get(channel[len(self._prefix):], ())
+        self._deliver(list(queues), envelope)
+
+    async def _run_listener(self, stop_event: asyncio.Event):
+        while not stop_event.is_set():
+            pubsub = self._cache.pubsub()
+            try:
+                async with self._subscriptions_lock:
+                    await pubsub.subscribe(self._broadcast)
+                    if self._subscribers:
+                        await pubsub.subscribe(*[self._channel(k) for k in self._subscribers])
+                    if None in self._subscribers:
+                        await pubsub.psubscribe(f"{self._prefix}*")
+                    self._pubsub = pubsub
+                await self._recover()
+                while not stop_event.is_set():
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message["type"] in ("message", "pmessage"):
+                        self._on_message(message)
+            except Exception as e:
+                logging.error(f"Erro na assinatura do feed {self.name}: {e}")
+            finally:
+                self._pubsub = None
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _recover(self):
+        """
+        Chamado a cada (re)assinatura: entrega aos inscritos locais o que foi
+        publicado enquanto o nó não estava assinando. Se parte já saiu do
+        buffer, todos recebem um pedido de recarga.
+        """
+        current = await self.current_cursor()
+        if self._last_cursor is None or not self._subscribers:
+            self._last_cursor = current
+            return
+        missed = await self._replay(None, self._last_cursor)
+        if missed is None:
+            self.resyncs += 1
+            self._deliver(self._all_queues(), {"cursor": None, "resync": True})
+            self._last_cursor = current
+            return
+        for envelope in missed:
+            queues = self._local_queues(envelope)
+            if queues:
+                self._deliver(queues, envelope)
+                self.recovered += 1
+            self._last_cursor = max(self._last_cursor, envelope["cursor"])
+
+    # ------------------------
+    # Produtor (líder)
+    # ------------------------
+    async def _consume(self):
+        raw_token = await self._cache.get_str(self._resume_key)
+        start_after = self._cache.decode(raw_token) if raw_token else None
+        try:
+            async for token, event in self._watch(start_after=start_after):
+                await self._publish(token, event)
+        except Exception:
+            if start_after:
+                # Token fora do oplog: a próxima tentativa começa do momento atual
+                logging.error(f"Resume token do feed {self.name} descartado")
+                await self._cache.delete(self._resume_key)
+            raise
+
+    async def _publish(self, token: dict, event: dict):
+        broadcast = bool(self._broadcast_if and self._broadcast_if(event))
+        key = None if broadcast else self._key_of(event)
+        message = {"key": key, "data": event}
+        if broadcast:
+            message["broadcast"] = True
+        await self._cache.eval(
+            self._PUBLISH,
+            [self._seq_key, self._log_key, self._resume_key],
+            [self._cache.encode(message), self.REPLAY_SIZE, self.LOG_TTL, self._cache.encode(token),
+             self._broadcast if broadcast else self._channel(key)]
+        )
+        self.published += 1
+
+    async def _produce_while_leader(self, stop_event: asyncio.Event):
+        """Mantém o change stream enquanto renovar a liderança."""
+        consumer = asyncio.create_task(self._consume())
+        self.leader = True
+        try:
+            while True:
+                done, _ = await asyncio.wait({consumer}, timeout=self.LEADER_TTL / 3)
+                if done:
+                    consumer.result()
+                    return
+                if stop_event.is_set() or not await self._cache.acquire_lock(self._leader_key, self._node_id, self.LEADER_TTL):
+                    return
+        finally:
+            self.leader = False
+            if not consumer.done():
+                consumer.cancel()
+                try:
+                    await consumer
+                except asyncio.CancelledError:
+                    pass
+
+    async def _run_producer(self, stop_event: asyncio.Event):
+        while not stop_event.is_set():
+            try:
+                if await self._cache.acquire_lock(self._leader_key, self._node_id, self.LEADER_TTL):
+                    await self._produce_while_leader(stop_event)
+            except Exception as e:
+                logging.error(f"Erro no change stream de {self.name}: {e}")
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.RETRY_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_forever(self, stop_event: asyncio.Event):
+        """Assinatura dos canais (todo nó) e change stream (apenas o líder)."""
+        await asyncio.gather(self._run_listener(stop_event), self._run_producer(stop_event))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "leader": self.leader,
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "keys": len(self._subscribers),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "recovered": self.recovered,
+            "resyncs": self.resyncs,
+        }
+
+
+# Mesma semântica de `_PUBLISH` para o backend em memória
+@memory_script(ChangeFeed._PUBLISH)
+def _publish_in_memory(store, keys, args):
+    cursor = store.incr(keys[0])
+    envelope = f'{{"cursor":{cursor},{args[0][1:]}'
+    store.zadd(keys[1], {envelope: cursor})
+    store.zremrangebyscore(keys[1], "-inf", cursor - int(args[1]))
+    store.expire(keys[1], int(args[2]))
+    store.set(keys[2], args[3], ex=int(args[2]))
+    store.publish(args[4], envelope)
+    return cursor
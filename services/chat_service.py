@@ -8,8 +8,17 @@ from repositories.template import TemplateRepository
 from services.contact_service import ContactService
 from client.whatsapp.V24 import WhatsAppClient
 from domain.config.chat_config import ChatConfig
+from services.inactivity_service import InactivityScheduler
+from services.window_service import ConversationWindowTracker
+from services.chat_state_buffer import ChatStateBuffer
+from services.inbox_service import AttendantInbox
+from services.chat_state_store import ChatStateStore
+from services.queue_service import SectorQueue
+from services.change_feed import ChangeFeed
+from services.load_service import AttendantLoad
 
 from typing import List, Dict, Optional
+import asyncio
 import json
 from bson import ObjectId
 from datetime import datetime
@@ -27,7 +36,15 @@ class ChatService:
                  config_repo, 
                  template_repo, 
                  contact_service, 
-                 cache,):
+                 cache,
+                 inactivity_scheduler,
+                 window_tracker,
+                 state_buffer,
+                 inbox,
+                 chat_state,
+                 queue,
+                 chat_feed,
+                 load,):
         self.wa_client : WhatsAppClient = wa_client
         self.chat_repo : ChatRepository= chat_repo
         self._config_repo : ConfigRepository = config_repo
@@ -35,6 +52,16 @@ class ChatService:
         self._template_repo : TemplateRepository = template_repo
         self._contact_service : ContactService = contact_service
         self._cache : Cache = cache
+        self._inactivity : InactivityScheduler = inactivity_scheduler
+        self._window : ConversationWindowTracker = window_tracker
+        self._state_buffer : ChatStateBuffer = state_buffer
+        self._inbox : AttendantInbox = inbox
+        self._chat_state : ChatStateStore = chat_state
+        self._queue : SectorQueue = queue
+        self._chat_feed : ChangeFeed = chat_feed
+        self._load : AttendantLoad = load
+        # Promoções disparadas fora da requisição (referência forte até terminarem)
+        self._background: set = set()
 
     # ------
     # Config Cache
@@ -42,17 +69,13 @@ class ChatService:
     async def get_cached_config(self) -> ChatConfig:
         """Busca configuração no cache ou banco e retorna objeto ChatConfig."""
         cache_key = "config:global"
-        cached = await self._cache.get(cache_key)
-        
-        if cached:
-            data = json.loads(cached)
-            return ChatConfig(**data)
-
-        # Busca no repositório (ajustado para usar self._config_repo)
-        config_data = await self._config_repo.get_config()
+        # Config muda pouco: pode servir o valor antigo enquanto recarrega
+        config_data = await self._cache.get_or_load(
+            cache_key,
+            self._config_repo.get_config,
+            stale_while_revalidate=True
+        )
         if config_data:
-            # Cache de longa duração (ex: 1 hora) para configs que mudam pouco
-            await self._cache.set(cache_key, json.dumps(config_data))
             return ChatConfig(**config_data)
         
         raise ValueError("Configuração do sistema não encontrada no banco.")
@@ -62,71 +85,49 @@ class ChatService:
     
     async def get_cached_contact(self, phone: str) -> Optional[Dict]:
         key = f"contact:{phone}"
-        contact = await self._cache.hgetall(key)
-        if contact:
-            return contact
-        
-        # Se não houver no cache, busca no service (banco)
-        contact = await self._contact_service.find_by_phone(phone)
-        if contact:
-            # Salva como Hash
-            await self._cache.hset(key, contact)
-        return contact
+        # Hash no cache; contatos desconhecidos ficam em cache negativo por alguns segundos
+        return await self._cache.get_or_load(
+            key,
+            lambda: self._contact_service.get_by_phone(phone),
+            as_hash=True
+        )
 
     # ----------------------------------------------------------------
     # CHAT CACHE (Listagens e Status)
     # ----------------------------------------------------------------
 
     async def get_chats_by_attendant(self, attendant_id: str) -> List[Dict]:
+        """Primeira página da inbox do atendente."""
+        page = await self.get_inbox_page(attendant_id)
+        return page["data"]
+
+    async def get_inbox_page(self, attendant_id: str, cursor: Optional[str] = None, limit: int = 50) -> Dict:
+        """
+        Página da inbox do atendente servida pelo ZSET `inbox:{attendant_id}`.
+        Retorna {"data": [...], "next_cursor": ...}; passe `next_cursor` para obter a próxima página.
+        """
         try:
             await self._validate_objectid(attendant_id)
-            cache_key = f"chats:attendant:{attendant_id}"
-            
-            # 1. Tenta Cache
-            cached = await self._cache.get(cache_key)
-            if cached:
-                return json.loads(cached) if isinstance(cached, str) else cached
-
-            # 2. Busca Banco
-            chats = await self.chat_repo.get_chats_by_attendant(attendant_id)
-            
-            # 3. Salva no Cache (serializando para string JSON)
-            if chats:
-                await self._cache.set(cache_key, json.dumps(chats))
-            
-            return chats
+            return await self._inbox.page(attendant_id, cursor=cursor, limit=limit)
         except Exception as e:
             logging.error(f"Erro ao buscar chats por atendente: {e}")
-            return []
-
-    async def get_last_chat_status(self, phone: str) -> Optional[Dict]:
-        """Retorna o objeto do último chat, priorizando o cache."""
-        cache_key = f"chat:last:{phone}"
-        
-        cached = await self._cache.get(cache_key)
-        if cached:
-            return json.loads(cached) if isinstance(cached, str) else cached
-
-        chat = await self.chat_repo.get_last_chat(phone)
-        if chat:
-            await self._cache.set(cache_key, json.dumps(chat))
-        return chat
+            return {"data": [], "next_cursor": None}
 
-    # ----------------------------------------------------------------
-    # INVALIDAÇÃO (Gatilhos de mudança de estado)
-    # ----------------------------------------------------------------
+    async def get_last_chat_status(self, phone: str, allow_stale: bool = False) -> Optional[Dict]:
+        """
+        Retorna o objeto do último chat, priorizando o cache.
+        Misses concorrentes compartilham uma única consulta ao Mongo (single-flight + lock no Redis).
+        `allow_stale` serve o valor anterior à invalidação enquanto recarrega (apenas para leituras
+        que toleram status desatualizado, nunca para roteamento).
+        """
+        return await self._chat_state.get(phone, allow_stale=allow_stale)
 
-    async def _invalidate_chat_data(self, phone: str, attendant_id: Optional[str] = None):
-        """Limpa o cache relacionado quando um chat muda de estado ou atendente."""
-        # Limpa o último chat do cliente
-        await self._cache.delete(f"chat:last:{phone}")
-        
-        # Se soubermos o atendente, limpamos a lista dele
-        if attendant_id:
-            await self._cache.delete(f"chats:attendant:{attendant_id}")
-        
-        # Alternativa: Se houver muitos atendentes, pode usar o prefixo
-        # await self._cache.invalidate_prefix("chats:attendant:")
+    async def get_chat_fields(self, phone: str, fields: List[str], allow_stale: bool = False) -> Optional[Dict]:
+        """
+        Apenas os campos pedidos do último chat (HMGET em `chat:state:{phone}`),
+        sem transferir o documento inteiro. Retorna None se o telefone não tem chat.
+        """
+        return await self._chat_state.get_fields(phone, fields, allow_stale=allow_stale)
 
     # ------------------------
     # Template Operations
@@ -185,9 +186,16 @@ class ChatService:
     # ------------------------
     # Streams
     # ------------------------
-    async def stream_chats(self, attendant: Optional[str] = None):
-        async for chat in self.chat_repo.watch_chats(attendant_id=attendant):
-            yield chat
+    async def current_stream_cursor(self) -> int:
+        return await self._chat_feed.current_cursor()
+
+    async def stream_chats(self, attendant: Optional[str] = None, after: Optional[int] = None):
+        """
+        Mudanças nos chats do atendente (ou de todos) como {"cursor", "data"};
+        `after`: último cursor recebido pelo cliente (ver ChangeFeed.subscribe).
+        """
+        async for envelope in self._chat_feed.subscribe(attendant, after=after):
+            yield envelope
     # ------------------------
     # Sending Messages
     # ------------------------
@@ -275,19 +283,29 @@ class ChatService:
         """
         Garante que Banco e Cache estejam SEMPRE iguais.
         Resolve o problema de 'Stale Data'.
+
+        No cache, apenas os campos alterados são gravados (HSET parcial em
+        `chat:state:{phone}`). Com o buffer ativo, só a atualização do banco é
+        adiada (mesclada e gravada em lote); se o hash não está no cache, um
+        recarregamento viria do banco sem os campos pendentes, então grava direto.
         """
+        if self._state_buffer.running:
+            if await self._inbox.apply(phone, update_data):
+                return self._state_buffer.add(phone, update_data)
+            update_data = {**await self._state_buffer.take(phone), **update_data}
+            return await self.chat_repo.update(data=update_data, phone_number=phone)
+
         # 1. Atualiza o banco (o repositório deve retornar o objeto atualizado)
         updated_chat = await self.chat_repo.update(data=update_data, phone_number=phone)
         
         if updated_chat:
-            # 2. Atualiza o cache imediatamente
-            cache_key = f"chat:last:{phone}"
-            await self._cache.set(cache_key, json.dumps(updated_chat))
+            # 2. Atualiza o cache imediatamente (somente os campos alterados)
+            await self._inbox.apply(phone, update_data)
         
         return updated_chat
     
-    async def update_received_message(self, phone: str, message: dict):
-        """Atualiza banco e cache após receber mensagem."""
+    async def update_received_message(self, phone: str, message: dict, config: Optional[ChatConfig] = None):
+        """Atualiza banco e cache após receber mensagem e reagenda o encerramento por inatividade."""
         # Normaliza `text` que pode ser dict {'body': ...} ou string
         text_val = message.get("text")
         if isinstance(text_val, dict):
@@ -301,11 +319,17 @@ class ChatService:
             "timestamp": message.get("timestamp"),
             "direction": "incoming"
         }
+        now = int(datetime.now(TZ_BR).timestamp())
         data = {
-            "last_client_interaction_at": int(datetime.now(TZ_BR).timestamp()),
+            "last_client_interaction_at": now,
             "last_message": last_message
         }
-        return await self._update_chat_state(phone, data)
+        updated_chat = await self._update_chat_state(phone, data)
+        await self._window.touch(phone, now)
+
+        config = config or await self.get_cached_config()
+        await self._inactivity.schedule(phone, now, config.inactivity_timeout_minutes * 60)
+        return updated_chat
 
     async def update_sent_message(self, phone: str, message: dict):
         """Atualiza banco e cache após enviar mensagem."""
@@ -334,7 +358,7 @@ class ChatService:
         """Inicia uma nova sessão de chat para um cliente."""
         # 1. Verifica se já tem sessão ativa
         try:
-            chat = await self.get_last_chat_status(phone)
+            chat = await self.get_chat_fields(phone, ["status", "attendant_id"])
             if chat and (chat.get("status") == ChatStatus.ACTIVE.value or chat.get("status") == ChatStatus.WAITING_MENU.value):
                 raise ValueError("Cliente já possui uma sessão ativa ou está no menu de espera")
 
@@ -349,11 +373,11 @@ class ChatService:
                 last_client_interaction_at=int(datetime.now(TZ_BR).timestamp()),
             ).to_dict()
             await self.chat_repo.create_chat(new_chat)
+            if attendant_id:
+                await self._load.acquire(attendant_id)
+            await self._window.touch(phone, new_chat["last_client_interaction_at"])
 
-            await self.set_active_chats(phone=phone)
-            await self._invalidate_attendant_cache(attendant_id)
-
-            await self._invalidate_chat_data(phone, attendant_id)
+            await self._inbox.upsert(new_chat, previous_attendant_id=(chat or {}).get("attendant_id"))
             return new_chat
         except Exception as e:
             logging.error(f"Erro ao iniciar chat: {e}")
@@ -367,7 +391,7 @@ class ChatService:
             raise ValueError("Novo atendente não encontrado.")
 
         # 2. Verifica se tem sessão ativa
-        chat = await self.get_last_chat_status(phone = phone)
+        chat = await self.get_chat_fields(phone, ["status", "attendant_id"])
 
         if not chat or not (chat.get("status") == ChatStatus.ACTIVE.value or chat.get("status") == ChatStatus.WAITING_MENU.value):
             raise ValueError("Cliente não possui sessão ativa para transferir.")
@@ -377,23 +401,32 @@ class ChatService:
         
         assing = await self.chat_repo.assign_attendant(phone, new_attendant_id, category)
         
-        await self._invalidate_attendant_cache(new_attendant_id)
-        if old_attendant_id:
-            await self._invalidate_attendant_cache(old_attendant_id)
+        await self._inbox.move(phone, old_attendant_id, new_attendant_id, {"category": category})
+
+        # Transferência manual: o novo atendente recebe o chat mesmo acima da capacidade
+        if old_attendant_id != new_attendant_id:
+            await self._load.acquire(new_attendant_id)
+            await self._release_attendant(old_attendant_id)
         
         return assing
 
     async def finish_chat(self, phone: str):
         """Finaliza a sessão ativa do cliente."""
         try:
-            chat = await self.get_last_chat_status(phone)
+            chat = await self.get_chat_fields(phone, ["status", "attendant_id"])
             if not chat:
                 raise ValueError("Sessão não encontrada.")
 
-            await self.chat_repo.close_chat(phone)
+            closed = await self.chat_repo.close_chat(phone)
+            await self._inactivity.unschedule(phone)
+            await self._queue.remove(phone)
             
-            # GATILHO CACHE: Remove do cache pois o status mudou
-            await self._invalidate_chat_data(phone, chat.get("attendant_id"))
+            # GATILHO CACHE: o status muda direto no hash do chat
+            await self._inbox.apply(phone, {"status": ChatStatus.CLOSED.value})
+
+            # Atendente liberado: a vaga volta e a fila dos setores dele é promovida em segundo plano
+            if closed:
+                await self._release_attendant(chat.get("attendant_id"))
             return {"message": "Finalizado"}
         except Exception as e:
             logging.error(f"Erro ao finalizar chat para {phone}: {e}")
@@ -406,8 +439,14 @@ class ChatService:
         - Se interagir pela última vez > 24h: Janela fechada (False)
         - Se dentro de 24h: Janela aberta (True)
         """
-        # 1. Busca sessão ativa ou última sessão
-        chat = await self.get_last_chat_status(phone)
+        # 1. Consulta o índice da janela (um único ZSCORE)
+        is_open = await self._window.is_open(phone)
+        if is_open is not None:
+            return is_open
+
+        # 2. Telefone fora do índice (índice recém-criado ou sem contato há mais de 30
+        # dias): usa o último chat e reabastece
+        chat = await self.get_chat_fields(phone, ["last_client_interaction_at"], allow_stale=True)
 
         if not chat:
             return False # Nunca houve contato
@@ -416,10 +455,16 @@ class ChatService:
         if not last_interaction:
             return False
 
+        await self._window.touch(phone, int(last_interaction))
+
         if int(last_interaction) < int(datetime.now(TZ_BR).timestamp() - 24*3600):
             return False
         
         return True
+
+    async def windows_closing_within(self, seconds: int = 3600) -> List[Dict]:
+        """Chats cuja janela de 24h fecha nos próximos `seconds` segundos (dashboard)."""
+        return await self._window.closing_within(seconds)
     
     async def process_incoming_message(self, message: Any):
         try:
@@ -439,17 +484,17 @@ class ChatService:
             # Always fetch config early because it is used in multiple branches
             config = await self.get_cached_config()
 
-            chat = await self.get_last_chat_status(phone)
+            chat = await self.get_chat_fields(phone, ["_id", "status", "attendant_id"])
             if not chat or chat.get("status") not in [ChatStatus.ACTIVE.value, ChatStatus.WAITING_MENU.value]:
-                await self._automated_start_new_chat(phone, config=config)
+                await self._automated_start_new_chat(phone, config=config, previous=chat)
 
             # Gerenciamento de Estado usando Match (Python 3.10+)
             status = chat.get("status")
             if status == ChatStatus.WAITING_MENU.value or status == "waiting_menu":
                 await self._handle_menu_selection(chat, msg_dict, config)
-                await self.update_received_message(phone, msg_dict)
+                await self.update_received_message(phone, msg_dict, config)
             elif status == ChatStatus.ACTIVE.value or status == "active":
-                await self.update_received_message(phone, msg_dict)
+                await self.update_received_message(phone, msg_dict, config)
         except Exception as e:
             logging.error(f"Erro ao processar mensagem: {e}")
             return None
@@ -491,7 +536,7 @@ class ChatService:
                 
         return False
     
-    async def _automated_start_new_chat(self, phone: str, config: ChatConfig):
+    async def _automated_start_new_chat(self, phone: str, config: ChatConfig, previous: Optional[dict] = None):
         new_chat = Chat(
                 phone_number=phone,
                 status=ChatStatus.WAITING_MENU.value,
@@ -500,6 +545,9 @@ class ChatService:
                 last_client_interaction_at=int(datetime.now(TZ_BR).timestamp()),
             )
         await self.chat_repo.create_chat(new_chat.to_dict())
+        await self._window.touch(phone, new_chat.last_client_interaction_at)
+        # A nova sessão ainda não tem atendente: sai da inbox do atendente anterior
+        await self._inbox.upsert(new_chat.to_dict(), previous_attendant_id=(previous or {}).get("attendant_id"))
         # Removed set_active_chats which was undefined
         
         # Prepara botões - Garante fallback se config estiver vazia
@@ -540,7 +588,7 @@ class ChatService:
 
         # Roteamento baseado em setor
         if selected_btn.sector in ["Comercial", "Financeiro", "Outros"]:
-            await self._route_sector(phone, config, selected_btn.sector)
+            await self._route_sector(phone, config, selected_btn.sector, queue_name=selected_btn.queue_id)
 
     def _normalize_phone(self, phone: str) -> str:
         """Normaliza telefone para formato padrão (BR com 9 dígitos)"""
@@ -548,49 +596,54 @@ class ChatService:
             return f"{phone[:4]}9{phone[4:]}"
         return phone
 
+    def _on_shift(self, hours: Optional[str]) -> bool:
+        """Bitmap de expediente do roster (ver AttendantService.sector_roster)."""
+        if hours is None:
+            return True
+        now_dt = datetime.now(TZ_BR)
+        minute = now_dt.weekday() * 24 * 60 + now_dt.hour * 60 + now_dt.minute
+        return bool(int(hours, 16) >> minute & 1)
+
     async def _get_next_attendant(self, sector: str) -> Optional[dict]:
-        # 1. Busca todos atendentes do setor
-        all_attendants = await self._attendant_service.list_attendants({"sector": sector})
-        
+        # 1. Roster do setor (cache, sem consultar atendentes no Mongo), ordenado por _id
+        roster = await self._attendant_service.sector_roster(sector)
+
         # 2. Filtra por horário de trabalho
-        working_attendants = [
-            a for a in all_attendants 
-            if self._is_working_hour(a.get("working_hours"))
+        working_attendants = [a for a in roster if self._on_shift(a.get("hours"))]
+
+        # 3. Só quem está abaixo da capacidade (chats abertos < capacity)
+        counts = await self._load.counts([a["_id"] for a in working_attendants])
+        available = [
+            a for a, open_chats in zip(working_attendants, counts)
+            if a.get("capacity") is None or open_chats < a["capacity"]
         ]
-        
-        if not working_attendants:
+
+        if not available:
             return None
-            
-        # 3. Ordena para estabilidade (por _id)
-        working_attendants.sort(key=lambda x: str(x["_id"]))
-        
-        # 4. Recupera último atendente atribuído genericamente nesta categoria
-        last_id = await self.chat_repo.get_last_assigned_attendant_id()
-        
-        if not last_id:
-            return working_attendants[0]
-            
-        # 5. Rotativo (Round Robin)
-        try:
-            # Procura índice do último (comparando strings)
-            last_index = next(
-                i for i, a in enumerate(working_attendants) 
-                if str(a["_id"]) == str(last_id)
-            )
-            # Pega o próximo
-            next_index = (last_index + 1) % len(working_attendants)
-            return working_attendants[next_index]
-        except StopIteration:
-            # Caso o último não esteja mais trabalhando/existindo, pega o primeiro
-            return working_attendants[0]
-
-    async def _route_sector(self, phone: str, config: ChatConfig, sector_name: str):
+
+        # 4. Rotativo (Round Robin): contador por setor no Redis, compartilhado entre os nós
+        turn = await self._cache.incr(f"route:rr:{sector}")
+        return available[(turn - 1) % len(available)]
+
+    @staticmethod
+    def _queue_sector(config: ChatConfig, queue_name: str) -> str:
+        """Setor atendido pela fila (`queue_id` de um botão); sem botão, a fila é o próprio setor."""
+        return next((b.sector for b in config.greeting_buttons if b.queue_id == queue_name and b.sector), queue_name)
+
+    @staticmethod
+    def _sector_queues(config: ChatConfig, sector_name: str) -> set:
+        """Filas cujos chats o setor atende."""
+        return {b.queue_id or sector_name for b in config.greeting_buttons if b.sector == sector_name} | {sector_name}
+
+    async def _route_sector(self, phone: str, config: ChatConfig, sector_name: str, queue_name: Optional[str] = None):
         """
         Roteia o cliente para um atendente:
         1. Tenta o atendente fidelizado (se estiver em horário de trabalho).
         2. Caso contrário, busca o próximo disponível via Round Robin.
         3. Atualiza o chat com o setor e o atendente final.
+        Sem atendente, espera na fila `queue_name` (o `queue_id` do botão) ou na do setor.
         """
+        queue_name = queue_name or sector_name
         search_phone = self._normalize_phone(phone)
         attendant = None
         
@@ -615,41 +668,139 @@ class ChatService:
         if not attendant and fixed_attendant:
             attendant = fixed_attendant
 
-        # Se ninguém puder atender (nem fidelizado, nem equipe disponível)
-        if not attendant:
-            logging.warning(f"Nenhum atendente disponível no setor {sector_name} para {phone}")
-            # Opcional: Enviar mensagem de 'setor offline' aqui
-            return None
+        # Se ninguém puder atender (nem fidelizado, nem equipe disponível), ou se já
+        # existe fila no setor (quem chegou antes é atendido primeiro): entra na fila
+        if not attendant or (not fixed_attendant and await self._queue.length(queue_name)):
+            return await self._wait_in_queue(phone, queue_name, sector_name, config, drain=attendant is not None)
 
+        # O fixo é atendido mesmo acima da capacidade; no rodízio, se a última vaga
+        # foi tomada entre a escolha e a reserva, o cliente espera na fila
+        assigned = await self._assign_attendant(
+            phone, attendant, sector_name, config, enforce_capacity=attendant is not fixed_attendant
+        )
+        if not assigned:
+            return await self._wait_in_queue(phone, queue_name, sector_name, config)
+
+    async def _wait_in_queue(self, phone: str, queue_name: str, sector_name: str, config: ChatConfig,
+                             drain: bool = False):
+        """Coloca o cliente na fila e avisa a posição e a espera estimada."""
+        position = await self._queue.enqueue(phone, queue_name)
+        if drain:
+            await self.drain_queue(queue_name, config)
+            position = await self._queue.position(phone, queue_name)
+            if position is None:
+                return None  # promovido agora mesmo
+
+        eta = await self._queue.estimated_wait(queue_name, position)
+        await self.wa_client.send_text(phone, config.queue_redirect_message.format(
+            sector=sector_name,
+            position=position,
+            eta_minutes=max(1, round(eta / 60)) if eta is not None else "?"
+        ))
+        return None
+
+    async def drain_queue(self, queue_name: str, config: Optional[ChatConfig] = None) -> int:
+        """Promove chats da fila enquanto houver atendente com vaga no setor dela."""
+        promoted = 0
+        config = config or await self.get_cached_config()
+        sector_name = self._queue_sector(config, queue_name)
+        while await self._queue.length(queue_name):
+            attendant = await self._get_next_attendant(sector_name)
+            if not attendant:
+                break
+            item = await self._queue.pop(queue_name)
+            if not item:
+                break
+
+            phone, arrival = item
+            try:
+                assigned = await self._assign_attendant(phone, attendant, sector_name, config)
+            except Exception as e:
+                logging.error(f"Erro ao promover {phone} da fila {queue_name}: {e}")
+                await self._queue.requeue(phone, queue_name, arrival)
+                break
+            if not assigned:
+                # Vaga tomada por outro nó entre a escolha e a reserva: tenta o próximo atendente
+                await self._queue.requeue(phone, queue_name, arrival)
+                continue
+            await self._queue.record_served(queue_name, phone, arrival)
+            promoted += 1
+        return promoted
+
+    async def drain_queues(self) -> int:
+        """Promove chats de todas as filas (worker periódico e liberação de atendentes)."""
+        config = await self.get_cached_config()
+        promoted = 0
+        for queue_name in await self._queue.sectors():
+            promoted += await self.drain_queue(queue_name, config)
+        return promoted
+
+    async def _assign_attendant(self, phone: str, attendant: dict, sector_name: str, config: ChatConfig,
+                                enforce_capacity: bool = True) -> bool:
+        """
+        Reserva uma vaga do atendente, atribui o chat e envia a mensagem de boas-vindas.
+        False se o atendente já está na capacidade (nada é alterado).
+        """
         # 3. Preparar dados para atualização
         attendant_id = str(attendant.get("_id"))
         attendant_name = attendant.get("name", "Atendente")
         sector_slug = sector_name.lower()
 
+        capacity = attendant.get("capacity") if enforce_capacity else None
+        if not await self._load.acquire(attendant_id, capacity):
+            return False
+
         # 4. Atualização Única (Atomicidade)
         # Atualiza status para ACTIVE (se necessário), category para o setor e o attendant_id
-        await self.chat_repo.assign_attendant(
-            phone=phone, 
-            attendant_id=attendant_id, 
-            category=sector_slug
-        )
-        
-        # Limpa cache para refletir as mudanças no próximo processamento
-        await self._invalidate_chat_data(phone, attendant_id)
+        try:
+            await self.chat_repo.assign_attendant(
+                phone=phone, 
+                attendant_id=attendant_id, 
+                category=sector_slug
+            )
+
+            # Atualiza atendente e setor direto no hash do chat e na inbox
+            await self._inbox.move(phone, None, attendant_id, {"category": sector_slug})
+            await self._queue.remove(phone)
+        except Exception:
+            await self._load.release(attendant_id)
+            raise
 
         # 5. Notificação de Boas-vindas
         welcome_msg = attendant.get("welcome_message") or \
                     config.attendant_assigned_message.format(attendant_name=attendant_name)
         
         await self.wa_client.send_text(phone, welcome_msg)
+        return True
+
+    async def _release_attendant(self, attendant_id: Optional[str]):
+        """Devolve a vaga do atendente e promove as filas dos setores dele fora da requisição."""
+        if not attendant_id:
+            return
+        await self._load.release(attendant_id)
+        task = asyncio.create_task(self._drain_attendant_sectors(attendant_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _drain_attendant_sectors(self, attendant_id: str):
+        try:
+            attendant = await self._attendant_service.find_by_id(attendant_id)
+            config = await self.get_cached_config()
+            for sector_name in (attendant or {}).get("sector") or []:
+                for queue_name in self._sector_queues(config, sector_name):
+                    if await self._queue.length(queue_name):
+                        await self.drain_queue(queue_name, config)
+        except Exception as e:
+            logging.error(f"Erro ao promover chats em espera do atendente {attendant_id}: {e}")
+
     async def _ensure_contact_synced(self, phone: str, profile_name: str):
         """
         Evita o gargalo de I/O: Só faz upsert se o contato não existir 
         ou se o nome de perfil mudou.
         """
         contact_key = f"contact:{phone}"
-        # hgetall retorna {} se não existir
-        cached_contact = await self._cache.hgetall(contact_key)
+        # get_hash retorna None se não existir
+        cached_contact = await self._cache.get_hash(contact_key)
 
         # Se o nome é o mesmo, não faz nada (Economia de DB)
         if cached_contact and cached_contact.get("name") == profile_name:
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from repositories.chat_repo import ChatRepository
+
+
+class ChatStateBuffer:
+    """
+    Write-behind para o estado do chat (last_message / last_*_interaction_at).
+
+    Só a gravação no Mongo é adiada: o hash compartilhado `chat:state:{phone}`
+    recebe os campos no momento da escrita (quem chama garante isso), então
+    todos os nós leem o estado atual. Rajadas do mesmo telefone são mescladas
+    em memória e gravadas em um único bulk_write a cada `flush_interval` segundos.
+    """
+
+    def __init__(self, chat_repo: ChatRepository, flush_interval: float = 0.5, max_pending: int = 500):
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending: Dict[str, dict] = {}
+        # Lote do flush em andamento e o evento sinalizado quando ele termina
+        self._inflight: Dict[str, dict] = {}
+        self._flushed = asyncio.Event()
+        self._repo = chat_repo
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Inicia a task de flush (chamado no lifespan da aplicação)."""
+        if not self.running:
+            self._stop.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Para a task e grava o que estiver pendente."""
+        self._stop.set()
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def add(self, phone: str, update: dict) -> dict:
+        """Mescla a atualização com as pendentes do mesmo telefone e retorna o estado mesclado."""
+        merged = self._pending.setdefault(phone, {})
+        merged.update(update)
+        if len(self._pending) >= self._max_pending:
+            self._wake.set()
+        return dict(merged)
+
+    async def take(self, phone: str) -> dict:
+        """
+        Remove e retorna o que está pendente do telefone (para gravar junto, sem
+        esperar o flush). Se o telefone está no lote de um flush em andamento,
+        espera ele terminar: o bulk_write antigo não pode chegar ao banco depois
+        da escrita direta de quem chamou.
+        """
+        while phone in self._inflight:
+            await self._flushed.wait()
+        return self._pending.pop(phone, None) or {}
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        self._inflight, flushed = batch, asyncio.Event()
+        self._flushed = flushed
+        try:
+            await self._repo.update_many(batch)
+        except Exception as e:
+            logging.error(f"Erro ao gravar estado de {len(batch)} chat(s): {e}")
+            # Devolve ao buffer sem sobrescrever atualizações mais novas
+            for phone, update in batch.items():
+                self._pending[phone] = {**update, **self._pending.get(phone, {})}
+            return 0
+        finally:
+            self._inflight = {}
+            flushed.set()
+
+        return len(batch)
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
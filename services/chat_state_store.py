@@ -0,0 +1,204 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from repositories.chat_repo import ChatRepository
+from utils.cache import Cache, CachePipeline
+from utils.codecs import default_codec
+from utils.memory_backend import memory_script
+
+_codec = default_codec()
+
+# Campos numéricos do chat (no hash do Redis tudo vira string)
+INT_FIELDS = ("created_at", "last_interaction_at", "last_client_interaction_at", "closed_at")
+JSON_FIELDS = ("last_message",)
+
+
+def encode_chat(chat: dict) -> Dict[str, str]:
+    """Documento do chat -> campos do hash `chat:state:{phone}`."""
+    mapping = {}
+    for field, value in chat.items():
+        if value is None or field == "action":
+            continue
+        mapping[field] = _codec.encode(value) if field in JSON_FIELDS else value
+    return mapping
+
+
+def decode_chat(data: Dict[str, str]) -> dict:
+    """Campos do hash -> documento do chat com os tipos originais."""
+    chat = dict(data)
+    for field in INT_FIELDS:
+        if isinstance(chat.get(field), str) and chat[field]:
+            chat[field] = int(float(chat[field]))
+    for field in JSON_FIELDS:
+        if isinstance(chat.get(field), str) and chat[field]:
+            chat[field] = _codec.decode(chat[field])
+    return chat
+
+
+class ChatStateStore:
+    """
+    Estado do último chat de cada telefone em `chat:state:{phone}` (HASH).
+
+    Mudanças de um campo viram um HSET parcial e leituras pedem só os campos
+    necessários (HMGET): `can_send_free_message` lê `last_client_interaction_at`,
+    o roteamento lê `status` e `attendant_id`. O documento completo só é
+    carregado do Mongo quando o hash não existe.
+    """
+
+    # Atualiza campos do hash (se existir), invalida carregamentos em andamento
+    # (versão) e, quando há score, reposiciona o telefone na inbox KEYS[3]. A
+    # chave vem pronta do Python (todas as chaves declaradas, como exige o
+    # Cluster); ARGV[4] é o atendente dono dela e o ZADD só acontece se o hash
+    # ainda aponta para ele (uma transferência no meio já reposicionou o telefone).
+    # A versão KEYS[2] recebe o TTL ARGV[5], como em `Cache.invalidate`. A inbox
+    # renova o TTL ARGV[7] e fica com os ARGV[6] mais recentes (0: sem limite);
+    # se algo sai, a marca KEYS[4] (se existir) passa a "partial".
+    _APPLY = """
+    if redis.call('exists', KEYS[1]) == 0 then
+        return 0
+    end
+    if #ARGV > 7 then
+        redis.call('hset', KEYS[1], unpack(ARGV, 8))
+    end
+    redis.call('expire', KEYS[1], ARGV[3])
+    redis.call('incr', KEYS[2])
+    redis.call('expire', KEYS[2], ARGV[5])
+    if ARGV[2] ~= '' and ARGV[4] ~= '' and redis.call('hget', KEYS[1], 'attendant_id') == ARGV[4] then
+        redis.call('zadd', KEYS[3], ARGV[2], ARGV[1])
+        if tonumber(ARGV[7]) > 0 then
+            redis.call('expire', KEYS[3], ARGV[7])
+        end
+        local limit = tonumber(ARGV[6])
+        if limit > 0 and redis.call('zcard', KEYS[3]) > limit then
+            redis.call('zremrangebyrank', KEYS[3], 0, -(limit + 1))
+            redis.call('set', KEYS[4], 'partial', 'XX', 'KEEPTTL')
+        end
+    end
+    return 1
+    """
+    # KEYS[3]/KEYS[4] quando não há inbox a reposicionar (nunca são escritas)
+    NO_INBOX_KEY = "inbox:-"
+
+    def __init__(self, cache: Cache, chat_repo: ChatRepository):
+        self._cache = cache
+        self._chat_repo = chat_repo
+
+    @staticmethod
+    def key(phone: str) -> str:
+        return f"chat:state:{phone}"
+
+    # ------------------------
+    # Leitura
+    # ------------------------
+    async def get(self, phone: str, allow_stale: bool = False) -> Optional[dict]:
+        """Documento completo; misses concorrentes compartilham uma única consulta ao Mongo."""
+        data = await self._cache.get_or_load(
+            self.key(phone),
+            lambda: self._chat_repo.get_last_chat(phone),
+            stale_while_revalidate=allow_stale,
+            lock_timeout=2,
+            as_hash=True
+        )
+        return decode_chat(data) if data else None
+
+    async def get_fields(self, phone: str, fields: List[str], allow_stale: bool = False) -> Optional[dict]:
+        """
+        Apenas os campos pedidos (HMGET). `phone_number` é sempre lido para
+        distinguir "hash inexistente" de "campo vazio".
+        """
+        wanted = list(dict.fromkeys(["phone_number", *fields]))
+        values = await self._cache.hmget(self.key(phone), wanted)
+        if values[0] is None:
+            chat = await self.get(phone, allow_stale=allow_stale)
+            if not chat:
+                return None
+            return {field: chat.get(field) for field in wanted}
+        return decode_chat({f: v for f, v in zip(wanted, values) if v is not None})
+
+    async def get_many(self, phones: List[str]) -> List[dict]:
+        """
+        Carrega vários hashes; os ausentes são buscados no banco em uma única
+        consulta e gravados pelo caminho versionado: as versões são lidas antes
+        dos hashes, então uma escrita concorrente (apply/replace/invalidate)
+        prevalece sobre o documento lido do banco.
+        """
+        keys = [self.key(p) for p in phones]
+        versions = await self._cache.get_str_many([self._cache.version_key(k) for k in keys])
+        states = await self._cache.get_hash_many(keys)
+        missing = {p: version or "" for p, state, version in zip(phones, states, versions) if not state}
+
+        reloaded = {}
+        if missing:
+            chats = await self._chat_repo.get_chats_by_phones(list(missing))
+            for chat in chats:
+                reloaded[chat["phone_number"]] = chat
+            await asyncio.gather(*[
+                self._cache.hset_if_version(self.key(chat["phone_number"]), encode_chat(chat), missing[chat["phone_number"]])
+                for chat in chats
+            ])
+
+        chats = []
+        for phone, state in zip(phones, states):
+            if state:
+                chats.append(decode_chat(state))
+            elif phone in reloaded:
+                chats.append(reloaded[phone])
+        return chats
+
+    # ------------------------
+    # Escrita
+    # ------------------------
+    async def replace(self, chat: dict):
+        """Grava o documento inteiro (nova sessão: campos da anterior não podem sobrar)."""
+        async with self._cache.pipeline(transaction=True) as pipe:
+            self.replace_in(pipe, chat)
+
+    def replace_in(self, pipe: CachePipeline, chat: dict):
+        """Mesmo que `replace`, enfileirado em um pipeline já aberto."""
+        key = self.key(chat["phone_number"])
+        pipe.invalidate(key)
+        pipe.hset(key, encode_chat(chat))
+
+    async def apply(self, phone: str, fields: dict,
+                    attendant_id: Optional[str] = None, inbox_key: Optional[str] = None,
+                    inbox_limit: int = 0, inbox_ttl: int = 0, ready_key: Optional[str] = None) -> bool:
+        """
+        HSET parcial dos campos alterados. Não cria o hash se ele não existir.
+        Com `inbox_key` (a inbox de `attendant_id`), reposiciona o telefone pelo
+        `last_interaction_at` dos campos, mantendo só os `inbox_limit` mais
+        recentes; se algum sai, `ready_key` é marcada como "partial".
+        """
+        key = self.key(phone)
+        mapping = self._cache.normalize_hash(encode_chat(fields))
+        score = fields.get("last_interaction_at")
+        if not (attendant_id and inbox_key):
+            attendant_id, inbox_key, ready_key = None, self.NO_INBOX_KEY, None
+        args = [phone, "" if score is None else int(score), self._cache.ttl_for(key) or 0, attendant_id or "",
+                self._cache.VERSION_TTL, int(inbox_limit), int(inbox_ttl)]
+        args += [item for pair in mapping.items() for item in pair]
+        keys = [key, self._cache.version_key(key), inbox_key, ready_key or self.NO_INBOX_KEY]
+        return bool(await self._cache.eval(self._APPLY, keys, args))
+
+    async def invalidate(self, phone: str):
+        await self._cache.invalidate(self.key(phone))
+
+
+# Mesma semântica de `_APPLY` para o backend em memória
+@memory_script(ChatStateStore._APPLY)
+def _apply_in_memory(store, keys, args):
+    if not store.exists(keys[0]):
+        return 0
+    if len(args) > 7:
+        store.hset(keys[0], items=args[7:])
+    store.expire(keys[0], int(args[2]))
+    store.incr(keys[1])
+    store.expire(keys[1], int(args[4]))
+    if args[1] != "" and args[3] != "" and store.hget(keys[0], "attendant_id") == args[3]:
+        store.zadd(keys[2], {args[0]: float(args[1])})
+        if int(args[6]) > 0:
+            store.expire(keys[2], int(args[6]))
+        limit = int(args[5])
+        if limit > 0 and store.zcard(keys[2]) > limit:
+            store.zrem(keys[2], *store.zrevrange(keys[2], limit, -1))
+            store.set(keys[3], "partial", xx=True, keepttl=True)
+    return 1
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from client.whatsapp.V24 import WhatsAppClient
+from domain.chat.chats import ChatStatus
+from domain.config.chat_config import ChatConfig
+from repositories.chat_repo import ChatRepository
+from repositories.config import ConfigRepository
+from services.inbox_service import AttendantInbox
+from services.load_service import AttendantLoad
+from services.queue_service import SectorQueue
+from utils.cache import Cache
+
+TZ_BR = ZoneInfo("America/Sao_Paulo")
+
+
+class InactivityScheduler:
+    """
+    Encerra chats ociosos.
+
+    Cada chat aberto fica em um ZSET com score = prazo de expiração
+    (last_client_interaction_at + timeout). O worker só lê os membros vencidos,
+    então o custo de cada ciclo cresce com o número de chats expirando, não com o total.
+    """
+    INDEX_KEY = "chats:inactivity"
+    LEADER_KEY = "chats:inactivity:leader"
+
+    def __init__(self,
+                 cache: Cache,
+                 chat_repo: ChatRepository,
+                 config_repo: ConfigRepository,
+                 wa_client: WhatsAppClient,
+                 inbox: AttendantInbox,
+                 queue: SectorQueue,
+                 load: AttendantLoad,
+                 interval: int = 15,
+                 batch_size: int = 200):
+        self._cache = cache
+        self._chat_repo = chat_repo
+        self._config_repo = config_repo
+        self._wa_client = wa_client
+        self._inbox = inbox
+        self._queue = queue
+        self._load = load
+        self._interval = interval
+        self._batch_size = batch_size
+        self._node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    # ------------------------
+    # Agendamento
+    # ------------------------
+    async def schedule(self, phone: str, last_client_interaction_at: int, timeout_seconds: int):
+        """(Re)agenda o encerramento do chat para last_client_interaction_at + timeout."""
+        await self._cache.zadd(self.INDEX_KEY, {phone: int(last_client_interaction_at) + int(timeout_seconds)})
+
+    async def unschedule(self, phone: str):
+        await self._cache.zrem(self.INDEX_KEY, phone)
+
+    # ------------------------
+    # Worker
+    # ------------------------
+    async def run_once(self) -> int:
+        """
+        Processa um ciclo: lê os vencidos do índice, fecha em lote e só então os
+        remove do índice (falha ou cancelamento antes disso: o próximo ciclo
+        tenta de novo). Quem interagiu depois do prazo é reagendado.
+        """
+        now = int(datetime.now(TZ_BR).timestamp())
+        closed_total = 0
+        config: Optional[ChatConfig] = None
+
+        while True:
+            due = await self._cache.zrange_due(self.INDEX_KEY, now, limit=self._batch_size)
+            if not due:
+                break
+            phones = [phone for phone, _ in due]
+
+            if config is None:
+                config_data = await self._config_repo.get_config()
+                config = ChatConfig(**config_data) if config_data else ChatConfig()
+
+            timeout = config.inactivity_timeout_minutes * 60
+            closed, pending = await self._chat_repo.close_inactive_chats(phones, cutoff=now - timeout, closed_at=now)
+
+            # Fechados ou que já não estão abertos saem do índice (se a ingestão não os
+            # reagendou nesse meio tempo); abertos com interação recente ganham o novo prazo
+            await self._cache.zrem_unchanged(self.INDEX_KEY, [(p, s) for p, s in due if p not in pending])
+            if pending:
+                await self._cache.zadd(self.INDEX_KEY, {p: int(last) + timeout for p, last in pending.items()})
+
+            message = config.inactivity_closed_message.format(minutes=config.inactivity_timeout_minutes)
+            for chat in closed:
+                phone = chat["phone_number"]
+                await self._inbox.apply(phone, {"status": ChatStatus.CLOSED.value, "closed_at": now})
+                await self._queue.remove(phone)
+                # A vaga volta ao atendente; o worker das filas promove quem espera
+                await self._load.release(chat.get("attendant_id"))
+                try:
+                    await self._wa_client.send_text(phone, message)
+                except Exception as e:
+                    logging.error(f"Erro ao notificar encerramento por inatividade para {phone}: {e}")
+
+            closed_total += len(closed)
+            if len(phones) < self._batch_size:
+                break
+
+        if closed_total:
+            logging.info(f"{closed_total} chat(s) encerrado(s) por inatividade")
+        return closed_total
+
+    async def run_forever(self, stop_event: asyncio.Event):
+        """Loop do worker. Apenas o nó que detém o lock de líder processa o índice."""
+        lock_ttl = self._interval * 3
+        while not stop_event.is_set():
+            try:
+                if await self._cache.acquire_lock(self.LEADER_KEY, self._node_id, lock_ttl):
+                    await self.run_once()
+            except Exception as e:
+                logging.error(f"Erro no worker de inatividade: {e}")
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
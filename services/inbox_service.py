@@ -0,0 +1,177 @@
+from typing import Optional
+
+from repositories.chat_repo import ChatRepository
+from services.chat_state_store import ChatStateStore
+from utils.cache import Cache
+
+
+class AttendantInbox:
+    """
+    Inbox materializada por atendente.
+
+    - `inbox:{attendant_id}`: ZSET de telefones com score = last_interaction_at
+    - `chat:state:{phone}`: HASH com os campos do chat (ver `ChatStateStore`)
+
+    A primeira página e "a página depois do cursor X" são resolvidas com
+    ZREVRANGE/ZREVRANK (O(log n)) e um HGETALL em pipeline, sem consultar o Mongo.
+    O ZSET é montado a partir do banco uma única vez e depois mantido
+    incrementalmente pelas mudanças de estado do chat.
+    """
+    # Quantos chats por atendente são materializados; páginas além disso vão ao Mongo por keyset
+    MAX_ENTRIES = 1000
+    READY_TTL = 24 * 3600
+
+    def __init__(self, cache: Cache, chat_repo: ChatRepository, state: ChatStateStore):
+        self._cache = cache
+        self._chat_repo = chat_repo
+        self._state = state
+
+    @staticmethod
+    def _inbox_key(attendant_id: str) -> str:
+        return f"inbox:{attendant_id}"
+
+    @staticmethod
+    def _ready_key(attendant_id: str) -> str:
+        return f"inbox:ready:{attendant_id}"
+
+    @staticmethod
+    def _cursor(phone: str, score: float) -> str:
+        return f"{int(score)}:{phone}"
+
+    # ------------------------
+    # Manutenção incremental
+    # ------------------------
+    async def upsert(self, chat: dict, previous_attendant_id: Optional[str] = None):
+        """
+        Grava o chat completo e o posiciona na inbox do atendente (se houver).
+        `previous_attendant_id`: dono da sessão anterior, de cuja inbox o telefone sai.
+        """
+        phone = chat.get("phone_number")
+        if not phone:
+            return
+        attendant_id = chat.get("attendant_id")
+        async with self._cache.pipeline(transaction=True) as pipe:
+            if previous_attendant_id and previous_attendant_id != attendant_id:
+                pipe.zrem(self._inbox_key(previous_attendant_id), phone)
+            self._state.replace_in(pipe, chat)
+            if attendant_id:
+                pipe.zadd(self._inbox_key(attendant_id), {phone: int(chat.get("last_interaction_at") or 0)})
+                pipe.expire(self._inbox_key(attendant_id), self.READY_TTL)
+
+    async def apply(self, phone: str, fields: dict) -> bool:
+        """
+        Aplica uma mudança parcial (ex: last_message, status) ao chat materializado.
+        False se o hash do chat não está no cache (nada foi gravado).
+        Com `last_interaction_at`, o telefone é reposicionado na inbox do atendente
+        (lido do hash se não vier nos campos).
+        """
+        attendant_id = None
+        if fields.get("last_interaction_at") is not None:
+            attendant_id = fields.get("attendant_id")
+            if attendant_id is None:
+                attendant_id = (await self._cache.hmget(self._state.key(phone), ["attendant_id"]))[0]
+        if not attendant_id:
+            return await self._state.apply(phone, fields)
+        return await self._state.apply(
+            phone, fields,
+            attendant_id=attendant_id,
+            inbox_key=self._inbox_key(attendant_id),
+            inbox_limit=self.MAX_ENTRIES,
+            inbox_ttl=self.READY_TTL,
+            ready_key=self._ready_key(attendant_id)
+        )
+
+    async def move(self, phone: str, old_attendant_id: Optional[str], new_attendant_id: str, fields: dict = None):
+        """Transfere o telefone de uma inbox para outra (transferência / roteamento)."""
+        score = await self._cache.zscore(self._inbox_key(old_attendant_id), phone) if old_attendant_id else None
+        if old_attendant_id and old_attendant_id != new_attendant_id:
+            await self._cache.zrem(self._inbox_key(old_attendant_id), phone)
+
+        await self.apply(phone, {**(fields or {}), "attendant_id": new_attendant_id})
+        if score is None:
+            states = await self._state.get_many([phone])
+            score = (states[0].get("last_interaction_at") if states else None) or 0
+        async with self._cache.pipeline() as pipe:
+            pipe.zadd(self._inbox_key(new_attendant_id), {phone: int(score)})
+            pipe.expire(self._inbox_key(new_attendant_id), self.READY_TTL)
+
+    # ------------------------
+    # Leitura
+    # ------------------------
+    async def page(self, attendant_id: str, cursor: Optional[str] = None, limit: int = 50) -> dict:
+        """
+        Retorna {"data": [...], "next_cursor": str | None}.
+        `cursor` é o `next_cursor` da página anterior ("<last_interaction_at>:<telefone>").
+        """
+        complete = await self._ensure_materialized(attendant_id)
+        inbox_key = self._inbox_key(attendant_id)
+
+        if cursor:
+            score_str, _, after_phone = cursor.partition(":")
+            after_score = int(float(score_str))
+            rank = await self._cache.zrevrank(inbox_key, after_phone)
+            current = await self._cache.zscore(inbox_key, after_phone) if rank is not None else None
+            if rank is not None and current is not None and int(current) == after_score:
+                entries = await self._cache.zrevrange(inbox_key, rank + 1, rank + limit)
+            else:
+                # O item do cursor mudou de posição (nova interação): segue pelo keyset
+                entries = await self._after(inbox_key, after_score, after_phone, limit)
+        else:
+            after_score, after_phone = None, None
+            entries = await self._cache.zrevrange(inbox_key, 0, limit - 1)
+
+        chats = await self._state.get_many([phone for phone, _ in entries])
+
+        if len(entries) < limit and not complete:
+            # Além do que foi materializado: keyset direto no banco
+            if entries:
+                after_phone, after_score = entries[-1][0], int(entries[-1][1])
+            older = await self._chat_repo.get_chats_by_attendant(
+                attendant_id, limit=limit - len(entries), before=after_score, before_phone=after_phone
+            )
+            chats += older
+            entries += [(c["phone_number"], c.get("last_interaction_at") or 0) for c in older]
+
+        next_cursor = self._cursor(*entries[-1]) if len(entries) == limit else None
+        return {"data": chats, "next_cursor": next_cursor}
+
+    async def _after(self, inbox_key: str, score: int, phone: str, limit: int) -> list:
+        """
+        Itens depois de (score, phone) na ordem da inbox (score desc, telefone desc):
+        `score < s OR (score == s AND telefone < p)`. Os empatados com telefone >= p
+        formam o início da faixa `score <= s` e são pulados.
+        """
+        entries, offset = [], 0
+        while len(entries) < limit:
+            batch = await self._cache.zrevrangebyscore(inbox_key, score, "-inf", limit, offset=offset)
+            offset += len(batch)
+            entries += [(m, s) for m, s in batch if int(s) < score or m < phone][:limit - len(entries)]
+            if len(batch) < limit:
+                break
+        return entries
+
+    async def _ensure_materialized(self, attendant_id: str) -> bool:
+        """
+        Monta a inbox a partir do banco na primeira leitura.
+        Retorna True se a inbox contém todos os chats do atendente.
+
+        Só o ZSET é montado aqui: os hashes dos chats são carregados por
+        `ChatStateStore.get_many` quando a página é lida (gravação versionada,
+        sem sobrescrever estado mais novo do cache). O ZSET expira com a marca
+        `inbox:ready` (o TTL é renovado a cada reposicionamento) e nunca antes
+        dela.
+        """
+        ready_key = self._ready_key(attendant_id)
+        ready = await self._cache.get_str(ready_key)
+        if ready:
+            return ready == "complete"
+
+        chats = await self._chat_repo.get_chats_by_attendant(attendant_id, limit=self.MAX_ENTRIES)
+        inbox_key = self._inbox_key(attendant_id)
+        status = "complete" if len(chats) < self.MAX_ENTRIES else "partial"
+        async with self._cache.pipeline() as pipe:
+            pipe.delete(inbox_key)
+            pipe.zadd(inbox_key, {c["phone_number"]: int(c.get("last_interaction_at") or 0) for c in chats})
+            pipe.expire(inbox_key, self.READY_TTL)
+            pipe.set(ready_key, status, ttl=self.READY_TTL)
+        return status == "complete"
@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional
+
+from utils.cache import Cache
+from utils.memory_backend import memory_script
+
+
+class AttendantLoad:
+    """
+    Chats abertos por atendente, para respeitar a capacidade no roteamento.
+
+    - `route:load`: HASH id do atendente -> chats abertos
+
+    A vaga é reservada atomicamente (`acquire`) antes da atribuição: dois nós
+    roteando ao mesmo tempo não passam da capacidade. Encerramento e
+    transferência devolvem a vaga (`release`). O contador é reconstruído a
+    partir do Mongo no startup, corrigindo qualquer desvio.
+    """
+    KEY = "route:load"
+
+    # Reserva uma vaga se o atendente está abaixo da capacidade (ARGV[2] vazio: sem limite)
+    _ACQUIRE = """
+    local open = tonumber(redis.call('hget', KEYS[1], ARGV[1]) or '0')
+    if ARGV[2] ~= '' and open >= tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('hincrby', KEYS[1], ARGV[1], 1)
+    return 1
+    """
+
+    # Devolve uma vaga sem deixar o contador negativo
+    _RELEASE = """
+    local open = redis.call('hincrby', KEYS[1], ARGV[1], -1)
+    if open <= 0 then
+        redis.call('hdel', KEYS[1], ARGV[1])
+    end
+    return 1
+    """
+
+    def __init__(self, cache: Cache):
+        self._cache = cache
+
+    async def acquire(self, attendant_id: str, capacity: Optional[int] = None) -> bool:
+        """Reserva uma vaga; False se o atendente já está na capacidade."""
+        args = [attendant_id, "" if capacity is None else int(capacity)]
+        return bool(await self._cache.eval(self._ACQUIRE, [self.KEY], args))
+
+    async def release(self, attendant_id: Optional[str]):
+        if attendant_id:
+            await self._cache.eval(self._RELEASE, [self.KEY], [attendant_id])
+
+    async def counts(self, attendant_ids: List[str]) -> List[int]:
+        if not attendant_ids:
+            return []
+        return [int(v or 0) for v in await self._cache.hmget(self.KEY, attendant_ids)]
+
+    async def rebuild(self, counts: Dict[str, int]):
+        """Substitui os contadores pelos do banco ({atendente: chats abertos})."""
+        async with self._cache.pipeline(transaction=True) as pipe:
+            pipe.delete(self.KEY)
+            pipe.hset(self.KEY, {attendant_id: n for attendant_id, n in counts.items() if n})
+
+
+# ------------------------
+# Scripts no backend em memória (mesma semântica dos scripts Lua acima)
+# ------------------------
+@memory_script(AttendantLoad._ACQUIRE)
+def _acquire_in_memory(store, keys, args):
+    open_chats = int(store.hget(keys[0], args[0]) or 0)
+    if args[1] != "" and open_chats >= int(args[1]):
+        return 0
+    store.hset(keys[0], args[0], open_chats + 1)
+    return 1
+
+
+@memory_script(AttendantLoad._RELEASE)
+def _release_in_memory(store, keys, args):
+    open_chats = int(store.hget(keys[0], args[0]) or 0) - 1
+    if open_chats <= 0:
+        store.hdel(keys[0], args[0])
+    else:
+        store.hset(keys[0], args[0], open_chats)
+    return 1
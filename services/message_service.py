@@ -1,9 +1,12 @@
 from repositories.message import MessageRepository
+from services.change_feed import ChangeFeed
 import logging
+from typing import Optional
 
 class MessageService:
-    def __init__(self, message_repository:MessageRepository):
+    def __init__(self, message_repository:MessageRepository, feed:ChangeFeed):
         self._message_repo = message_repository
+        self._feed = feed
 
     async def get_messages_by_phone(self, 
                                     phone: str, 
@@ -19,7 +22,13 @@ class MessageService:
         """Retorna histórico anterior ao timestamp fornecido."""
         return [m async for m in self._message_repo.get_messages_before(phone, last_timestamp, limit)]
 
-    async def stream_new_messages(self, phone: str):
-        """Repassa o gerador do repository para quem chamar."""
-        async for message in self._message_repo.watch_new_messages(phone):
-            yield message
\ No newline at end of file
+    async def current_stream_cursor(self) -> int:
+        return await self._feed.current_cursor()
+
+    async def stream_new_messages(self, phone: str, after: Optional[int] = None):
+        """
+        Mensagens novas do telefone como {"cursor", "data"}; `after`: último
+        cursor recebido pelo cliente (ver ChangeFeed.subscribe).
+        """
+        async for envelope in self._feed.subscribe(phone, after=after):
+            yield envelope
\ No newline at end of file
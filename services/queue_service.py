@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from utils.cache import Cache
+from utils.memory_backend import memory_script
+
+TZ_BR = ZoneInfo("America/Sao_Paulo")
+
+
+class SectorQueue:
+    """
+    Fila de espera para quando nenhum atendente está disponível. A fila é do
+    `queue_id` do botão do menu ou, sem ele, do setor.
+
+    - `queue:{fila}`: LIST de "<telefone>:<chegada>" (LPUSH na chegada, RPOP na promoção: O(1))
+    - `queue:entries`: HASH telefone -> "<chegada>:<fila>" (deduplicação e remoção)
+    - `queue:waits:{fila}`: LIST com as últimas esperas (segundos) para percentis
+    - `queue:served:{fila}`: ZSET com as promoções da última hora (vazão para o ETA)
+
+    Remover um telefone (chat encerrado, atendido por outro caminho) apaga apenas a
+    entrada do hash; o item órfão na LIST é descartado quando chega à frente. Como o
+    item carrega a chegada, um órfão de uma passagem anterior do mesmo telefone não
+    casa com a entrada atual e não o promove na posição antiga.
+    """
+    SECTORS_KEY = "queues"
+    ENTRIES_KEY = "queue:entries"
+    LEADER_KEY = "queues:dispatcher:leader"
+    WAIT_SAMPLES = 500
+    THROUGHPUT_WINDOW = 3600
+
+    # Enfileira se o telefone ainda não está na fila deste setor (trocar de setor re-enfileira)
+    _ENQUEUE = """
+    local entry = redis.call('hget', KEYS[2], ARGV[1])
+    if entry and string.match(entry, '^%d+:(.*)$') == ARGV[3] then
+        return 0
+    end
+    redis.call('hset', KEYS[2], ARGV[1], ARGV[2] .. ':' .. ARGV[3])
+    redis.call('lpush', KEYS[1], ARGV[1] .. ':' .. ARGV[2])
+    redis.call('sadd', KEYS[3], ARGV[3])
+    return 1
+    """
+
+    # Retira o mais antigo ainda válido; itens órfãos são descartados no caminho
+    _POP = """
+    while true do
+        local item = redis.call('rpop', KEYS[1])
+        if not item then
+            return nil
+        end
+        local phone, arrival = string.match(item, '^(.*):(%d+)$')
+        if phone and redis.call('hget', KEYS[2], phone) == arrival .. ':' .. ARGV[1] then
+            redis.call('hdel', KEYS[2], phone)
+            return {phone, arrival}
+        end
+    end
+    """
+
+    # Devolve à frente da fila (promoção que falhou), preservando a chegada original
+    _REQUEUE = """
+    redis.call('hset', KEYS[2], ARGV[1], ARGV[2] .. ':' .. ARGV[3])
+    redis.call('rpush', KEYS[1], ARGV[1] .. ':' .. ARGV[2])
+    return 1
+    """
+
+    def __init__(self, cache: Cache, interval: int = 15):
+        self._cache = cache
+        self._interval = interval
+        self._node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def _queue_key(sector: str) -> str:
+        return f"queue:{sector}"
+
+    @staticmethod
+    def _now() -> int:
+        return int(datetime.now(TZ_BR).timestamp())
+
+    # ------------------------
+    # Fila
+    # ------------------------
+    async def enqueue(self, phone: str, sector: str) -> int:
+        """Coloca o telefone na fila do setor e retorna a posição (1 = próximo a ser atendido)."""
+        keys = [self._queue_key(sector), self.ENTRIES_KEY, self.SECTORS_KEY]
+        await self._cache.eval(self._ENQUEUE, keys, [phone, self._now(), sector])
+        return await self.position(phone, sector) or 1
+
+    async def pop(self, sector: str) -> Optional[Tuple[str, int]]:
+        """Retira o próximo da fila: (telefone, chegada) ou None se a fila estiver vazia."""
+        item = await self._cache.eval(self._POP, [self._queue_key(sector), self.ENTRIES_KEY], [sector])
+        if not item:
+            return None
+        phone, arrival = item
+        return phone, int(arrival)
+
+    async def requeue(self, phone: str, sector: str, arrival: int):
+        await self._cache.eval(self._REQUEUE, [self._queue_key(sector), self.ENTRIES_KEY], [phone, arrival, sector])
+
+    async def remove(self, phone: str):
+        await self._cache.hdel(self.ENTRIES_KEY, phone)
+
+    async def length(self, sector: str) -> int:
+        """Tamanho da LIST (pode incluir itens órfãos ainda não descartados)."""
+        return await self._cache.llen(self._queue_key(sector))
+
+    async def position(self, phone: str, sector: str) -> Optional[int]:
+        entry = await self._cache.hget(self.ENTRIES_KEY, phone)
+        arrival, _, entry_sector = (entry or "").partition(":")
+        if entry_sector != sector:
+            return None
+        index = await self._cache.lpos(self._queue_key(sector), f"{phone}:{arrival}")
+        if index is None:
+            return None
+        return await self.length(sector) - index
+
+    async def sectors(self) -> List[str]:
+        return await self._cache.get_set(self.SECTORS_KEY)
+
+    # ------------------------
+    # Estatísticas
+    # ------------------------
+    async def record_served(self, sector: str, phone: str, arrival: int):
+        """Registra a espera de um chat promovido (percentis) e a promoção (vazão)."""
+        now = self._now()
+        served_key = f"queue:served:{sector}"
+        async with self._cache.pipeline() as pipe:
+            pipe.lpush(f"queue:waits:{sector}", str(max(0, now - arrival)), max_len=self.WAIT_SAMPLES)
+            pipe.zadd(served_key, {f"{phone}:{now}": now})
+            pipe.zremrangebyscore(served_key, "-inf", now - self.THROUGHPUT_WINDOW)
+
+    async def estimated_wait(self, sector: str, position: int) -> Optional[int]:
+        """
+        Espera estimada (segundos) para quem está na `position`: pela vazão da última
+        hora; sem promoções recentes, pela mediana das últimas esperas.
+        """
+        served = await self._served_last_window(sector)
+        if served:
+            return int(position * self.THROUGHPUT_WINDOW / served)
+        waits = await self._waits(sector)
+        return self._percentile(waits, 50) if waits else None
+
+    async def stats(self, sector: str) -> Dict:
+        waits = await self._waits(sector)
+        length = await self.length(sector)
+        return {
+            "sector": sector,
+            "length": length,
+            "served_last_hour": await self._served_last_window(sector),
+            "wait_seconds": {
+                "p50": self._percentile(waits, 50),
+                "p90": self._percentile(waits, 90),
+                "p99": self._percentile(waits, 99),
+                "samples": len(waits),
+            },
+            "estimated_wait_seconds": await self.estimated_wait(sector, length) if length else 0,
+        }
+
+    async def all_stats(self) -> List[Dict]:
+        return [await self.stats(sector) for sector in sorted(await self.sectors())]
+
+    async def _waits(self, sector: str) -> List[int]:
+        return [int(w) for w in await self._cache.lrange(f"queue:waits:{sector}", 0, -1)]
+
+    async def _served_last_window(self, sector: str) -> int:
+        now = self._now()
+        return await self._cache.zcount(f"queue:served:{sector}", now - self.THROUGHPUT_WINDOW, now)
+
+    @staticmethod
+    def _percentile(values: List[int], pct: int) -> Optional[int]:
+        """Percentil por posição (nearest-rank)."""
+        if not values:
+            return None
+        ordered = sorted(values)
+        index = max(0, -(-pct * len(ordered) // 100) - 1)
+        return ordered[index]
+
+    # ------------------------
+    # Worker
+    # ------------------------
+    async def run_forever(self, stop_event: asyncio.Event, dispatch: Callable[[], Awaitable[int]]):
+        """
+        Promove chats em espera periodicamente (ex: atendente entrou no turno).
+        `dispatch` é quem atribui os atendentes; apenas o nó líder executa.
+        """
+        lock_ttl = self._interval * 3
+        while not stop_event.is_set():
+            try:
+                if await self._cache.acquire_lock(self.LEADER_KEY, self._node_id, lock_ttl):
+                    await dispatch()
+            except Exception as e:
+                logging.error(f"Erro no worker das filas de espera: {e}")
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+# ------------------------
+# Scripts no backend em memória (mesma semântica dos scripts Lua acima)
+# ------------------------
+@memory_script(SectorQueue._ENQUEUE)
+def _enqueue_in_memory(store, keys, args):
+    entry = store.hget(keys[1], args[0])
+    if entry and entry.partition(":")[2] == args[2]:
+        return 0
+    store.hset(keys[1], args[0], f"{args[1]}:{args[2]}")
+    store.lpush(keys[0], f"{args[0]}:{args[1]}")
+    store.sadd(keys[2], args[2])
+    return 1
+
+
+@memory_script(SectorQueue._POP)
+def _pop_in_memory(store, keys, args):
+    while True:
+        item = store.rpop(keys[0])
+        if item is None:
+            return None
+        phone, _, arrival = item.rpartition(":")
+        if phone and arrival.isdigit() and store.hget(keys[1], phone) == f"{arrival}:{args[0]}":
+            store.hdel(keys[1], phone)
+            return [phone, arrival]
+
+
+@memory_script(SectorQueue._REQUEUE)
+def _requeue_in_memory(store, keys, args):
+    store.hset(keys[1], args[0], f"{args[1]}:{args[2]}")
+    store.rpush(keys[0], f"{args[0]}:{args[1]}")
+    return 1
@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from utils.cache import Cache
+
+TZ_BR = ZoneInfo("America/Sao_Paulo")
+
+WINDOW_SECONDS = 24 * 3600
+# Por quanto tempo o telefone fica no índice depois da última interação
+RETENTION_SECONDS = 30 * 24 * 3600
+
+
+class ConversationWindowTracker:
+    """
+    Janela de 24h do WhatsApp mantida direto no Redis.
+
+    Um único ZSET guarda, por telefone, o timestamp da última interação do cliente.
+    "A janela está aberta?" vira um ZSCORE e "quais janelas fecham na próxima hora?"
+    vira um ZRANGEBYSCORE, sem carregar o documento do chat.
+
+    Os telefones ficam no índice por RETENTION_SECONDS, bem além das 24h: uma
+    janela fechada também é respondida pelo ZSCORE (score < agora - 24h), sem
+    cair no fallback do chamador a cada consulta.
+    """
+    INDEX_KEY = "chats:window"
+
+    def __init__(self, cache: Cache):
+        self._cache = cache
+
+    async def touch(self, phone: str, last_client_interaction_at: int):
+        """
+        Registra a última interação do cliente (chamado no caminho de ingestão).
+        No mesmo round trip remove as entradas além de RETENTION_SECONDS: o ZSET
+        fica limitado em qualquer nó, sem depender do dashboard.
+        """
+        now = int(datetime.now(TZ_BR).timestamp())
+        async with self._cache.pipeline() as pipe:
+            pipe.zadd(self.INDEX_KEY, {phone: int(last_client_interaction_at)})
+            pipe.zremrangebyscore(self.INDEX_KEY, "-inf", f"({now - RETENTION_SECONDS}")
+
+    async def last_interaction(self, phone: str) -> Optional[int]:
+        score = await self._cache.zscore(self.INDEX_KEY, phone)
+        return int(score) if score is not None else None
+
+    async def is_open(self, phone: str) -> Optional[bool]:
+        """
+        True/False se o telefone é conhecido pelo índice.
+        None quando não há registro (o chamador decide o fallback).
+        """
+        last = await self.last_interaction(phone)
+        if last is None:
+            return None
+        return last >= int(datetime.now(TZ_BR).timestamp()) - WINDOW_SECONDS
+
+    async def closing_within(self, seconds: int = 3600, limit: int = 500) -> List[Dict]:
+        """Lista as janelas abertas que fecham nos próximos `seconds` segundos."""
+        now = int(datetime.now(TZ_BR).timestamp())
+        entries = await self._cache.zrangebyscore(
+            self.INDEX_KEY,
+            now - WINDOW_SECONDS,
+            now - WINDOW_SECONDS + seconds,
+            limit=limit
+        )
+        return [
+            {
+                "phone_number": phone,
+                "last_client_interaction_at": int(score),
+                "closes_at": int(score) + WINDOW_SECONDS,
+            }
+            for phone, score in entries
+        ]
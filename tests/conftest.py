@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache import Cache  # noqa: E402
+
+# Servidor Redis real para rodar os mesmos testes contra os dois backends
+# (ex: REDIS_TEST_URL=redis://localhost:6379/15 — o banco é limpo a cada teste)
+REDIS_TEST_URL = os.environ.get("REDIS_TEST_URL")
+
+
+@pytest.fixture(params=["memory", "redis"])
+def on_backend(request):
+    """
+    Executa `scenario(cache)` em um event loop novo, com um Cache sobre o
+    backend do parâmetro (store em memória próprio ou Redis limpo).
+    """
+    if request.param == "memory":
+        url = f"memory://test-{uuid.uuid4().hex}"
+    elif REDIS_TEST_URL:
+        url = REDIS_TEST_URL
+    else:
+        pytest.skip("REDIS_TEST_URL não definido")
+
+    def run(scenario):
+        async def main():
+            cache = Cache(client=Cache.create_client(url))
+            try:
+                if not await cache.ensure():
+                    pytest.skip(f"Redis indisponível em {url}")
+                await cache._client.flushdb()
+                return await scenario(cache)
+            finally:
+                await cache.close()
+        return asyncio.run(main())
+
+    run.backend = request.param
+    return run
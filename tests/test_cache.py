@@ -0,0 +1,121 @@
+import asyncio
+
+from utils.memory_backend import MemoryRedis, MemoryStore
+from utils.cache import Cache
+
+
+# ------------------------
+# CAS (versão)
+# ------------------------
+def test_set_if_version_rejects_write_after_invalidate(on_backend):
+    async def scenario(cache):
+        _, version = await cache.get_versioned("config:cas")
+        await cache.invalidate("config:cas")
+        stale = await cache.set_if_version("config:cas", "old", version)
+
+        _, version = await cache.get_versioned("config:cas")
+        fresh = await cache.set_if_version("config:cas", "new", version)
+        return stale, fresh, await cache.get_str("config:cas")
+
+    assert on_backend(scenario) == (False, True, "new")
+
+
+def test_get_or_load_loads_once_and_reloads_after_invalidate(on_backend):
+    async def scenario(cache):
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return {"n": len(calls)}
+
+        first = await cache.get_or_load("contact:load", loader)
+        cached = await cache.get_or_load("contact:load", loader)
+        await cache.invalidate("contact:load")
+        reloaded = await cache.get_or_load("contact:load", loader)
+        return first, cached, reloaded, len(calls)
+
+    assert on_backend(scenario) == ({"n": 1}, {"n": 1}, {"n": 2}, 2)
+
+
+# ------------------------
+# Lock
+# ------------------------
+def test_lock_is_exclusive_renewable_and_expires(on_backend):
+    async def scenario(cache):
+        first = await cache.acquire_lock("test:leader", "a", 1)
+        other = await cache.acquire_lock("test:leader", "b", 1)
+        renewed = await cache.acquire_lock("test:leader", "a", 1)
+        await asyncio.sleep(1.2)
+        after_expiry = await cache.acquire_lock("test:leader", "b", 1)
+        return first, other, renewed, after_expiry
+
+    assert on_backend(scenario) == (True, False, True, True)
+
+
+# ------------------------
+# ZSET: remoção condicional
+# ------------------------
+def test_zrem_unchanged_keeps_rescheduled_members(on_backend):
+    async def scenario(cache):
+        await cache.zadd("test:due", {"a": 10, "b": 20, "c": 30})
+        due = await cache.zrange_due("test:due", 25)
+        # `b` foi reagendado depois da leitura
+        await cache.zadd("test:due", {"b": 50})
+        removed = await cache.zrem_unchanged("test:due", due)
+        return due, removed, await cache.zrangebyscore("test:due", "-inf", "+inf")
+
+    due, removed, remaining = on_backend(scenario)
+    assert [member for member, _ in due] == ["a", "b"]
+    assert removed == 1
+    assert remaining == [("c", 30.0), ("b", 50.0)]
+
+
+# ------------------------
+# TTL
+# ------------------------
+def test_ttl_expiry(on_backend):
+    async def scenario(cache):
+        await cache.set("test:ttl", "1", ttl=1)
+        await cache.hset("chat:state:ttl", {"status": "active"})
+        await cache._client.expire("chat:state:ttl", 1)
+        before = await cache.get_str("test:ttl"), await cache.exists("chat:state:ttl")
+        await asyncio.sleep(1.2)
+        after = await cache.get_str("test:ttl"), await cache.exists("chat:state:ttl")
+        return before, after
+
+    assert on_backend(scenario) == (("1", True), (None, False))
+
+
+def test_ttl_policy_applies_to_namespace(on_backend):
+    async def scenario(cache):
+        await cache.hset("chat:state:5511", {"status": "active"})
+        await cache.set("test:no_policy", "1")
+        return await cache._client.ttl("chat:state:5511"), await cache._client.ttl("test:no_policy")
+
+    policy_ttl, no_ttl = on_backend(scenario)
+    assert 0 < policy_ttl <= Cache.TTL_POLICIES["chat:state"]
+    assert no_ttl == -1
+
+
+# ------------------------
+# LRU (só no backend em memória: no Redis depende de maxmemory/maxmemory-policy do servidor)
+# ------------------------
+def test_memory_backend_evicts_least_recently_used():
+    async def scenario():
+        store = MemoryStore(max_memory=2000)
+        cache = Cache(client=MemoryRedis(store))
+        for i in range(5):
+            await cache.set(f"test:lru:{i}", "x" * 200)
+        # Acesso recente: `0` deixa de ser o próximo a sair
+        await cache.get_str("test:lru:0")
+        for i in range(5, 10):
+            await cache.set(f"test:lru:{i}", "x" * 200)
+        values = [await cache.get_str(f"test:lru:{i}") for i in range(10)]
+        return store, values
+
+    store, values = asyncio.run(scenario())
+    assert store.used_memory <= store.max_memory
+    assert store.evicted_keys > 0
+    assert values[0] is not None      # lido recentemente
+    assert values[1] is None          # menos recente
+    assert values[9] is not None      # recém-escrito
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("bson")  # ChatStateBuffer importa o repositório (pymongo/motor)
+
+from services.chat_state_buffer import ChatStateBuffer  # noqa: E402
+
+
+class SlowRepo:
+    """update_many que só termina quando o teste libera."""
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.writes = []
+
+    async def update_many(self, updates):
+        await self.release.wait()
+        self.writes.append(("batch", dict(updates)))
+        return len(updates)
+
+
+def test_take_waits_for_inflight_flush_of_the_same_phone():
+    async def scenario():
+        repo = SlowRepo()
+        buffer = ChatStateBuffer(chat_repo=repo)
+        buffer.add("5511", {"last_interaction_at": 100})
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+
+        async def direct_write():
+            taken = await buffer.take("5511")
+            repo.writes.append(("direct", taken))
+
+        writer = asyncio.create_task(direct_write())
+        await asyncio.sleep(0.01)
+        waiting = not writer.done()
+        repo.release.set()
+        await asyncio.gather(flush, writer)
+        return waiting, repo.writes
+
+    waiting, writes = asyncio.run(scenario())
+    assert waiting
+    assert writes == [("batch", {"5511": {"last_interaction_at": 100}}), ("direct", {})]
@@ -0,0 +1,186 @@
+"""
+Scripts Lua e suas implementações em Python (`memory_script`): as mesmas
+chamadas de serviço rodam contra os dois backends e devem dar o mesmo resultado.
+"""
+import pytest
+
+from services.change_feed import ChangeFeed
+from services.load_service import AttendantLoad
+from services.queue_service import SectorQueue
+from utils.cache import Cache
+
+pytest.importorskip("bson")  # ChatStateStore importa o repositório (pymongo/motor)
+
+from services.chat_state_store import ChatStateStore  # noqa: E402
+from services.inbox_service import AttendantInbox  # noqa: E402
+
+
+# ------------------------
+# ChatStateStore._APPLY
+# ------------------------
+def test_apply_does_not_create_missing_hash(on_backend):
+    async def scenario(cache):
+        state = ChatStateStore(cache, chat_repo=None)
+        applied = await state.apply("5511", {"status": "active"})
+        return applied, await cache.exists(state.key("5511"))
+
+    assert on_backend(scenario) == (False, False)
+
+
+def test_apply_updates_fields_bumps_version_and_repositions_inbox(on_backend):
+    async def scenario(cache):
+        state = ChatStateStore(cache, chat_repo=None)
+        inbox = AttendantInbox(cache, chat_repo=None, state=state)
+        await state.replace({"phone_number": "5511", "attendant_id": "a1", "last_interaction_at": 100})
+        version = await cache.get_str(cache.version_key(state.key("5511")))
+
+        applied = await inbox.apply("5511", {"status": "active", "last_interaction_at": 200})
+        new_version = await cache.get_str(cache.version_key(state.key("5511")))
+        fields = await cache.hmget(state.key("5511"), ["status", "last_interaction_at"])
+        return applied, version != new_version, fields, await cache.zscore("inbox:a1", "5511")
+
+    assert on_backend(scenario) == (True, True, ["active", "200"], 200.0)
+
+
+def test_apply_keeps_version_key_expiring(on_backend):
+    async def scenario(cache):
+        state = ChatStateStore(cache, chat_repo=None)
+        await state.replace({"phone_number": "5511", "status": "active"})
+        # A versão expirou (ou nunca existiu): o INCR a recria e precisa recolocar o TTL
+        await cache.delete(cache.version_key(state.key("5511")))
+        await state.apply("5511", {"status": "closed"})
+        return await cache._client.ttl(cache.version_key(state.key("5511")))
+
+    assert 0 < on_backend(scenario) <= Cache.VERSION_TTL
+
+
+def test_apply_trims_inbox_to_max_entries_and_marks_it_partial(on_backend):
+    async def scenario(cache):
+        state = ChatStateStore(cache, chat_repo=None)
+        inbox = AttendantInbox(cache, chat_repo=None, state=state)
+        inbox.MAX_ENTRIES = 2
+        await cache.set("inbox:ready:a1", "complete", ttl=60)
+        for phone, score in (("1", 100), ("2", 200), ("3", 300)):
+            await state.replace({"phone_number": phone, "attendant_id": "a1", "last_interaction_at": 0})
+            await inbox.apply(phone, {"last_interaction_at": score})
+        return (
+            await cache.zrevrange("inbox:a1", 0, -1),
+            await cache.get_str("inbox:ready:a1"),
+            0 < await cache._client.ttl("inbox:a1") <= AttendantInbox.READY_TTL,
+            0 < await cache._client.ttl("inbox:ready:a1") <= 60,
+        )
+
+    assert on_backend(scenario) == ([("3", 300.0), ("2", 200.0)], "partial", True, True)
+
+
+def test_apply_skips_inbox_of_another_attendant(on_backend):
+    async def scenario(cache):
+        state = ChatStateStore(cache, chat_repo=None)
+        await state.replace({"phone_number": "5511", "attendant_id": "a2", "last_interaction_at": 100})
+        # Inbox resolvida antes de uma transferência para `a2`
+        await state.apply("5511", {"last_interaction_at": 300}, attendant_id="a1", inbox_key="inbox:a1")
+        return await cache.zscore("inbox:a1", "5511"), await cache.exists(ChatStateStore.NO_INBOX_KEY)
+
+    assert on_backend(scenario) == (None, False)
+
+
+# ------------------------
+# SectorQueue._ENQUEUE / _POP / _REQUEUE
+# ------------------------
+def test_queue_is_fifo_and_deduplicates(on_backend):
+    async def scenario(cache):
+        queue = SectorQueue(cache)
+        positions = [await queue.enqueue(phone, "vendas") for phone in ("1", "2", "3")]
+        again = await queue.enqueue("1", "vendas")
+        popped = [(await queue.pop("vendas"))[0] for _ in range(3)]
+        return positions, again, popped, await queue.pop("vendas")
+
+    assert on_backend(scenario) == ([1, 2, 3], 1, ["1", "2", "3"], None)
+
+
+def test_queue_pop_discards_removed_and_moved_entries(on_backend):
+    async def scenario(cache):
+        queue = SectorQueue(cache)
+        for phone in ("1", "2", "3"):
+            await queue.enqueue(phone, "vendas")
+        await queue.remove("1")
+        # Trocar de setor re-enfileira: o item antigo vira órfão
+        await queue.enqueue("2", "suporte")
+        return (await queue.pop("vendas"))[0], await queue.pop("vendas"), (await queue.pop("suporte"))[0]
+
+    assert on_backend(scenario) == ("3", None, "2")
+
+
+def test_queue_reenqueue_after_remove_does_not_jump_the_line(on_backend):
+    async def scenario(cache):
+        queue = SectorQueue(cache)
+        queue._now = lambda: 100
+        await queue.enqueue("1", "vendas")
+        await queue.enqueue("2", "vendas")
+        await queue.remove("1")
+        # O mesmo telefone volta depois: o item antigo (chegada 100) é órfão
+        queue._now = lambda: 200
+        await queue.enqueue("1", "vendas")
+        return [await queue.pop("vendas") for _ in range(3)]
+
+    assert on_backend(scenario) == [("2", 100), ("1", 200), None]
+
+
+def test_queue_requeue_goes_to_the_front_with_original_arrival(on_backend):
+    async def scenario(cache):
+        queue = SectorQueue(cache)
+        await queue.enqueue("1", "vendas")
+        await queue.enqueue("2", "vendas")
+        phone, arrival = await queue.pop("vendas")
+        await queue.requeue(phone, "vendas", arrival)
+        return (phone, arrival), await queue.position("1", "vendas"), await queue.pop("vendas")
+
+    first, position, again = on_backend(scenario)
+    assert position == 1
+    assert again == first
+
+
+# ------------------------
+# AttendantLoad._ACQUIRE / _RELEASE
+# ------------------------
+def test_load_respects_capacity_and_never_goes_negative(on_backend):
+    async def scenario(cache):
+        load = AttendantLoad(cache)
+        acquired = [await load.acquire("a1", 2) for _ in range(3)]
+        unlimited = await load.acquire("a2")
+        await load.release("a1")
+        after_release = await load.acquire("a1", 2)
+        for _ in range(5):
+            await load.release("a2")
+        return acquired, unlimited, after_release, await load.counts(["a1", "a2"])
+
+    assert on_backend(scenario) == ([True, True, False], True, True, [2, 0])
+
+
+# ------------------------
+# ChangeFeed._PUBLISH
+# ------------------------
+def test_feed_publish_numbers_events_and_replays_by_key(on_backend):
+    async def scenario(cache):
+        feed = ChangeFeed(
+            "test",
+            cache=cache,
+            watch=None,
+            key_of=lambda event: event.get("attendant_id"),
+            channel_prefix="ws:test:",
+            broadcast_if=lambda event: event.get("action") == "delete"
+        )
+        for event in ({"attendant_id": "a1"}, {"attendant_id": "a2"}, {}, {"action": "delete"}):
+            await feed._publish({"token": 1}, event)
+        replayed = await feed._replay("a1", 0)
+        return (
+            await feed.current_cursor(),
+            [(e["cursor"], e["data"]) for e in replayed],
+            len(await feed._replay(None, 0)),
+            await cache.get_json("feed:test:resume"),
+        )
+
+    assert on_backend(scenario) == (
+        4, [(1, {"attendant_id": "a1"}), (4, {"action": "delete"})], 4, {"token": 1}
+    )
+
@@ -1,16 +1,264 @@
-import json
 import asyncio
-from typing import Any, Dict, List
+import logging
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from utils.client_cache import MISSING, ClientSideCache
+from utils.codecs import default_codec
+from utils.memory_backend import MemoryRedis, memory_script
+from utils.metrics import cache_metrics
+
+
+class CommandStats:
+    """
+    Contadores de comandos enviados ao Redis pelo processo: quantos de cada tipo
+    e quantos round trips (um pipeline conta como um round trip).
+    """
+    def __init__(self) -> None:
+        self.commands: Counter = Counter()
+        self.round_trips = 0
+
+    def record(self, names: Iterable[str]) -> None:
+        self.round_trips += 1
+        self.commands.update(str(name).upper() for name in names)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"round_trips": self.round_trips, "commands": dict(self.commands)}
+
+    def reset(self) -> None:
+        self.commands.clear()
+        self.round_trips = 0
+
+
+command_stats = CommandStats()
+
+
+class _CountingPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        if not self.command_stack:
+            return await super().execute(raise_on_error)
+        command_stats.record(args[0] for args, _ in self.command_stack)
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            cache_metrics.observe_command("PIPELINE", time.perf_counter() - start)
+
+
+class _CountingRedis(Redis):
+    """
+    Cliente Redis que registra cada comando em `command_stats` e a latência
+    em `cache_metrics`.
+    """
+
+    async def execute_command(self, *args, **options):
+        name = str(args[0]).upper()
+        command_stats.record((name,))
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            cache_metrics.observe_command(name, time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        return _CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class SingleFlight:
+    """
+    Coalesce chamadas concorrentes: para a mesma chave, apenas um loader
+    roda por vez no processo e todos os chamadores recebem o mesmo resultado.
+    """
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def spawn(self, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Retorna a task em andamento para a chave ou inicia uma nova."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return task
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # shield: o cancelamento de um chamador não cancela o carregamento dos outros
+        return await asyncio.shield(self.spawn(key, loader))
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            logging.debug(f"Loader de cache falhou para {key}: {task.exception()}")
+
+
+class CachePipeline:
+    """
+    Escritas em lote: os comandos são enfileirados e enviados em um único round
+    trip ao sair do bloco (`async with cache.pipeline() as p: p.set(...)`).
+    Aplica as mesmas regras do Cache (TTL por namespace, normalização de hashes).
+    Com `transaction=True` o lote é executado em MULTI/EXEC.
+    """
+    def __init__(self, cache: "Cache", transaction: bool = False) -> None:
+        self._cache = cache
+        self._pipe = cache._client.pipeline(transaction=transaction)
+        self.results: List[Any] = []
+
+    async def __aenter__(self) -> "CachePipeline":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.results = await self.execute()
+        else:
+            await self._pipe.reset()
+
+    async def execute(self) -> List[Any]:
+        if not len(self._pipe):
+            return []
+        return await self._pipe.execute()
+
+    def set(self, key: str, value: str, ttl: int | None = None, tags: Iterable[str] = ()) -> "CachePipeline":
+        self._cache._forget(key)
+        self._pipe.set(key, value, ex=ttl or self._cache.ttl_for(key))
+        return self.tag(key, *tags)
+
+    def set_json(self, key: str, obj: Any, ttl: int | None = None, codec=None, tags: Iterable[str] = ()) -> "CachePipeline":
+        return self.set(key, self._cache.encode(obj, codec), ttl=ttl, tags=tags)
+
+    def tag(self, key: str, *tags: str) -> "CachePipeline":
+        """Registra a chave nos sets `tag:{tag}` (ver `Cache.invalidate_tag`)."""
+        for tag in tags:
+            tag_key = self._cache.tag_key(tag)
+            self._pipe.sadd(tag_key, key)
+            self._pipe.expire(tag_key, self._cache.TAG_TTL)
+        return self
+
+    def delete(self, *keys: str) -> "CachePipeline":
+        if keys:
+            self._cache._forget(*keys)
+            self._pipe.delete(*keys)
+        return self
+
+    def invalidate(self, key: str) -> "CachePipeline":
+        self._cache._forget(key)
+        version_key = self._cache.version_key(key)
+        self._pipe.delete(key, self._cache._negative_key(key))
+        self._pipe.incr(version_key)
+        self._pipe.expire(version_key, self._cache.VERSION_TTL)
+        return self
+
+    def expire(self, key: str, ttl: int) -> "CachePipeline":
+        self._pipe.expire(key, ttl)
+        return self
+
+    def hset(self, key: str, mapping: Dict[str, Any], tags: Iterable[str] = ()) -> "CachePipeline":
+        mapping = self._cache.normalize_hash(mapping)
+        if mapping:
+            self._cache._forget(key)
+            self._pipe.hset(key, mapping=mapping)
+            ttl = self._cache.ttl_for(key)
+            if ttl:
+                self._pipe.expire(key, ttl)
+            self.tag(key, *tags)
+        return self
+
+    def hdel(self, key: str, *fields: str) -> "CachePipeline":
+        if fields:
+            self._cache._forget(key)
+            self._pipe.hdel(key, *fields)
+        return self
+
+    def sadd(self, key: str, *values: str) -> "CachePipeline":
+        if values:
+            self._cache._forget(key)
+            self._pipe.sadd(key, *values)
+        return self
+
+    def srem(self, key: str, *values: str) -> "CachePipeline":
+        if values:
+            self._cache._forget(key)
+            self._pipe.srem(key, *values)
+        return self
+
+    def zadd(self, key: str, mapping: Dict[str, float]) -> "CachePipeline":
+        if mapping:
+            self._pipe.zadd(key, mapping)
+        return self
+
+    def zrem(self, key: str, *members: str) -> "CachePipeline":
+        if members:
+            self._pipe.zrem(key, *members)
+        return self
+
+    def zremrangebyscore(self, key: str, min_score: float, max_score: float) -> "CachePipeline":
+        self._pipe.zremrangebyscore(key, min_score, max_score)
+        return self
+
+    def publish(self, channel: str, message: str) -> "CachePipeline":
+        self._pipe.publish(channel, message)
+        return self
+
+    def lpush(self, key: str, value: str, max_len: int | None = None) -> "CachePipeline":
+        """LPUSH; com `max_len`, mantém apenas os `max_len` itens mais recentes."""
+        self._pipe.lpush(key, value)
+        if max_len:
+            self._pipe.ltrim(key, 0, max_len - 1)
+        return self
 
 
 class Cache:
-    def __init__(self, redis_url) -> None:
-        self._client = Redis.from_url(
+    # Quantos valores antigos manter em memória para stale-while-revalidate
+    STALE_ENTRIES = 1024
+
+    # TTL (segundos) por namespace. O namespace é a chave sem o último segmento
+    # ("chat:state:5511..." -> "chat:state"). Namespaces fora da tabela não expiram.
+    TTL_POLICIES: Dict[str, int] = {
+        "config": 3600,
+        "chat:state": 7 * 24 * 3600,
+        "contact": 24 * 3600,
+        "attendant": 24 * 3600,
+        "attendant:login": 24 * 3600,
+    }
+    # Misses (ex: contato desconhecido) ficam marcados por pouco tempo
+    NEGATIVE_TTL = 60
+    VERSION_TTL = 24 * 3600
+    # Sets de tags vivem pelo menos tanto quanto o maior TTL das chaves que indexam
+    TAG_TTL = 7 * 24 * 3600
+    # Prefixos read-mostly servidos pelo client-side cache (quando habilitado)
+    CLIENT_CACHE_PREFIXES = ("config:", "attendant:", "sector:")
+
+    # Compartilhados entre instâncias: o coalescing precisa valer para o processo todo
+    _flights = SingleFlight()
+    _stale: "OrderedDict[str, Any]" = OrderedDict()
+
+    def __init__(self, redis_url=None, codec=None, client: Redis | MemoryRedis | None = None,
+                 local_cache: ClientSideCache | None = None) -> None:
+        # `client`: pool compartilhado (ver core.container); sem ele, abre um próprio
+        self._client = client or self.create_client(redis_url)
+        # Codec usado para objetos (get_json/set_json, get_or_load e campos aninhados de hashes)
+        self._codec = codec or default_codec()
+        # Cópia local das chaves com prefixos rastreados (CLIENT TRACKING); opcional
+        self._local = local_cache
+
+    @staticmethod
+    def create_client(redis_url: str) -> Redis | MemoryRedis:
+        """
+        Cliente (e pool de conexões) instrumentado por `command_stats`.
+        `memory://` usa o backend em processo (nó único, testes), sem servidor Redis.
+        """
+        if MemoryRedis.handles(redis_url):
+            return MemoryRedis.from_url(redis_url)
+        return _CountingRedis.from_url(
             redis_url,
             decode_responses=True  # já retorna str
         )
-        self._lock = asyncio.Lock()
+
+    async def close(self):
+        await self._client.aclose()
 
     async def ensure(self) -> bool:
         try:
@@ -19,55 +267,658 @@ class Cache:
         except Exception:
             return False
 
+    # --------------------
+    # Namespaces / TTL
+    # --------------------
+    @staticmethod
+    def namespace_of(key: str) -> str:
+        return key.rsplit(":", 1)[0] if ":" in key else key
+
+    def ttl_for(self, key: str) -> int | None:
+        return self.TTL_POLICIES.get(self.namespace_of(key))
+
+    def _track(self, key: str, value: Any) -> Any:
+        """Registra hit/miss da leitura no namespace da chave e devolve o valor."""
+        cache_metrics.lookup(self.namespace_of(key), value is not None)
+        return value
+
+    # --------------------
+    # CLIENT-SIDE CACHE
+    # --------------------
+    def _local_tracks(self, key: str) -> bool:
+        return self._local is not None and self._local.tracks(key)
+
+    async def _read_through_local(self, key: str, kind: str, read: Callable[[], Awaitable[Any]]) -> Any:
+        """Serve `key` da cópia local; no miss lê do Redis e guarda a resposta."""
+        value = self._local.get(key, kind)
+        if value is not MISSING:
+            cache_metrics.local_hit(self.namespace_of(key))
+            return value
+        token = self._local.begin(key)
+        value = await read()
+        self._local.put(key, token, kind, value)
+        return value
+
+    def _forget(self, *keys: str) -> None:
+        """
+        Escritas deste processo descartam a cópia local na hora (a invalidação
+        do Redis chega de forma assíncrona).
+        """
+        if self._local is not None:
+            self._local.forget(*keys)
+
+    @staticmethod
+    def _negative_key(key: str) -> str:
+        return f"neg:{key}"
+
+    @staticmethod
+    def version_key(key: str) -> str:
+        return f"ver:{key}"
+
+    @staticmethod
+    def tag_key(tag: str) -> str:
+        return f"tag:{tag}"
+
+    # --------------------
+    # PIPELINE
+    # --------------------
+    def pipeline(self, transaction: bool = False) -> CachePipeline:
+        """Lote de escritas em um round trip: `async with cache.pipeline() as p:`."""
+        return CachePipeline(self, transaction=transaction)
+
     # --------------------
     # STRING
     # --------------------
     async def get(self, key: str):
+        """
+        Leitura genérica (TYPE + leitura: dois round trips). Quando o tipo da
+        chave é conhecido, use `get_str`, `get_hash`, `get_set` ou `get_json`.
+        """
         key_type = await self._client.type(key)  # retorna 'string', 'hash', 'set', etc.
         match key_type:
             case "string":
-                return await self._client.get(key)
+                return self._track(key, await self._client.get(key))
             case "hash":
-                return await self._client.hgetall(key)
+                return self._track(key, await self._client.hgetall(key))
             case "set":
-                return await list(self._client.smembers(key))
+                return self._track(key, list(await self._client.smembers(key)))
             case "none":
-                return None
+                return self._track(key, None)
 
-    async def set(self, key: str, value: str):
-        async with self._lock:
-            await self._client.set(key, value)
+    async def get_str(self, key: str) -> str | None:
+        if self._local_tracks(key):
+            return self._track(key, await self._read_through_local(key, "str", lambda: self._client.get(key)))
+        return self._track(key, await self._client.get(key))
+
+    async def get_str_many(self, keys: List[str]) -> List[str | None]:
+        """MGET: várias strings em um único comando."""
+        if not keys:
+            return []
+        return [self._track(key, raw) for key, raw in zip(keys, await self._client.mget(keys))]
+
+    async def set(self, key: str, value: str, ttl: int | None = None, tags: Iterable[str] = ()):
+        if tags:
+            async with self.pipeline() as pipe:
+                pipe.set(key, value, ttl=ttl, tags=tags)
+            return
+        self._forget(key)
+        await self._client.set(key, value, ex=ttl or self.ttl_for(key))
 
     async def delete(self, key: str):
-        async with self._lock:
-            await self._client.delete(key)
+        self._forget(key)
+        await self._client.delete(key)
+
+    # --------------------
+    # OBJETOS (codec)
+    # --------------------
+    def encode(self, obj: Any, codec=None) -> str:
+        return (codec or self._codec).encode(obj)
+
+    def decode(self, raw: str | None, codec=None) -> Any:
+        return (codec or self._codec).decode(raw) if raw is not None else None
+
+    async def get_json(self, key: str, codec=None) -> Any:
+        return self.decode(await self.get_str(key), codec)
+
+    async def get_json_many(self, keys: List[str], codec=None) -> List[Any]:
+        return [self.decode(raw, codec) for raw in await self.get_str_many(keys)]
+
+    async def set_json(self, key: str, obj: Any, ttl: int | None = None, codec=None, tags: Iterable[str] = ()):
+        await self.set(key, self.encode(obj, codec), ttl=ttl, tags=tags)
+
+    # --------------------
+    # VERSIONAMENTO / NEGATIVE CACHE
+    # --------------------
+    async def invalidate(self, key: str):
+        """
+        Remove a entrada (e o marcador negativo) e incrementa a versão da chave:
+        escritores que leram a versão anterior não conseguem mais gravar.
+        """
+        self._forget(key)
+        version_key = self.version_key(key)
+        pipe = self._client.pipeline(transaction=True)
+        pipe.delete(key, self._negative_key(key))
+        pipe.incr(version_key)
+        pipe.expire(version_key, self.VERSION_TTL)
+        await pipe.execute()
+
+    async def get_versioned(self, key: str) -> tuple:
+        """Retorna (valor, versão) para uso com `set_if_version`."""
+        pipe = self._client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.get(self.version_key(key))
+        value, version = await pipe.execute()
+        return value, version or ""
+
+    _SET_IF_VERSION = """
+    if (redis.call('get', KEYS[2]) or '') ~= ARGV[2] then
+        return 0
+    end
+    if tonumber(ARGV[3]) > 0 then
+        redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[3])
+    else
+        redis.call('set', KEYS[1], ARGV[1])
+    end
+    return 1
+    """
+
+    _HSET_IF_VERSION = """
+    if (redis.call('get', KEYS[2]) or '') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('del', KEYS[1])
+    redis.call('hset', KEYS[1], unpack(ARGV, 3))
+    if tonumber(ARGV[2]) > 0 then
+        redis.call('expire', KEYS[1], ARGV[2])
+    end
+    return 1
+    """
+
+    async def set_if_version(self, key: str, value: str, version: str, ttl: int | None = None) -> bool:
+        """Grava somente se a chave não foi invalidada desde que `version` foi lida."""
+        ttl = ttl or self.ttl_for(key) or 0
+        self._forget(key)
+        result = await self._client.eval(self._SET_IF_VERSION, 2, key, self.version_key(key), value, version, ttl)
+        return bool(result)
+
+    async def hset_if_version(self, key: str, mapping: Dict[str, Any], version: str) -> bool:
+        mapping = self.normalize_hash(mapping)
+        if not mapping:
+            return False
+        ttl = self.ttl_for(key) or 0
+        self._forget(key)
+        args = [item for pair in mapping.items() for item in pair]
+        result = await self._client.eval(self._HSET_IF_VERSION, 2, key, self.version_key(key), version, ttl, *args)
+        return bool(result)
+
+    async def set_negative(self, key: str, version: str = "", ttl: int | None = None):
+        """Marca `key` como inexistente na origem por um curto período."""
+        negative_key = self._negative_key(key)
+        ttl = ttl or self.NEGATIVE_TTL
+        result = await self._client.eval(self._SET_IF_VERSION, 2, negative_key, self.version_key(key), "1", version, ttl)
+        return bool(result)
+
+    async def is_negative(self, key: str) -> bool:
+        return bool(await self._client.exists(self._negative_key(key)))
+
+    # --------------------
+    # READ-THROUGH (single-flight)
+    # --------------------
+    async def get_or_load(self,
+                          key: str,
+                          loader: Callable[[], Awaitable[Any]],
+                          stale_while_revalidate: bool = False,
+                          lock_timeout: float | None = None,
+                          negative_ttl: int | None = NEGATIVE_TTL,
+                          as_hash: bool = False,
+                          codec=None) -> Any:
+        """
+        Lê `key`; em caso de miss, executa `loader` uma única vez por processo
+        (chamadas concorrentes aguardam o mesmo resultado) e grava o valor.
+
+        - stale_while_revalidate: se a chave foi invalidada mas há um valor antigo
+          em memória, devolve esse valor e recarrega em segundo plano.
+        - lock_timeout: usa também um lock no Redis para que só um nó carregue;
+          os demais aguardam o valor aparecer por até `lock_timeout` segundos.
+        - negative_ttl: quando o loader retorna None, o miss fica marcado por esse
+          tempo e as próximas leituras não vão à origem (None desativa).
+        - as_hash: a entrada é um HASH (HGETALL/HSET) em vez de string.
+        - codec: serialização do valor (padrão: codec do Cache).
+
+        A gravação só acontece se a chave não foi invalidada durante o carregamento.
+        """
+        codec = codec or self._codec
+        namespace = self.namespace_of(key)
+
+        # Cópia local (client-side cache): só valores lidos do Redis são guardados
+        local_token = None
+        if self._local_tracks(key):
+            kind = "hash" if as_hash else "obj"
+            value = self._local.get(key, kind)
+            if value is not MISSING:
+                cache_metrics.local_hit(namespace)
+                cache_metrics.lookup(namespace, True)
+                return value
+            local_token = self._local.begin(key)
+
+        value, negative, version = await self._read_entry(key, as_hash, codec)
+        cache_metrics.lookup(namespace, value is not None)
+        if value is not None:
+            self._remember(key, value)
+            if local_token is not None:
+                self._local.put(key, local_token, kind, value)
+            return value
+        if negative:
+            cache_metrics.negative_hit(namespace)
+            return None
+
+        load = lambda: self._load_and_store(key, loader, version, lock_timeout, negative_ttl, as_hash, codec)
+
+        if stale_while_revalidate and key in self._stale:
+            cache_metrics.stale(namespace)
+            self._flights.spawn(key, load)
+            return self._stale[key]
+
+        return await self._flights.do(key, load)
+
+    async def _read_entry(self, key: str, as_hash: bool, codec) -> tuple:
+        """Valor, marcador negativo e versão em um único round trip."""
+        pipe = self._client.pipeline(transaction=False)
+        if as_hash:
+            pipe.hgetall(key)
+        else:
+            pipe.get(key)
+        pipe.exists(self._negative_key(key))
+        pipe.get(self.version_key(key))
+        raw, negative, version = await pipe.execute()
+
+        if as_hash:
+            value = raw or None
+        else:
+            value = codec.decode(raw) if raw is not None else None
+        return value, bool(negative), version or ""
+
+    async def _load_and_store(self, key, loader, version, lock_timeout, negative_ttl, as_hash, codec) -> Any:
+        lock_key = f"lock:{key}"
+        token = None
+
+        if lock_timeout:
+            token = uuid.uuid4().hex
+            acquired = await self._client.set(lock_key, token, nx=True, px=int(lock_timeout * 1000))
+            if not acquired:
+                # Outro nó está carregando: espera o valor ser publicado
+                value = await self._wait_for(key, lock_timeout, as_hash, codec)
+                if value is not None:
+                    return value
+                token = None
+
+        try:
+            start = time.perf_counter()
+            value = await loader()
+            cache_metrics.observe_loader(self.namespace_of(key), time.perf_counter() - start)
+            if value is not None:
+                if as_hash:
+                    await self.hset_if_version(key, value, version)
+                else:
+                    await self.set_if_version(key, codec.encode(value), version)
+                self._remember(key, value)
+            elif negative_ttl:
+                await self.set_negative(key, version, negative_ttl)
+            return value
+        finally:
+            if token:
+                await self._release_lock(lock_key, token)
+
+    async def _wait_for(self, key: str, timeout: float, as_hash: bool, codec) -> Any:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(0.05)
+            value, _, _ = await self._read_entry(key, as_hash, codec)
+            if value is not None:
+                self._remember(key, value)
+                return value
+        return None
+
+    _RELEASE_LOCK = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    async def _release_lock(self, key: str, owner: str):
+        await self._client.eval(self._RELEASE_LOCK, 1, key, owner)
+
+    def _remember(self, key: str, value: Any):
+        self._stale[key] = value
+        self._stale.move_to_end(key)
+        if len(self._stale) > self.STALE_ENTRIES:
+            self._stale.popitem(last=False)
 
     # --------------------
     # HASH (attendants)
     # --------------------
-    async def hset(self, key: str, mapping: Dict[str, Any]):
-        async with self._lock:
-            await self._client.hset(key, mapping=mapping)
+    def normalize_hash(self, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Redis não aceita None/bool/dict em campos de hash: normaliza antes de gravar.
+        Campos aninhados (dict/list) são serializados com o codec do Cache.
+        """
+        normalized = {}
+        for field, value in mapping.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = int(value)
+            elif isinstance(value, (dict, list)):
+                value = self._codec.encode(value)
+            normalized[field] = value
+        return normalized
 
-    async def hgetall(self, key: str) -> Dict[str, Any] | None:
-        data = await self._client.hgetall(key)
-        return data if data else None
+    async def hset(self, key: str, mapping: Dict[str, Any], tags: Iterable[str] = ()):
+        async with self.pipeline() as pipe:
+            pipe.hset(key, mapping, tags=tags)
+
+    async def get_hash(self, key: str) -> Dict[str, Any] | None:
+        async def read():
+            data = await self._client.hgetall(key)
+            return data if data else None
+
+        if self._local_tracks(key):
+            return self._track(key, await self._read_through_local(key, "hash", read))
+        return self._track(key, await read())
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self._track(key, await self._client.hget(key, field))
+
+    async def hmget(self, key: str, fields: List[str]) -> List[Any]:
+        """Apenas os campos pedidos; campos (ou hash) inexistentes vêm como None."""
+        values = await self._client.hmget(key, fields)
+        cache_metrics.lookup(self.namespace_of(key), any(v is not None for v in values))
+        return values
+
+    async def get_hash_many(self, keys: List[str]) -> List[Dict[str, Any] | None]:
+        """HGETALL de várias chaves em um único round trip."""
+        if not keys:
+            return []
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return [self._track(key, data or None) for key, data in zip(keys, await pipe.execute())]
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        if not fields:
+            return 0
+        self._forget(key)
+        return await self._client.hdel(key, *fields)
+
+    # --------------------
+    # LIST (filas)
+    # --------------------
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        return await self._client.lrange(key, start, end)
+
+    async def llen(self, key: str) -> int:
+        return await self._client.llen(key)
+
+    async def lpos(self, key: str, value: str) -> int | None:
+        return await self._client.lpos(key, value)
+
+    # --------------------
+    # CONTADORES
+    # --------------------
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
 
     # --------------------
     # SET (indexes)
     # --------------------
     async def sadd(self, key: str, value: str):
-        async with self._lock:
-            await self._client.sadd(key, value)
+        self._forget(key)
+        await self._client.sadd(key, value)
+
+    async def get_set(self, key: str) -> List[str]:
+        if self._local_tracks(key):
+            return await self._read_through_local(key, "set", lambda: self._read_set(key))
+        return await self._read_set(key)
 
-    async def smembers(self, key: str) -> List[str]:
+    async def _read_set(self, key: str) -> List[str]:
         return list(await self._client.smembers(key))
 
+    # --------------------
+    # SORTED SET (agendamentos por prazo)
+    # --------------------
+    async def zadd(self, key: str, mapping: Dict[str, float]):
+        await self._client.zadd(key, mapping)
+
+    async def zrem(self, key: str, *members: str):
+        if not members:
+            return
+        await self._client.zrem(key, *members)
+
+    async def zscore(self, key: str, member: str) -> float | None:
+        return await self._client.zscore(key, member)
+
+    async def zrangebyscore(self, key: str, min_score: float, max_score: float, limit: int = None) -> List[tuple]:
+        """Retorna [(membro, score)] com score entre min_score e max_score."""
+        if limit is not None:
+            return await self._client.zrangebyscore(key, min_score, max_score, start=0, num=limit, withscores=True)
+        return await self._client.zrangebyscore(key, min_score, max_score, withscores=True)
+
+    async def zrevrange(self, key: str, start: int, end: int) -> List[tuple]:
+        """Retorna [(membro, score)] por posição, do maior para o menor score."""
+        return await self._client.zrevrange(key, start, end, withscores=True)
+
+    async def zrevrangebyscore(self, key: str, max_score: float, min_score: float, limit: int, offset: int = 0) -> List[tuple]:
+        return await self._client.zrevrangebyscore(key, max_score, min_score, start=offset, num=limit, withscores=True)
+
+    async def zcount(self, key: str, min_score: float, max_score: float) -> int:
+        return await self._client.zcount(key, min_score, max_score)
+
+    async def zrevrank(self, key: str, member: str) -> int | None:
+        return await self._client.zrevrank(key, member)
+
+    async def zremrangebyscore(self, key: str, min_score: float, max_score: float):
+        await self._client.zremrangebyscore(key, min_score, max_score)
+
+    async def zrange_due(self, key: str, max_score: float, limit: int = 100) -> List[tuple]:
+        """
+        [(membro, score)] com score <= max_score, sem remover: o custo depende da
+        quantidade de vencidos, não do tamanho do ZSET. Quem processa remove depois
+        com `zrem_unchanged`, só o que concluiu.
+        """
+        return await self._client.zrangebyscore(key, "-inf", max_score, start=0, num=limit, withscores=True)
+
+    _ZREM_UNCHANGED = """
+    local removed = 0
+    for i = 1, #ARGV, 2 do
+        if tonumber(redis.call('zscore', KEYS[1], ARGV[i])) == tonumber(ARGV[i + 1]) then
+            removed = removed + redis.call('zrem', KEYS[1], ARGV[i])
+        end
+    end
+    return removed
+    """
+
+    async def zrem_unchanged(self, key: str, entries: List[tuple]) -> int:
+        """
+        Remove os membros cujo score ainda é o lido em `entries` ([(membro, score)]):
+        um membro reagendado nesse meio tempo continua no ZSET.
+        """
+        if not entries:
+            return 0
+        args = [value for member, score in entries for value in (member, score)]
+        return await self.eval(self._ZREM_UNCHANGED, [key], args)
+
+    # --------------------
+    # SCRIPTS
+    # --------------------
+    async def eval(self, script: str, keys: List[str], args: List[Any]) -> Any:
+        """Executa um script Lua (operações atômicas compostas em um round trip)."""
+        return await self._client.eval(script, len(keys), *keys, *args)
+
+    async def exists(self, key: str) -> bool:
+        return bool(await self._client.exists(key))
+
+    # --------------------
+    # PUB/SUB
+    # --------------------
+    async def publish(self, channel: str, message: str) -> int:
+        return await self._client.publish(channel, message)
+
+    def pubsub(self):
+        """Conexão de inscrição (PubSub do redis-py ou do backend em memória)."""
+        return self._client.pubsub()
+
+    # --------------------
+    # LOCK (eleição de líder)
+    # --------------------
+    _ACQUIRE_OR_RENEW = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('expire', KEYS[1], ARGV[2])
+    end
+    if redis.call('set', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+        return 1
+    end
+    return 0
+    """
+
+    async def acquire_lock(self, key: str, owner: str, ttl: int) -> bool:
+        """Adquire (ou renova, se já for o dono) um lock com expiração."""
+        result = await self._client.eval(self._ACQUIRE_OR_RENEW, 1, key, owner, ttl)
+        return bool(result)
+
     # --------------------
     # Helpers
     # --------------------
-    async def invalidate_prefix(self, prefix: str):
-        async with self._lock:
-            keys = await self._client.keys(f"{prefix}*")
+    async def memory_usage_by_namespace(self, sample_size: int = 1000) -> Dict[str, Any]:
+        """
+        Amostra até `sample_size` chaves via SCAN e agrega quantidade e bytes
+        (MEMORY USAGE) por namespace. Também retorna o total de chaves do banco.
+        """
+        keys = []
+        async for key in self._client.scan_iter(count=500):
+            keys.append(key)
+            if len(keys) >= sample_size:
+                break
+
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key)
+        pipe.dbsize()
+        *usage, total_keys = await pipe.execute()
+
+        namespaces: Dict[str, Dict[str, int]] = {}
+        for key, size in zip(keys, usage):
+            stats = namespaces.setdefault(self.namespace_of(key), {"keys": 0, "bytes": 0})
+            stats["keys"] += 1
+            stats["bytes"] += size or 0
+
+        return {"total_keys": total_keys, "sampled_keys": len(keys), "namespaces": namespaces}
+
+    async def run_keyspace_sampler(self, stop_event: asyncio.Event, interval: int = 300, sample_size: int = 1000):
+        """
+        Amostra o keyspace periodicamente (`memory_usage_by_namespace`) e publica
+        o resultado em `cache_metrics`. Somente leitura: cada nó amostra por conta própria.
+        """
+        while not stop_event.is_set():
+            try:
+                cache_metrics.set_keyspace(await self.memory_usage_by_namespace(sample_size))
+            except Exception as e:
+                logging.error(f"Erro ao amostrar o keyspace do Redis: {e}")
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # --------------------
+    # INVALIDAÇÃO EM MASSA
+    # --------------------
+    async def invalidate_tag(self, tag: str, batch_size: int = 500) -> int:
+        """
+        Invalida exatamente as chaves registradas em `tag:{tag}`.
+        O set é percorrido com SSCAN e as chaves removidas com UNLINK em lotes,
+        incrementando a versão de cada uma (como `invalidate`).
+        """
+        tag_key = self.tag_key(tag)
+        removed = 0
+        cursor = 0
+        while True:
+            cursor, keys = await self._client.sscan(tag_key, cursor, count=batch_size)
             if keys:
-                await self._client.delete(*keys)
+                self._forget(*keys)
+                pipe = self._client.pipeline(transaction=False)
+                pipe.unlink(*keys, *[self._negative_key(k) for k in keys])
+                for key in keys:
+                    pipe.incr(self.version_key(key))
+                    pipe.expire(self.version_key(key), self.VERSION_TTL)
+                pipe.srem(tag_key, *keys)
+                await pipe.execute()
+                removed += len(keys)
+            if cursor == 0:
+                break
+        return removed
+
+    async def invalidate_prefix(self, prefix: str, batch_size: int = 500) -> int:
+        """
+        Varredura por prefixo (quando não há tag): SCAN incremental + UNLINK em lotes,
+        sem bloquear o Redis como `KEYS prefix*`.
+        """
+        removed = 0
+        batch: List[str] = []
+        async for key in self._client.scan_iter(match=f"{prefix}*", count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                self._forget(*batch)
+                removed += await self._client.unlink(*batch)
+                batch = []
+        if batch:
+            self._forget(*batch)
+            removed += await self._client.unlink(*batch)
+        return removed
+
+
+# --------------------
+# Scripts no backend em memória (mesma semântica dos scripts Lua do Cache)
+# --------------------
+@memory_script(Cache._SET_IF_VERSION)
+def _set_if_version_in_memory(store, keys, args):
+    if (store.get(keys[1]) or "") != args[1]:
+        return 0
+    ttl = int(args[2])
+    store.set(keys[0], args[0], ex=ttl if ttl > 0 else None)
+    return 1
+
+
+@memory_script(Cache._HSET_IF_VERSION)
+def _hset_if_version_in_memory(store, keys, args):
+    if (store.get(keys[1]) or "") != args[0]:
+        return 0
+    store.delete(keys[0])
+    store.hset(keys[0], items=args[2:])
+    if int(args[1]) > 0:
+        store.expire(keys[0], int(args[1]))
+    return 1
+
+
+@memory_script(Cache._ZREM_UNCHANGED)
+def _zrem_unchanged_in_memory(store, keys, args):
+    removed = 0
+    for member, score in zip(args[::2], args[1::2]):
+        if store.zscore(keys[0], member) == float(score):
+            removed += store.zrem(keys[0], member)
+    return removed
+
+
+@memory_script(Cache._RELEASE_LOCK)
+def _release_lock_in_memory(store, keys, args):
+    if store.get(keys[0]) == args[0]:
+        return store.delete(keys[0])
+    return 0
+
+
+@memory_script(Cache._ACQUIRE_OR_RENEW)
+def _acquire_or_renew_in_memory(store, keys, args):
+    if store.get(keys[0]) == args[0]:
+        return int(store.expire(keys[0], int(args[1])))
+    return 1 if store.set(keys[0], args[0], nx=True, ex=int(args[1])) else 0
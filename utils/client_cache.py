@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Tuple
+from redis.asyncio import Redis
+
+# Marcador de ausência no cache local (None é um valor válido)
+MISSING = object()
+
+
+class ClientSideCache:
+    """
+    Cache local (LRU limitado) de chaves read-mostly, mantido coerente pelo Redis
+    (client-side caching com invalidação assistida pelo servidor).
+
+    Uma conexão liga `CLIENT TRACKING ON REDIRECT <id> BCAST PREFIX ...`, apontando
+    para outra conexão inscrita em `__redis__:invalidate`. Qualquer escrita em uma
+    chave com um dos prefixos, feita por qualquer cliente, gera uma mensagem de
+    invalidação e a entrada local é descartada.
+
+    Enquanto o tracking não está ativo (inicialização, reconexão) nada é servido
+    nem guardado localmente; quando ele cai, o cache local é esvaziado.
+    """
+    INVALIDATE_CHANNEL = "__redis__:invalidate"
+    # Intervalo de verificação do tracking (CLIENT TRACKINGINFO)
+    HEALTH_INTERVAL = 5
+    RECONNECT_DELAY = 1
+
+    def __init__(self,
+                 client: Redis,
+                 prefixes: Iterable[str],
+                 max_entries: int = 10000,
+                 max_age: float = 300) -> None:
+        self._client = client
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self._max_entries = max_entries
+        # Rede de segurança: nenhuma entrada vive mais que `max_age` segundos
+        self._max_age = max_age
+        # chave -> (guardado_em, tipo da leitura, valor)
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        # Leituras em andamento: uma invalidação durante a leitura descarta o resultado
+        self._pending: Dict[str, object] = {}
+        self._ready = False
+        self._task: asyncio.Task | None = None
+        self._pubsub = None
+        self._tracker: Redis | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def tracks(self, key: str) -> bool:
+        return self._ready and key.startswith(self.prefixes)
+
+    # --------------------
+    # Entradas
+    # --------------------
+    def get(self, key: str, kind: str) -> Any:
+        """Valor local de `key` lido como `kind` ("str", "hash", "set", "obj") ou MISSING."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        stored_at, entry_kind, value = entry
+        if entry_kind != kind or time.monotonic() - stored_at > self._max_age:
+            return MISSING
+        self._entries.move_to_end(key)
+        # Cópia rasa: quem lê não altera a entrada compartilhada
+        return value.copy() if isinstance(value, (dict, list, set)) else value
+
+    def begin(self, key: str) -> object:
+        """Marca o início de uma leitura no Redis; o token é exigido por `put`."""
+        if len(self._pending) > self._max_entries:
+            # Leituras abandonadas (erro no meio): descartar só impede o put delas
+            self._pending.clear()
+        token = object()
+        self._pending[key] = token
+        return token
+
+    def put(self, key: str, token: object, kind: str, value: Any) -> None:
+        """Guarda o valor lido, a menos que a chave tenha sido invalidada durante a leitura."""
+        if self._pending.get(key) is not token:
+            return
+        del self._pending[key]
+        if value is None or not self._ready:
+            return
+        self._entries[key] = (time.monotonic(), kind, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def forget(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+            self._pending.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._pending.clear()
+
+    # --------------------
+    # Tracking
+    # --------------------
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self._connect()
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Client-side cache: tracking interrompido ({e}), reconectando")
+            finally:
+                self._ready = False
+                self.clear()
+                await self._disconnect()
+            await asyncio.sleep(self.RECONNECT_DELAY)
+
+    async def _connect(self):
+        # Conexão que recebe as invalidações (RESP2: via pub/sub)
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.connect()
+        connection = self._pubsub.connection
+        await connection.send_command("CLIENT", "ID")
+        client_id = await connection.read_response()
+        await self._pubsub.subscribe(self.INVALIDATE_CHANNEL)
+
+        # Conexão dedicada que mantém o tracking ligado enquanto estiver aberta
+        self._tracker = Redis(connection_pool=self._client.connection_pool, single_connection_client=True)
+        args = ["CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST"]
+        for prefix in self.prefixes:
+            args += ["PREFIX", prefix]
+        await self._tracker.execute_command(*args)
+
+        self.clear()
+        self._ready = True
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        checked_at = loop.time()
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=self.HEALTH_INTERVAL)
+            if message and message["type"] == "message":
+                keys = message["data"]
+                # FLUSHDB/FLUSHALL: a mensagem não traz chaves
+                if keys is None:
+                    self.clear()
+                else:
+                    self.forget(*(keys if isinstance(keys, list) else [keys]))
+
+            if loop.time() - checked_at >= self.HEALTH_INTERVAL:
+                await self._check_tracking()
+                checked_at = loop.time()
+
+    async def _check_tracking(self):
+        """Se a conexão do tracking foi refeita (ou o redirect quebrou), as invalidações pararam."""
+        info = await self._tracker.execute_command("CLIENT", "TRACKINGINFO")
+        if isinstance(info, list):
+            info = dict(zip(info[::2], info[1::2]))
+        flags = info.get("flags") or []
+        if "on" not in flags or "broken_redirect" in flags:
+            raise ConnectionError(f"tracking inativo (flags={flags})")
+
+    async def _disconnect(self):
+        if self._tracker is not None:
+            try:
+                await self._tracker.execute_command("CLIENT", "TRACKING", "OFF")
+            except Exception:
+                pass
+            try:
+                await self._tracker.aclose()
+            except Exception:
+                pass
+            self._tracker = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
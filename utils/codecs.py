@@ -0,0 +1,101 @@
+import json
+from typing import Any, Iterable
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele o cache usa o json da stdlib
+    orjson = None
+
+
+class JsonCodec:
+    """Codec padrão da stdlib (formato histórico do cache)."""
+    name = "json"
+
+    def encode(self, obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    def decode(self, raw: str) -> Any:
+        return json.loads(raw)
+
+
+class OrjsonCodec:
+    """JSON via orjson: mesmo formato, encode/decode bem mais rápidos."""
+    name = "orjson"
+
+    def encode(self, obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def decode(self, raw: str) -> Any:
+        return orjson.loads(raw)
+
+
+class SchemaCodec:
+    """
+    Codec posicional para documentos de formato conhecido.
+
+    Em vez de repetir o nome de cada campo, grava `#{name}:{VERSION}:[máscara,
+    v1, v2, ..., extras]` na ordem de `fields`: o bit i da máscara indica que o
+    campo i existe (campos com valor None são mantidos) e campos fora do schema
+    vão no último elemento. O prefixo separa o formato de qualquer valor JSON:
+    listas gravadas pelo codec base e objetos do formato antigo continuam sendo
+    lidos como estão.
+    """
+    VERSION = 1
+
+    def __init__(self, name: str, fields: Iterable[str], base=None):
+        self.name = name
+        self._fields = tuple(fields)
+        self._base = base or default_codec()
+        self._prefix = f"#{name}:{self.VERSION}:"
+
+    def encode(self, obj: Any) -> str:
+        if not isinstance(obj, dict):
+            return self._base.encode(obj)
+        mask = 0
+        values = []
+        for i, field in enumerate(self._fields):
+            if field in obj:
+                mask |= 1 << i
+            values.append(obj.get(field))
+        extras = {k: v for k, v in obj.items() if k not in self._fields}
+        return self._prefix + self._base.encode([mask, *values, extras or None])
+
+    def decode(self, raw: str) -> Any:
+        if not raw.startswith(self._prefix):
+            return self._base.decode(raw)  # formato antigo (objeto) ou valor comum
+        mask, *values, extras = self._base.decode(raw[len(self._prefix):])
+        obj = {field: value for i, (field, value) in enumerate(zip(self._fields, values)) if mask >> i & 1}
+        if extras:
+            obj.update(extras)
+        return obj
+
+
+def default_codec():
+    return OrjsonCodec() if orjson is not None else JsonCodec()
+
+
+CHAT_CODEC = SchemaCodec("chat", (
+    "_id",
+    "phone_number",
+    "status",
+    "attendant_id",
+    "category",
+    "created_at",
+    "last_interaction_at",
+    "last_client_interaction_at",
+    "last_message",
+    "closed_at",
+))
+
+ATTENDANT_CODEC = SchemaCodec("attendant", (
+    "_id",
+    "name",
+    "login",
+    "password",
+    "permission",
+    "sector",
+    "clients",
+    "message_shortcuts",
+    "welcome_message",
+    "working_hours",
+))
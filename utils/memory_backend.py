@@ -0,0 +1,700 @@
+import asyncio
+import fnmatch
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from redis.exceptions import ResponseError
+
+# Implementações em Python dos scripts Lua (texto do script -> função)
+_SCRIPTS: Dict[str, Callable[["MemoryStore", List[str], List[str]], Any]] = {}
+
+
+def memory_script(lua: str):
+    """
+    Registra a implementação em Python de um script Lua para o backend em memória.
+    A função recebe (store, KEYS, ARGV) com strings, como o script, e deve ter a
+    mesma semântica; roda sem await, então é atômica como no Redis.
+    """
+    def decorator(fn):
+        _SCRIPTS[lua] = fn
+        return fn
+    return decorator
+
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+# Estimativa de memória por chave e por elemento (aproxima o overhead do Redis)
+KEY_OVERHEAD = 64
+ITEM_OVERHEAD = 16
+
+
+def _encode(value: Any) -> str:
+    """Converte argumentos como o redis-py (números viram texto)."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ResponseError(f"Invalid input of type: '{type(value).__name__}'")
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _score_bound(value: Any) -> Tuple[float, bool]:
+    """Limite de score (`-inf`, `+inf`, `(10`) -> (valor, exclusivo)."""
+    if isinstance(value, str) and value.startswith("("):
+        return float(value[1:]), True
+    return float(value), False
+
+
+def _index_range(length: int, start: int, end: int) -> Tuple[int, int]:
+    """Índices inclusivos do Redis (aceitam negativos) -> fatia [start, stop)."""
+    if start < 0:
+        start = max(length + start, 0)
+    if end < 0:
+        end = length + end
+    return start, min(end, length - 1) + 1
+
+
+class _SortedSet:
+    """Membros por score: dict para o score e lista ordenada de (score, membro)."""
+    def __init__(self) -> None:
+        self.scores: Dict[str, float] = {}
+        self.ordered: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def add(self, member: str, score: float) -> bool:
+        old = self.scores.get(member)
+        if old is not None:
+            if old == score:
+                return False
+            self.ordered.pop(bisect_left(self.ordered, (old, member)))
+        self.scores[member] = score
+        insort(self.ordered, (score, member))
+        return old is None
+
+    def remove(self, member: str) -> bool:
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        self.ordered.pop(bisect_left(self.ordered, (score, member)))
+        return True
+
+    def by_score(self, min_score: Any, max_score: Any) -> List[Tuple[float, str]]:
+        low, low_excl = _score_bound(min_score)
+        high, high_excl = _score_bound(max_score)
+        score = lambda item: item[0]
+        lo = (bisect_right if low_excl else bisect_left)(self.ordered, low, key=score)
+        hi = (bisect_left if high_excl else bisect_right)(self.ordered, high, key=score)
+        return self.ordered[lo:hi]
+
+
+_KINDS = {str: "string", dict: "hash", set: "set", _SortedSet: "zset", deque: "list"}
+_FACTORIES = {"hash": dict, "set": set, "zset": _SortedSet, "list": deque}
+
+
+class MemoryStore:
+    """
+    Dados do backend em memória: strings, hashes, sets, sorted sets e listas,
+    com TTL e despejo LRU (como `allkeys-lru`) acima de `max_memory` bytes
+    (estimados). Os métodos são síncronos e têm a assinatura dos comandos do
+    redis-py: cada comando, pipeline ou script roda inteiro sem ceder o event loop.
+    """
+    def __init__(self, max_memory: int = 64 * 1024 * 1024) -> None:
+        self.max_memory = max_memory
+        self.used_memory = 0
+        self.evicted_keys = 0
+        # Ordem = recência de acesso (o primeiro é o próximo a ser despejado)
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._expires: Dict[str, float] = {}
+        # Pub/sub: canal/padrão -> inscritos
+        self._channels: Dict[str, set] = {}
+        self._patterns: Dict[str, set] = {}
+
+    # --------------------
+    # Internos
+    # --------------------
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._drop(key)
+            return False
+        return key in self._data
+
+    def _drop(self, key: str) -> bool:
+        if key not in self._data:
+            return False
+        del self._data[key]
+        self.used_memory -= self._sizes.pop(key, 0)
+        self._expires.pop(key, None)
+        return True
+
+    def _lookup(self, key: str, kind: str) -> Any:
+        """Valor da chave (ou None), conferindo o tipo e marcando o acesso."""
+        if not self._alive(key):
+            return None
+        value = self._data[key]
+        if _KINDS[type(value)] != kind:
+            raise ResponseError(WRONGTYPE)
+        self._data.move_to_end(key)
+        return value
+
+    def _container(self, key: str, kind: str) -> Any:
+        """Estrutura da chave para escrita, criada vazia se não existir."""
+        value = self._lookup(key, kind)
+        if value is None:
+            value = self._data[key] = _FACTORIES[kind]()
+            self._sizes[key] = 0
+            self._account(key, KEY_OVERHEAD + len(key))
+        return value
+
+    def _account(self, key: str, delta: int) -> None:
+        self._sizes[key] += delta
+        self.used_memory += delta
+        self._expire_some()
+        # Nunca despeja a chave recém-escrita (última na ordem de acesso)
+        while self.used_memory > self.max_memory and len(self._data) > 1:
+            self._drop(next(iter(self._data)))
+            self.evicted_keys += 1
+
+    def _drop_if_empty(self, key: str, value: Any) -> None:
+        if not len(value):
+            self._drop(key)
+
+    def _expire_some(self, limit: int = 20) -> None:
+        """Expiração ativa: confere algumas chaves com TTL a cada escrita."""
+        now = time.monotonic()
+        for key in list(islice(self._expires, limit)):
+            deadline = self._expires.pop(key)
+            if deadline <= now:
+                self._drop(key)
+            else:
+                # Vai para o fim: a próxima amostra confere outras chaves
+                self._expires[key] = deadline
+
+    # --------------------
+    # Chaves
+    # --------------------
+    def type(self, name: str) -> str:
+        if not self._alive(name):
+            return "none"
+        return _KINDS[type(self._data[name])]
+
+    def exists(self, *names: str) -> int:
+        return sum(1 for name in names if self._alive(name))
+
+    def delete(self, *names: str) -> int:
+        return sum(1 for name in names if self._alive(name) and self._drop(name))
+
+    unlink = delete
+
+    def expire(self, name: str, time_seconds: int) -> bool:
+        if not self._alive(name):
+            return False
+        self._expires[name] = time.monotonic() + int(time_seconds)
+        return True
+
+    def ttl(self, name: str) -> int:
+        if not self._alive(name):
+            return -2
+        deadline = self._expires.get(name)
+        return -1 if deadline is None else max(int(deadline - time.monotonic()), 0)
+
+    def scan_keys(self, match: str | None = None) -> List[str]:
+        return [k for k in list(self._data) if self._alive(k) and (match is None or fnmatch.fnmatchcase(k, match))]
+
+    def dbsize(self) -> int:
+        return len(self.scan_keys())
+
+    def memory_usage(self, key: str) -> int | None:
+        return self._sizes[key] if self._alive(key) else None
+
+    def flushdb(self) -> bool:
+        self._data.clear()
+        self._sizes.clear()
+        self._expires.clear()
+        self.used_memory = 0
+        return True
+
+    # --------------------
+    # STRING
+    # --------------------
+    def get(self, name: str) -> str | None:
+        return self._lookup(name, "string")
+
+    def mget(self, keys, *args) -> List[str | None]:
+        names = [keys] if isinstance(keys, str) else list(keys)
+        return [self._lookup(name, "string") if self.type(name) == "string" else None for name in [*names, *args]]
+
+    def set(self, name: str, value: Any, ex: int | None = None, px: int | None = None,
+            nx: bool = False, xx: bool = False, keepttl: bool = False) -> bool | None:
+        exists = self._alive(name)
+        if (nx and exists) or (xx and not exists):
+            return None
+        value = _encode(value)
+        deadline = self._expires.get(name) if keepttl else None
+        self._drop(name)
+        self._data[name] = value
+        self._sizes[name] = 0
+        if ex:
+            deadline = time.monotonic() + int(ex)
+        elif px:
+            deadline = time.monotonic() + int(px) / 1000
+        if deadline is not None:
+            self._expires[name] = deadline
+        self._account(name, KEY_OVERHEAD + len(name) + len(value))
+        return True
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        current = self._lookup(name, "string")
+        try:
+            value = int(current or 0) + amount
+        except ValueError:
+            raise ResponseError("value is not an integer or out of range")
+        # INCR preserva o TTL
+        self.set(name, value, keepttl=True)
+        return value
+
+    # --------------------
+    # HASH
+    # --------------------
+    def hget(self, name: str, key: str) -> str | None:
+        data = self._lookup(name, "hash")
+        return data.get(key) if data else None
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        return dict(self._lookup(name, "hash") or {})
+
+    def hmget(self, name: str, keys, *args) -> List[str | None]:
+        data = self._lookup(name, "hash") or {}
+        fields = [keys] if isinstance(keys, str) else list(keys)
+        return [data.get(_encode(field)) for field in [*fields, *args]]
+
+    def hset(self, name: str, key: str | None = None, value: Any = None,
+             mapping: Dict[str, Any] | None = None, items: List[Any] | None = None) -> int:
+        pairs = []
+        if key is not None:
+            pairs.append((key, value))
+        if items:
+            pairs.extend(zip(items[::2], items[1::2]))
+        if mapping:
+            pairs.extend(mapping.items())
+        if not pairs:
+            raise ResponseError("'hset' with no key value pairs")
+
+        data = self._container(name, "hash")
+        added, delta = 0, 0
+        for field, field_value in pairs:
+            field, field_value = _encode(field), _encode(field_value)
+            old = data.get(field)
+            if old is None:
+                added += 1
+                delta += ITEM_OVERHEAD + len(field) + len(field_value)
+            else:
+                delta += len(field_value) - len(old)
+            data[field] = field_value
+        self._account(name, delta)
+        return added
+
+    def hdel(self, name: str, *keys: str) -> int:
+        data = self._lookup(name, "hash")
+        if not data:
+            return 0
+        removed, delta = 0, 0
+        for field in keys:
+            old = data.pop(field, None)
+            if old is not None:
+                removed += 1
+                delta -= ITEM_OVERHEAD + len(field) + len(old)
+        self._account(name, delta)
+        self._drop_if_empty(name, data)
+        return removed
+
+    # --------------------
+    # SET
+    # --------------------
+    def sadd(self, name: str, *values: Any) -> int:
+        members = self._container(name, "set")
+        added = [v for v in map(_encode, values) if v not in members]
+        members.update(added)
+        self._account(name, sum(ITEM_OVERHEAD + len(v) for v in set(added)))
+        return len(set(added))
+
+    def srem(self, name: str, *values: Any) -> int:
+        members = self._lookup(name, "set")
+        if not members:
+            return 0
+        removed = {v for v in map(_encode, values) if v in members}
+        members.difference_update(removed)
+        self._account(name, -sum(ITEM_OVERHEAD + len(v) for v in removed))
+        self._drop_if_empty(name, members)
+        return len(removed)
+
+    def smembers(self, name: str) -> set:
+        return set(self._lookup(name, "set") or ())
+
+    def sismember(self, name: str, value: Any) -> bool:
+        return _encode(value) in (self._lookup(name, "set") or ())
+
+    def scard(self, name: str) -> int:
+        return len(self._lookup(name, "set") or ())
+
+    def sscan(self, name: str, cursor: int = 0, match: str | None = None, count: int | None = None) -> Tuple[int, List[str]]:
+        # Uma única "página": cursor 0 encerra a varredura
+        members = [m for m in self.smembers(name) if match is None or fnmatch.fnmatchcase(m, match)]
+        return 0, members
+
+    # --------------------
+    # SORTED SET
+    # --------------------
+    def zadd(self, name: str, mapping: Dict[str, float], nx: bool = False, xx: bool = False) -> int:
+        zset = self._container(name, "zset")
+        added, delta = 0, 0
+        for member, score in mapping.items():
+            member = _encode(member)
+            exists = member in zset.scores
+            if (nx and exists) or (xx and not exists):
+                continue
+            if zset.add(member, float(score)):
+                added += 1
+                delta += ITEM_OVERHEAD + 8 + len(member)
+        self._account(name, delta)
+        self._drop_if_empty(name, zset)
+        return added
+
+    def zrem(self, name: str, *values: Any) -> int:
+        zset = self._lookup(name, "zset")
+        if not zset:
+            return 0
+        removed = [m for m in map(_encode, values) if zset.remove(m)]
+        self._account(name, -sum(ITEM_OVERHEAD + 8 + len(m) for m in removed))
+        self._drop_if_empty(name, zset)
+        return len(removed)
+
+    def zscore(self, name: str, value: Any) -> float | None:
+        zset = self._lookup(name, "zset")
+        return zset.scores.get(_encode(value)) if zset else None
+
+    def zcard(self, name: str) -> int:
+        return len(self._lookup(name, "zset") or ())
+
+    def zcount(self, name: str, min: Any, max: Any) -> int:
+        zset = self._lookup(name, "zset")
+        return len(zset.by_score(min, max)) if zset else 0
+
+    def zrangebyscore(self, name: str, min: Any, max: Any, start: int | None = None, num: int | None = None,
+                      withscores: bool = False) -> List[Any]:
+        zset = self._lookup(name, "zset")
+        items = zset.by_score(min, max) if zset else []
+        return self._page(items, start, num, withscores)
+
+    def zrevrangebyscore(self, name: str, max: Any, min: Any, start: int | None = None, num: int | None = None,
+                         withscores: bool = False) -> List[Any]:
+        zset = self._lookup(name, "zset")
+        items = zset.by_score(min, max)[::-1] if zset else []
+        return self._page(items, start, num, withscores)
+
+    def zrevrange(self, name: str, start: int, end: int, withscores: bool = False) -> List[Any]:
+        zset = self._lookup(name, "zset")
+        items = zset.ordered[::-1] if zset else []
+        lo, hi = _index_range(len(items), start, end)
+        return self._page(items[lo:hi], None, None, withscores)
+
+    def zrevrank(self, name: str, value: Any) -> int | None:
+        zset = self._lookup(name, "zset")
+        member = _encode(value)
+        if not zset or member not in zset.scores:
+            return None
+        return len(zset) - 1 - bisect_left(zset.ordered, (zset.scores[member], member))
+
+    def zremrangebyscore(self, name: str, min: Any, max: Any) -> int:
+        zset = self._lookup(name, "zset")
+        if not zset:
+            return 0
+        return self.zrem(name, *[member for _, member in zset.by_score(min, max)])
+
+    @staticmethod
+    def _page(items: List[Tuple[float, str]], start: int | None, num: int | None, withscores: bool) -> List[Any]:
+        if start is not None and num is not None:
+            items = items[start:] if num < 0 else items[start:start + num]
+        return [(member, score) for score, member in items] if withscores else [member for _, member in items]
+
+    # --------------------
+    # LIST
+    # --------------------
+    def lpush(self, name: str, *values: Any) -> int:
+        items = self._container(name, "list")
+        values = [_encode(v) for v in values]
+        items.extendleft(values)
+        self._account(name, sum(ITEM_OVERHEAD + len(v) for v in values))
+        return len(items)
+
+    def rpush(self, name: str, *values: Any) -> int:
+        items = self._container(name, "list")
+        values = [_encode(v) for v in values]
+        items.extend(values)
+        self._account(name, sum(ITEM_OVERHEAD + len(v) for v in values))
+        return len(items)
+
+    def rpop(self, name: str) -> str | None:
+        items = self._lookup(name, "list")
+        if not items:
+            return None
+        value = items.pop()
+        self._account(name, -(ITEM_OVERHEAD + len(value)))
+        self._drop_if_empty(name, items)
+        return value
+
+    def lrange(self, name: str, start: int, end: int) -> List[str]:
+        items = self._lookup(name, "list") or deque()
+        lo, hi = _index_range(len(items), start, end)
+        return list(islice(items, lo, hi)) if lo < hi else []
+
+    def ltrim(self, name: str, start: int, end: int) -> bool:
+        items = self._lookup(name, "list")
+        if items is None:
+            return True
+        kept = self.lrange(name, start, end)
+        delta = sum(len(v) for v in kept) - sum(len(v) for v in items) - ITEM_OVERHEAD * (len(items) - len(kept))
+        items.clear()
+        items.extend(kept)
+        self._account(name, delta)
+        self._drop_if_empty(name, items)
+        return True
+
+    def llen(self, name: str) -> int:
+        return len(self._lookup(name, "list") or ())
+
+    def lpos(self, name: str, value: Any) -> int | None:
+        value = _encode(value)
+        for index, item in enumerate(self._lookup(name, "list") or ()):
+            if item == value:
+                return index
+        return None
+
+    # --------------------
+    # PUB/SUB
+    # --------------------
+    def publish(self, channel: str, message: Any) -> int:
+        message = _encode(message)
+        receivers = 0
+        for subscriber in list(self._channels.get(channel, ())):
+            subscriber._deliver({"type": "message", "pattern": None, "channel": channel, "data": message})
+            receivers += 1
+        for pattern, subscribers in list(self._patterns.items()):
+            if fnmatch.fnmatchcase(channel, pattern):
+                for subscriber in list(subscribers):
+                    subscriber._deliver({"type": "pmessage", "pattern": pattern, "channel": channel, "data": message})
+                    receivers += 1
+        return receivers
+
+    # --------------------
+    # SCRIPTS
+    # --------------------
+    def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> Any:
+        handler = _SCRIPTS.get(script)
+        if handler is None:
+            raise ResponseError("NOSCRIPT script sem implementação no backend em memória (ver memory_script)")
+        keys = [_encode(k) for k in keys_and_args[:numkeys]]
+        args = [_encode(a) for a in keys_and_args[numkeys:]]
+        return handler(self, keys, args)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._data),
+            "used_memory": self.used_memory,
+            "max_memory": self.max_memory,
+            "evicted_keys": self.evicted_keys,
+        }
+
+
+class MemoryPubSub:
+    """Equivalente ao `PubSub` do redis-py para o MemoryStore."""
+    _CONTROL = ("subscribe", "unsubscribe", "psubscribe", "punsubscribe")
+
+    def __init__(self, store: MemoryStore) -> None:
+        self._store = store
+        self.channels: set = set()
+        self.patterns: set = set()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    @property
+    def subscribed(self) -> bool:
+        return bool(self.channels or self.patterns)
+
+    def _deliver(self, message: Dict[str, Any]) -> None:
+        self._queue.put_nowait(message)
+
+    def _control(self, kind: str, channel: str) -> None:
+        count = len(self.channels) + len(self.patterns)
+        self._deliver({"type": kind, "pattern": None, "channel": channel, "data": count})
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            self._store._channels.setdefault(channel, set()).add(self)
+            self.channels.add(channel)
+            self._control("subscribe", channel)
+
+    async def psubscribe(self, *patterns: str) -> None:
+        for pattern in patterns:
+            self._store._patterns.setdefault(pattern, set()).add(self)
+            self.patterns.add(pattern)
+            self._control("psubscribe", pattern)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        for channel in channels or list(self.channels):
+            subscribers = self._store._channels.get(channel, set())
+            subscribers.discard(self)
+            if not subscribers:
+                self._store._channels.pop(channel, None)
+            self.channels.discard(channel)
+            self._control("unsubscribe", channel)
+
+    async def punsubscribe(self, *patterns: str) -> None:
+        for pattern in patterns or list(self.patterns):
+            subscribers = self._store._patterns.get(pattern, set())
+            subscribers.discard(self)
+            if not subscribers:
+                self._store._patterns.pop(pattern, None)
+            self.patterns.discard(pattern)
+            self._control("punsubscribe", pattern)
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float | None = 0.0):
+        """Próxima mensagem ou None após `timeout` segundos (None: espera indefinidamente)."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            try:
+                if deadline is None:
+                    message = await self._queue.get()
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        message = self._queue.get_nowait()
+                    else:
+                        message = await asyncio.wait_for(self._queue.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                return None
+            if ignore_subscribe_messages and message["type"] in self._CONTROL:
+                continue
+            return message
+
+    async def listen(self):
+        while self.subscribed:
+            yield await self._queue.get()
+
+    async def aclose(self) -> None:
+        await self.unsubscribe()
+        await self.punsubscribe()
+
+    reset = aclose
+
+
+class MemoryPipeline:
+    """Pipeline/MULTI: os comandos são enfileirados e executados juntos, sem ceder o event loop."""
+    def __init__(self, store: MemoryStore, transaction: bool = True) -> None:
+        self._store = store
+        self.transaction = transaction
+        self.command_stack: List[Tuple[Callable, tuple, dict]] = []
+
+    def __len__(self) -> int:
+        return len(self.command_stack)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        command = getattr(self._store, name)
+
+        def queue(*args, **kwargs) -> "MemoryPipeline":
+            self.command_stack.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def __aenter__(self) -> "MemoryPipeline":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.reset()
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        stack, self.command_stack = self.command_stack, []
+        results = []
+        for command, args, kwargs in stack:
+            try:
+                results.append(command(*args, **kwargs))
+            except ResponseError as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
+
+    async def reset(self) -> None:
+        self.command_stack = []
+
+
+class MemoryRedis:
+    """
+    Backend em memória com a interface de `redis.asyncio.Redis` usada pelo Cache
+    e pelos serviços (respostas já decodificadas, como `decode_responses=True`).
+    Para nó único e testes: `REDIS_URL=memory://`.
+
+    Clientes criados com a mesma URL compartilham o mesmo MemoryStore no processo.
+    Scripts Lua precisam de uma implementação registrada com `memory_script`.
+    """
+    SCHEME = "memory://"
+    _stores: Dict[str, MemoryStore] = {}
+
+    def __init__(self, store: MemoryStore | None = None) -> None:
+        self._store = store or MemoryStore()
+
+    @classmethod
+    def handles(cls, url: str | None) -> bool:
+        return bool(url) and url.startswith(cls.SCHEME)
+
+    @classmethod
+    def from_url(cls, url: str) -> "MemoryRedis":
+        """`memory://[nome][?max_memory_mb=64]`."""
+        parsed = urlparse(url)
+        name = parsed.netloc + parsed.path
+        store = cls._stores.get(name)
+        if store is None:
+            max_memory_mb = int(parse_qs(parsed.query).get("max_memory_mb", ["64"])[0])
+            store = cls._stores[name] = MemoryStore(max_memory=max_memory_mb * 1024 * 1024)
+        return cls(store)
+
+    @property
+    def store(self) -> MemoryStore:
+        return self._store
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        command = getattr(self._store, name)
+
+        async def call(*args, **kwargs):
+            return command(*args, **kwargs)
+        return call
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> MemoryPipeline:
+        return MemoryPipeline(self._store, transaction)
+
+    def pubsub(self) -> MemoryPubSub:
+        return MemoryPubSub(self._store)
+
+    async def scan_iter(self, match: str | None = None, count: int | None = None, _type: str | None = None):
+        for key in self._store.scan_keys(match):
+            if _type is None or self._store.type(key) == _type:
+                yield key
+
+    async def ping(self) -> bool:
+        return True
+
+    async def aclose(self) -> None:
+        return None
+
+    close = aclose
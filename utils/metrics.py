@@ -0,0 +1,205 @@
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos (segundos), no formato do Prometheus:
+    contagem por bucket, soma e total. Percentis são aproximados pelo limite
+    superior do bucket; no bucket +Inf, pelo maior limite finito (como o
+    `histogram_quantile` do Prometheus), para o snapshot continuar serializável
+    em JSON.
+    """
+    DEFAULT_BUCKETS: Tuple[float, ...] = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+    )
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # último slot: acima do maior bucket (+Inf)
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """[(le, contagem acumulada)] incluindo +Inf."""
+        result, seen = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            result.append((repr(bound), seen))
+        result.append(("+Inf", self.count))
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count * 1000, 3) if self.count else None,
+            "p50_ms": self._ms(self.quantile(0.5)),
+            "p95_ms": self._ms(self.quantile(0.95)),
+            "p99_ms": self._ms(self.quantile(0.99)),
+        }
+
+    @staticmethod
+    def _ms(value: float | None) -> float | None:
+        return None if value is None else value * 1000
+
+
+class CacheMetrics:
+    """
+    Instrumentação do Cache no processo:
+    - hits / misses por namespace de chave (misses negativos, valores stale e
+      hits servidos pelo client-side cache à parte);
+    - latência de cada comando Redis (pipeline conta como um "PIPELINE");
+    - latência do loader nos misses de `get_or_load`, por namespace;
+    - última amostra do keyspace (quantidade de chaves e bytes por namespace).
+    """
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.negative_hits: Counter = Counter()
+        self.stale_served: Counter = Counter()
+        self.local_hits: Counter = Counter()
+        self.commands: Dict[str, Histogram] = {}
+        self.loaders: Dict[str, Histogram] = {}
+        self.keyspace: Dict[str, Any] | None = None
+        self.keyspace_sampled_at: float | None = None
+
+    # --------------------
+    # Registro
+    # --------------------
+    def lookup(self, namespace: str, hit: bool) -> None:
+        (self.hits if hit else self.misses)[namespace] += 1
+
+    def negative_hit(self, namespace: str) -> None:
+        self.negative_hits[namespace] += 1
+
+    def stale(self, namespace: str) -> None:
+        self.stale_served[namespace] += 1
+
+    def local_hit(self, namespace: str) -> None:
+        self.local_hits[namespace] += 1
+
+    def observe_command(self, name: str, seconds: float) -> None:
+        histogram = self.commands.get(name)
+        if histogram is None:
+            histogram = self.commands[name] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_loader(self, namespace: str, seconds: float) -> None:
+        histogram = self.loaders.get(namespace)
+        if histogram is None:
+            histogram = self.loaders[namespace] = Histogram()
+        histogram.observe(seconds)
+
+    def set_keyspace(self, sample: Dict[str, Any]) -> None:
+        self.keyspace = sample
+        self.keyspace_sampled_at = time.time()
+
+    # --------------------
+    # Exportação
+    # --------------------
+    def snapshot(self) -> Dict[str, Any]:
+        namespaces: Dict[str, Dict[str, Any]] = {}
+        names = set(self.hits) | set(self.misses) | set(self.negative_hits) | set(self.loaders)
+        for namespace in sorted(names):
+            hits, misses = self.hits[namespace], self.misses[namespace]
+            lookups = hits + misses
+            loader = self.loaders.get(namespace)
+            namespaces[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+                "negative_hits": self.negative_hits[namespace],
+                "stale_served": self.stale_served[namespace],
+                "local_hits": self.local_hits[namespace],
+                "loader": loader.snapshot() if loader else None,
+            }
+
+        return {
+            "namespaces": namespaces,
+            "commands": {name: h.snapshot() for name, h in sorted(self.commands.items())},
+            "keyspace": self.keyspace,
+            "keyspace_sampled_at": self.keyspace_sampled_at,
+        }
+
+    def render_prometheus(self, command_counts: Dict[str, Any] | None = None) -> str:
+        """Formato texto do Prometheus (exposition format 0.0.4)."""
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, values: Counter, label: str = "namespace"):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{{{label}="{_escape(key)}"}} {value}')
+
+        def histograms(name: str, help_text: str, values: Dict[str, Histogram], label: str):
+            lines.extend(histogram_lines(name, help_text, values, label))
+
+        counter("cache_hits_total", "Leituras do cache que encontraram a chave.", self.hits)
+        counter("cache_misses_total", "Leituras do cache sem a chave.", self.misses)
+        counter("cache_negative_hits_total", "Misses servidos pelo marcador negativo.", self.negative_hits)
+        counter("cache_stale_served_total", "Valores antigos servidos durante a revalidação.", self.stale_served)
+        counter("cache_local_hits_total", "Hits servidos pelo client-side cache, sem ir ao Redis.", self.local_hits)
+        histograms("redis_command_duration_seconds", "Latência dos comandos Redis.", self.commands, "command")
+        histograms("cache_loader_duration_seconds", "Latência do loader nos misses.", self.loaders, "namespace")
+
+        if command_counts is not None:
+            lines.append("# HELP redis_round_trips_total Round trips ao Redis (pipeline conta um).")
+            lines.append("# TYPE redis_round_trips_total counter")
+            lines.append(f"redis_round_trips_total {command_counts['round_trips']}")
+            counter("redis_commands_total", "Comandos enviados ao Redis.", Counter(command_counts["commands"]), "command")
+
+        if self.keyspace:
+            lines.append("# HELP cache_sampled_keys Chaves por namespace na última amostra do keyspace.")
+            lines.append("# TYPE cache_sampled_keys gauge")
+            for namespace, stats in sorted(self.keyspace["namespaces"].items()):
+                lines.append(f'cache_sampled_keys{{namespace="{_escape(namespace)}"}} {stats["keys"]}')
+            lines.append("# HELP cache_sampled_bytes Bytes (MEMORY USAGE) por namespace na última amostra.")
+            lines.append("# TYPE cache_sampled_bytes gauge")
+            for namespace, stats in sorted(self.keyspace["namespaces"].items()):
+                lines.append(f'cache_sampled_bytes{{namespace="{_escape(namespace)}"}} {stats["bytes"]}')
+            lines.append("# HELP redis_keys Total de chaves do banco (DBSIZE).")
+            lines.append("# TYPE redis_keys gauge")
+            lines.append(f"redis_keys {self.keyspace['total_keys']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def histogram_lines(name: str, help_text: str, values: Dict[str, Histogram], label: str) -> List[str]:
+    """Histogramas rotulados (um por chave de `values`) no formato texto do Prometheus."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(values.items()):
+        key = _escape(key)
+        for le, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{le}"}} {count}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+    return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+cache_metrics = CacheMetrics()
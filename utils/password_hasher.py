@@ -0,0 +1,57 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import bcrypt
+
+from utils.metrics import Histogram
+
+
+class PasswordHasher:
+    """
+    bcrypt fora do event loop: cada hash/verificação leva ~100-250ms de CPU e,
+    chamado direto no handler, congela todos os websockets do processo.
+
+    As operações rodam em um pool de threads limitado (o bcrypt libera o GIL).
+    O semáforo limita quantas estão em andamento; as demais aguardam sem ocupar
+    threads. Registra a espera na fila e o tempo de CPU de cada operação.
+    """
+    def __init__(self, max_workers: int = 4) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self.stats: Dict[str, Histogram] = {"wait": Histogram(), "hash": Histogram(), "verify": Histogram()}
+        self.waiting = 0
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run("hash", bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt())
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run("verify", bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    async def _run(self, operation: str, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.stats["wait"].observe(started_at - queued_at)
+        try:
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.stats[operation].observe(time.perf_counter() - started_at)
+            self._semaphore.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "waiting": self.waiting,
+            **{name: histogram.snapshot() for name, histogram in self.stats.items()},
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,14 +1,36 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
 
 from core.environment import get_environment
 from fastapi import HTTPException
 from jose import jwt,JWTError
 from utils.cache import Cache
+from utils.metrics import cache_metrics
 
 class Security():
-    def __init__(self):
+    # Tokens já verificados (sha256 do token -> claims): pulam a assinatura e o Redis
+    VERIFIED_CACHE_SIZE = 4096
+    # Rede de segurança: mesmo sem revogação, a entrada é reverificada após esse tempo
+    VERIFIED_MAX_AGE = 60
+    # Logout/alteração do atendente em qualquer nó derruba as entradas em todos
+    REVOCATION_CHANNEL = "auth:revoked"
+
+    def __init__(self, cache: Cache = None):
         self._env = get_environment()
-        # create a Cache instance directly to avoid importing core.dependencies (circular)
-        self._cache = Cache(self._env.REDIS_URL)
+        # Cache compartilhado vem do container; sem ele, cria um próprio
+        # (não importa core.dependencies para evitar import circular)
+        self._cache = cache or Cache(self._env.REDIS_URL)
+        # digest -> (válido até, user_id, claims)
+        self._verified: "OrderedDict[str, Tuple[float, str, dict]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, set] = {}
+        # Incrementado a cada revogação: verificações em andamento não gravam claims revogadas
+        self._revocations = 0
+        # O cache local só vale enquanto este nó recebe as revogações (ver run_forever)
+        self._listening = False
     
     async def create_token(self,
                         payload: dict) -> str:
@@ -21,6 +43,12 @@ class Security():
         
     async def verify_token(self,
                            token: str) -> bool:
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        cached = self._cached_claims(digest)
+        if cached is not None:
+            return cached
+
+        revocations = self._revocations
         try:
             # Decodifica e verifica assinatura, expiração (exp) e not before (nbf)
             decoded = jwt.decode(token, self._env.SECRET_KEY, algorithms=self._env.ALGORITHM)
@@ -31,11 +59,12 @@ class Security():
                 raise HTTPException(401, "Token missing user identifier")
                 
             user_id_str = str(user_id)
-            exists = await self._cache.get(f"auth_token:{user_id_str}")
+            exists = await self._cache.get_str(f"auth_token:{user_id_str}")
 
             if not exists:
                 raise HTTPException(401, "Invalid Token")
 
+            self._remember_claims(digest, user_id_str, decoded, revocations)
             return decoded
         
         except JWTError as e:
@@ -67,4 +96,89 @@ class Security():
             raise
         except Exception as e:
             print("Erro inesperado:", str(e))
-            raise HTTPException(500, "Internal Server Error")
\ No newline at end of file
+            raise HTTPException(500, "Internal Server Error")
+
+    # ----------------
+    # Cache de tokens verificados
+    # ----------------
+    def _cached_claims(self, digest: str) -> dict | None:
+        if not self._listening:
+            return None
+        entry = self._verified.get(digest)
+        if entry is not None and time.time() >= entry[0]:
+            self._forget_claims(digest)
+            entry = None
+        cache_metrics.lookup("security:verified", entry is not None)
+        if entry is None:
+            return None
+        self._verified.move_to_end(digest)
+        return dict(entry[2])
+
+    def _remember_claims(self, digest: str, user_id: str, decoded: dict, revocations: int):
+        # Revogado enquanto verificávamos (ou sem o canal de revogação): não guarda
+        if not self._listening or revocations != self._revocations:
+            return
+        valid_until = time.time() + self.VERIFIED_MAX_AGE
+        if decoded.get("exp"):
+            valid_until = min(valid_until, float(decoded["exp"]))
+        self._verified[digest] = (valid_until, user_id, dict(decoded))
+        self._verified.move_to_end(digest)
+        self._tokens_by_user.setdefault(user_id, set()).add(digest)
+        while len(self._verified) > self.VERIFIED_CACHE_SIZE:
+            self._forget_claims(next(iter(self._verified)))
+
+    def _forget_claims(self, digest: str):
+        entry = self._verified.pop(digest, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[1])
+        if tokens is not None:
+            tokens.discard(digest)
+            if not tokens:
+                del self._tokens_by_user[entry[1]]
+
+    def _revoke_local(self, user_id: str):
+        self._revocations += 1
+        for digest in self._tokens_by_user.pop(user_id, ()):
+            self._verified.pop(digest, None)
+
+    def _clear_verified(self):
+        self._revocations += 1
+        self._verified.clear()
+        self._tokens_by_user.clear()
+
+    async def revoke(self, user_id: str):
+        """
+        Descarta os tokens verificados do usuário em todos os nós.
+        Chamar depois de remover `auth_token:{user_id}` do Redis.
+        """
+        user_id = str(user_id)
+        self._revoke_local(user_id)
+        await self._cache.publish(self.REVOCATION_CHANNEL, user_id)
+
+    async def run_forever(self, stop_event: asyncio.Event):
+        """Recebe as revogações publicadas pelos nós; sem a inscrição, o cache local fica desligado."""
+        while not stop_event.is_set():
+            pubsub = self._cache.pubsub()
+            try:
+                await pubsub.subscribe(self.REVOCATION_CHANNEL)
+                self._listening = True
+                while not stop_event.is_set():
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message["type"] == "message":
+                        self._revoke_local(str(message["data"]))
+            except Exception as e:
+                logging.error(f"Erro no canal de revogação de tokens: {e}")
+            finally:
+                # Revogações publicadas enquanto desconectado se perderiam
+                self._listening = False
+                self._clear_verified()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass